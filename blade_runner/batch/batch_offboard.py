@@ -0,0 +1,468 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+""" Offboards many computers in Jamf Pro without the GUI.
+
+Reads a manifest of computers, matches each one to its Jamf Pro record, pushes the identity fields given in the
+manifest, pushes the offboard config, and checks that the record is no longer managed. Records are processed by a
+bounded pool of workers, requests to Jamf Pro can be rate limited, and requests that fail because Jamf Pro is busy
+(HTTP 429/5xx) or unreachable are retried with exponential backoff. The outcome of each record is written as a line of
+JSON to the results file.
+
+The manifest is either a CSV file with a header row or a JSONL file with one JSON object per line. The recognized
+columns/keys are serial_number, barcode_1, barcode_2, asset_tag, and name. Each record needs at least one enabled
+search parameter (see search_params.plist).
+
+Example:
+
+    # Current working directory is "/path/to/Blade Runner.app/Contents/Resources/Blade Runner/"
+    python -m blade_runner.batch.batch_offboard pallet_12.csv --offboard-config Default.xml --workers 4 --rate 5
+
+Notes:
+    Computers aren't enrolled in batch mode since enrolling has to be done on the computer itself. Records that are
+    not found in Jamf Pro are reported as "not_found".
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import socket
+import logging
+import argparse
+import plistlib
+import traceback as tb
+
+blade_runner_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(blade_runner_dir, "dependencies"))
+sys.path.insert(0, os.path.dirname(blade_runner_dir))
+
+from blade_runner.jamf_pro import xml_minifier
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.batch.engine import BatchEngine
+from blade_runner.jamf_pro.retry_policy import RetryPolicy
+from blade_runner.user_actions import user_actions
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.jamf_pro.instrumentation import RequestStats
+from blade_runner.jamf_pro.params import SearchParams
+from blade_runner.document.print_spooler import PrintSpooler
+from blade_runner.slack import slack_outbox
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+logger = logging.getLogger(__name__)
+
+# Order in which the identifiers of a record are used to search Jamf Pro.
+search_order = ["serial_number", "barcode_1", "barcode_2", "asset_tag"]
+
+# Manifest columns/keys that are copied into the Computer object.
+manifest_fields = search_order + ["name"]
+
+
+def read_manifest(manifest):
+    """Reads a CSV or JSONL manifest into a list of records. Empty values are dropped.
+
+    Args:
+        manifest (str): Path to the manifest. Files ending in .jsonl or .json are read as JSONL, everything else
+            as CSV with a header row.
+
+    Returns:
+        List of dictionaries, one per computer.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read the rows of the manifest.
+    with open(manifest, "r") as f:
+        if os.path.splitext(manifest)[1].lower() in [".jsonl", ".json"]:
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Keep only the recognized fields that have a value. JSON strings are unicode, so encode them to match the str
+    # values that the rest of Blade Runner works with.
+    records = []
+    for row in rows:
+        record = {}
+        for key, value in row.items():
+            key = key.strip().lower()
+            if key not in manifest_fields or value is None:
+                continue
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            value = str(value).strip()
+            if value:
+                record[key] = value
+        records.append(record)
+    return records
+
+
+class OffboardJob(object):
+    """Offboarding state of a single manifest record.
+
+    The attribute names match MainController's so that the functions in user_actions, e.g., update_offboard_config,
+    work the same in batch mode.
+
+    Attributes
+        line (int): Position of the record in the manifest, starting at 1.
+        fields (dict): Fields of the record from the manifest.
+        result (dict): Outcome of the record. Written to the results file.
+    """
+
+    def __init__(self, line, fields, offboard_config):
+        """Initialize the job.
+
+        Args:
+            line (int): Position of the record in the manifest.
+            fields (dict): Fields of the record from the manifest.
+            offboard_config (str): Offboard config XML string.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.line = line
+        self.fields = fields
+        self._offboard_config = offboard_config
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Fill the computer with the fields from the manifest.
+        self._computer = Computer()
+        for key in manifest_fields:
+            setattr(self._computer, key, fields.get(key, None))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.result = {"line": line, "input": fields, "jss_id": None, "status": None}
+
+
+class BatchOffboarder(object):
+    """Runs the Jamf Pro side of the offboard for many computers with a bounded pool of workers."""
+
+    def __init__(self, jss_server, offboard_config, search_params, workers=4, create_docs=False, engine=None,
+                 spooler=None):
+        """Initialize the batch offboarder.
+
+        Args:
+            jss_server (JssServer): The JSS server to connect to.
+            offboard_config (str): Offboard config XML string.
+            search_params (dict): Search parameters configuration data.
+            workers (int): Maximum number of records processed at the same time.
+            create_docs (bool): Create a JssDoc PDF for every offboarded record.
+            engine (BatchEngine): Runs the records and sets the request settings of the JSS server. Defaults to an
+                engine with workers records in flight and no rate limit.
+            spooler (PrintSpooler): Print queue the documents are submitted to. None to not print them. Submitting
+                only copies the PDF into the queue, so records never wait on the printer.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger = logging.getLogger(__name__)
+        self._jss_server = jss_server
+        self._offboard_config = offboard_config
+        self._create_docs = create_docs or spooler is not None
+        self._spooler = spooler
+        # Jobs of the offboarded records, for create_labels().
+        self._offboarded = []
+        self._engine = engine or BatchEngine(max_in_flight=workers)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Apply the request settings of the engine to every request the JSS server sends.
+        if self._engine.rate_limiter is not None:
+            self._jss_server.set_rate_limiter(self._engine.rate_limiter)
+        if self._engine.retry_policy is not None:
+            self._jss_server.set_retry_policy(self._engine.retry_policy)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Only search with the enabled search parameters, in a fixed order.
+        enabled = SearchParams(search_params).enabled
+        self._search_order = [param for param in search_order if param in enabled]
+
+    def run(self, records, results_file):
+        """Offboard every record. The result of each record is appended to the results file as soon as it finishes.
+
+        Args:
+            records (list): Records read from the manifest.
+            results_file (str): Path to the JSONL results file.
+
+        Returns:
+            List of results (dict), in the order they finished.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger.info("Batch offboarding {} record(s) with {} worker(s).".format(
+            len(records), self._engine.max_in_flight))
+        jobs = [OffboardJob(i + 1, fields, self._offboard_config) for i, fields in enumerate(records)]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Process the jobs in the engine and write each result from this thread, so the file has a single writer.
+        results = []
+        with open(results_file, "a") as f:
+            for result in self._engine.map(self.offboard, jobs):
+                f.write(json.dumps(result, sort_keys=True) + "\n")
+                f.flush()
+                results.append(result)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return results
+
+    def offboard(self, job):
+        """Offboard a single record. Never raises; errors are stored in the result.
+
+        Args:
+            job (OffboardJob): Record to offboard.
+
+        Returns:
+            Result of the record (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        start = time.time()
+        try:
+            self._offboard(job)
+        except Exception as e:
+            job.result["status"] = "failed"
+            job.result["error"] = "{}: {}".format(type(e).__name__, e)
+            self.logger.error("Record {} failed.\n{}".format(job.line, tb.format_exc()))
+        job.result["duration"] = round(time.time() - start, 3)
+        self.logger.info("Record {}: {}".format(job.line, job.result["status"]))
+        return job.result
+
+    def _offboard(self, job):
+        """Runs the Jamf Pro steps for a record: match, compare, push identity fields, push offboard config, check the
+        managed status, and optionally create the document.
+
+        Args:
+            job (OffboardJob): Record to offboard.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Find the record in Jamf Pro.
+        computer = job._computer
+        computer.jss_id = self._match(job)
+        if computer.jss_id is None:
+            job.result["status"] = "not_found"
+            return
+        job.result["jss_id"] = computer.jss_id
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Compare the manifest against the record and note what was wrong in Jamf Pro.
+        self._store_conflicts(job)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Push the identity fields from the manifest.
+        self._jss_server.push_identity_fields(computer)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Update the offboard config according to the implementation of the user and push it.
+        user_actions.update_offboard_config(job)
+        self._jss_server.push_xml_str(job._offboard_config, computer.jss_id)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Make sure the managed status is now false.
+        self._jss_server.prefetch(computer.jss_id, ["General"] + JssDoc.subsets)
+        managed = self._jss_server.get_managed_status(computer.jss_id)
+        if managed != 'false':
+            raise SystemError("Managed status was not false after offboarding.")
+        job.result["status"] = "offboarded"
+        self._offboarded.append(job)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Create the document.
+        if self._create_docs:
+            doc = JssDoc(self._jss_server, computer)
+            doc.create_pdf()
+            job.result["doc"] = doc.pdf_doc
+            if self._spooler is not None:
+                job.result["print_job"] = self._spooler.submit(doc.pdf_doc)["id"]
+
+    def create_labels(self, pdf):
+        """Creates a single PDF with the labels of the offboarded records, in manifest order, after an index. The
+        records were fetched when their managed status was checked, so they're served from the cache of the JSS
+        server unless it has expired.
+
+        Args:
+            pdf (str): Path of the PDF.
+
+        Returns:
+            List of the index entries (dict), see JssDoc.create_batch_pdf().
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        jobs = sorted(self._offboarded, key=lambda job: job.line)
+        return JssDoc.create_batch_pdf(self._jss_server, [job._computer for job in jobs], pdf,
+                                       workers=self._engine.max_in_flight)
+
+    def _match(self, job):
+        """Search Jamf Pro with each identifier of the record until one matches.
+
+        Args:
+            job (OffboardJob): Record to search for.
+
+        Returns:
+            JSS ID (str) or None if no identifier matched.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for param in self._search_order:
+            value = job.fields.get(param, None)
+            if not value:
+                continue
+            jss_id = self._jss_server.match(value)
+            if jss_id:
+                job.result["matched_by"] = param
+                return jss_id
+        return None
+
+    def _store_conflicts(self, job):
+        """Stores the Jamf Pro values that differ from the manifest, like DualVerifyController does when the user
+        chooses their own entries.
+
+        Args:
+            job (OffboardJob): Matched record.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        computer = job._computer
+        self._jss_server.prefetch(computer.jss_id, ["General"])
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Compare each identifier given in the manifest.
+        conflicts = {}
+        if computer.barcode_1 and computer.barcode_1 != self._jss_server.get_barcode_1(computer.jss_id):
+            computer.incorrect_barcode_1 = self._jss_server.get_barcode_1(computer.jss_id)
+            conflicts["barcode_1"] = computer.incorrect_barcode_1
+        if computer.barcode_2 and computer.barcode_2 != self._jss_server.get_barcode_2(computer.jss_id):
+            computer.incorrect_barcode_2 = self._jss_server.get_barcode_2(computer.jss_id)
+            conflicts["barcode_2"] = computer.incorrect_barcode_2
+        if computer.asset_tag and computer.asset_tag != self._jss_server.get_asset_tag(computer.jss_id):
+            computer.incorrect_asset = self._jss_server.get_asset_tag(computer.jss_id)
+            conflicts["asset_tag"] = computer.incorrect_asset
+        if computer.serial_number and computer.serial_number != self._jss_server.get_serial(computer.jss_id):
+            computer.incorrect_serial = self._jss_server.get_serial(computer.jss_id)
+            conflicts["serial_number"] = computer.incorrect_serial
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if conflicts:
+            job.result["conflicts"] = conflicts
+
+
+def summarize(results):
+    """Counts the results by status.
+
+    Args:
+        results (list): Results returned by BatchOffboarder.run.
+
+    Returns:
+        Summary message (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    statuses = ", ".join("{} {}".format(count, status) for status, count in sorted(counts.items()))
+    return "Batch offboard finished: {} record(s); {}.".format(len(results), statuses)
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Parse the arguments.
+    parser = argparse.ArgumentParser(description="Offboard the computers in a manifest without the GUI.")
+    parser.add_argument("manifest", help="CSV or JSONL manifest of the computers to offboard.")
+    parser.add_argument("--offboard-config", default="Default.xml",
+                        help="Offboard config in config/offboard_configs. Defaults to Default.xml.")
+    parser.add_argument("--results", default=None,
+                        help="JSONL file the results are appended to. Defaults to <manifest>_results.jsonl.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of records processed at the same time.")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum requests per second sent to Jamf Pro. No limit by default.")
+    parser.add_argument("--burst", type=int, default=None,
+                        help="Maximum requests sent to Jamf Pro in a burst. Defaults to the rate.")
+    parser.add_argument("--max-attempts", type=int, default=None,
+                        help="Attempts for a Jamf Pro request that fails with a URL error or HTTP 429/5xx. "
+                             "Defaults to retry_attempts in jamf_pro.plist.")
+    parser.add_argument("--docs", action="store_true", help="Create a Jamf Pro document for every record.")
+    parser.add_argument("--print", action="store_true", dest="print_docs",
+                        help="Create and print a Jamf Pro document for every record through the print queue.")
+    parser.add_argument("--labels", metavar="PDF", default=None,
+                        help="Create a single PDF with the labels of every offboarded computer, after an index.")
+    parser.add_argument("--printer", default=None, help="CUPS printer to print to. Defaults to the default printer.")
+    parser.add_argument("--config-dir", default=os.path.join(os.path.dirname(blade_runner_dir), "config"),
+                        help="Configuration directory. Defaults to Blade Runner's config directory.")
+    args = parser.parse_args()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read from jss config plist and set up the Jamf Pro server
+    jss_server_data = plistlib.readPlist(os.path.join(args.config_dir, "jamf_pro_configs/jamf_pro.plist"))
+    jss_server = JssServer(**jss_server_data)
+    request_stats = RequestStats()
+    jss_server.add_request_hooks(post=request_stats.post)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read the search params, Slack config, and the offboard config.
+    search_params = plistlib.readPlist(os.path.join(args.config_dir, "search_params_configs/search_params.plist"))
+    slack_data = plistlib.readPlist(os.path.join(args.config_dir, "slack_configs/slack.plist"))
+    offboard_config = xml_minifier.minify_file(os.path.join(args.config_dir, "offboard_configs", args.offboard_config))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Offboard every record in the manifest.
+    records = read_manifest(args.manifest)
+    results_file = args.results or "{}_results.jsonl".format(os.path.splitext(args.manifest)[0])
+    retry_policy = RetryPolicy(attempts=args.max_attempts) if args.max_attempts else None
+    engine = BatchEngine(max_in_flight=args.workers, rate=args.rate, burst=args.burst, retry_policy=retry_policy)
+    # The documents are printed by a background spooler while the records are offboarded. With --labels, only the
+    # labels PDF is printed, once every record is done.
+    spooler = PrintSpooler(printer=args.printer) if args.print_docs else None
+    if spooler is not None:
+        spooler.start()
+    offboarder = BatchOffboarder(jss_server, offboard_config, search_params, create_docs=args.docs, engine=engine,
+                                 spooler=None if args.labels else spooler)
+    try:
+        results = offboarder.run(records, results_file)
+        if args.labels:
+            entries = offboarder.create_labels(args.labels)
+            print("Labels of {} computer(s) written to {}".format(
+                len([entry for entry in entries if entry["page"] is not None]), args.labels))
+            if spooler is not None:
+                spooler.submit(args.labels)
+    finally:
+        if spooler is not None:
+            spooler.stop()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Report the outcome.
+    summary = summarize(results)
+    if jss_server.retries:
+        summary += " {} request(s) retried.".format(jss_server.retries)
+    jobs = [spooler.job(result["print_job"]) for result in results if "print_job" in result]
+    if jobs:
+        sent = len([job for job in jobs if job and job["state"] in ["submitted", "printed"]])
+        summary += " {} of {} document(s) sent to the printer.".format(sent, len(jobs))
+    logger.info(summary)
+    logger.info(request_stats.summary())
+    print(summary)
+    print("Results written to {}".format(results_file))
+    if slack_data['slack_enabled'] == "True":
+        current_ip = socket.gethostbyname(socket.gethostname())
+        slack_outbox.outbox.post(slack_data['slack_url'], slack_data['slack_channel'], current_ip, summary)
+        # The process is about to exit. Whatever can't be sent now stays queued for the next run.
+        if slack_outbox.outbox.flush():
+            print("The Slack message couldn't be sent yet. It's queued in {}".format(slack_outbox.outbox.path))
+
+
+if __name__ == "__main__":
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Set up logging vars.
+    fmt = '%(asctime)s %(process)d: %(levelname)8s: %(name)s.%(funcName)s: %(message)s'
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    log_dir = os.path.join(os.path.expanduser("~"), "Library/Logs/Blade Runner")
+    filepath = os.path.join(log_dir, script_name + ".log")
+
+    # Create log path.
+    try:
+        os.makedirs(log_dir)
+    except OSError as e:
+        if e.errno != 17:
+            raise
+
+    # Set up logger.
+    logging.basicConfig(level=logging.DEBUG, format=fmt, filemode='a', filename=filepath)
+    logger = logging.getLogger(script_name)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Run main.
+    main()
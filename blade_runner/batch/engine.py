@@ -0,0 +1,116 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+import time
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket rate limiter. Tokens are added at a steady rate up to the capacity of the bucket, and
+    every acquire() takes one token, waiting for it if the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Initialize the bucket. The bucket starts full.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int): Maximum number of tokens, i.e., the largest burst allowed. Defaults to the rate rounded
+                up to at least 1.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self._tokens = self.capacity
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token from the bucket. Blocks until a token is available.
+
+        Returns:
+            Seconds spent waiting (float).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        waited = 0.0
+        while True:
+            with self._lock:
+                # Refill the bucket for the time that has passed.
+                now = time.time()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                # Take a token if there is one. Otherwise, compute how long until there is one.
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class BatchEngine(object):
+    """Runs per-record pipelines concurrently, with at most max_in_flight records processed at once.
+
+    The engine also carries the request settings of the batch. They aren't applied by the engine itself; they are
+    meant to be installed on the JssServer, which applies them to every request it sends.
+
+    Attributes
+        rate_limiter (TokenBucket): Limits the rate of requests to the JSS, or None for no limit.
+        retry_policy (RetryPolicy): Retries requests that fail with a transient error, or None to keep the policy of
+            the JssServer.
+    """
+
+    def __init__(self, max_in_flight=4, rate=None, burst=None, retry_policy=None):
+        """Initialize the engine.
+
+        Args:
+            max_in_flight (int): Maximum number of records processed at the same time.
+            rate (float): Maximum requests per second to the JSS. None for no limit.
+            burst (int): Maximum number of requests sent in a burst. Defaults to the rate.
+            retry_policy (RetryPolicy): Retry policy for the requests of the batch.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = TokenBucket(rate, burst) if rate else None
+        self.retry_policy = retry_policy
+
+    def map(self, func, items):
+        """Calls func on every item with at most max_in_flight calls running at once.
+
+        Args:
+            func (func): Function to call with each item. Should handle its own errors.
+            items (list): Items to process.
+
+        Returns:
+            Generator of the return values of func, in the order they finish.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        pool = ThreadPool(self.max_in_flight)
+        try:
+            for result in pool.imap_unordered(func, items):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
@@ -38,8 +38,12 @@ class DualVerifyController(EntryController):
     Attributes
         proceed (bool): Status on how the view was closed. If the view is closed by the x button, proceed is False,
                         otherwise, it's True.
+        subsets (list): JSS record subsets the view is filled from. They are fetched in a single request.
 
     """
+
+    subsets = ["General"]
+
     def __init__(self, master, computer, verify_params, jss_server):
         """Stores view and shows and populates widgets according to search params."""
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -110,6 +114,9 @@ class DualVerifyController(EntryController):
             void
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Fetch every subset the view needs in one request.
+        jss_server.prefetch(computer.jss_id, self.subsets)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get the JSS data for the computer.
         computer.jss_barcode_1 = jss_server.get_barcode_1(computer.jss_id)
         computer.jss_barcode_2 = jss_server.get_barcode_2(computer.jss_id)
@@ -29,25 +29,28 @@ import subprocess
 import tkMessageBox
 import Tkinter as tk
 import traceback as tb
-import xml.etree.cElementTree as ET
 
 blade_runner_dir = os.path.dirname(os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(blade_runner_dir, "dependencies"))
 sys.path.insert(0, os.path.join(blade_runner_dir, "slack"))
 sys.path.insert(0, blade_runner_dir)
 
+from blade_runner.jamf_pro import xml_minifier
 from blade_runner.jamf_pro.jss_doc import JssDoc
 from blade_runner.views.main_view import MainView
 from blade_runner.user_actions import user_actions
 from blade_runner.jamf_pro.computer import Computer
 from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.jamf_pro.instrumentation import RequestStats
 from blade_runner.windows.stall_window import StallWindow
 from blade_runner.controllers.controller import Controller
+from blade_runner.journal import offboard_journal
+from blade_runner.journal.offboard_journal import OffboardJournal
 from blade_runner.jamf_pro.params import SearchParams, VerifyParams
 from blade_runner.controllers.search_controller import SearchController
 from blade_runner.controllers.dual_verify_controller import DualVerifyController
 from blade_runner.controllers.verification_controller import VerificationController
-from blade_runner.dependencies.management_tools.slack import IncomingWebhooksSender as IWS
+from blade_runner.slack import slack_outbox
 
 
 # TODO Interface with a Trello board and dynamically create lists for the DEP
@@ -78,6 +81,10 @@ class MainController(Controller):
         # JSS server
         self._jss_server = server
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Aggregate every request sent to the JSS. A summary is logged after each computer is processed.
+        self._request_stats = RequestStats()
+        self._jss_server.add_request_hooks(post=self._request_stats.post)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Stores information about the computer
         self._computer = Computer()
         self._computer.serial_number = self._computer.get_serial()
@@ -118,6 +125,10 @@ class MainController(Controller):
         self._slack_dir = os.path.join(self._blade_runner_dir, "slack")
         self._offboard_configs_dir = os.path.join(self._config_dir, "offboard_configs")
         self._secure_erase_dir = os.path.join(self._blade_runner_dir, "secure_erase")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Journal of the current offboard. Offboards that are interrupted can be resumed from their journal.
+        self._journal = None
+        self._journal_dir = offboard_journal.default_journal_dir
 
     def _exception_messagebox(self, exc, value, traceback):
         """Displays a message box with the accompanying exception message whenver an exception occurs.
@@ -158,9 +169,54 @@ class MainController(Controller):
         # Refocus on the window.
         self.refocus()
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Tell the user about offboards that were interrupted and offer to resume them.
+        self._resume_unfinished()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Make this window the main loop.
         self._main_view.mainloop()
 
+    def _resume_unfinished(self):
+        """Shows the offboards that were interrupted, e.g., by a network drop, and asks the user whether to resume
+        them. Offboards that aren't resumed keep their journals and are shown again on the next start.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        journals = OffboardJournal.unfinished(self._journal_dir)
+        if not journals:
+            return
+        lines = []
+        for journal in journals:
+            self.logger.warn("Offboard of JSS ID {} was interrupted: {}".format(journal.jss_id, journal.path))
+            steps = ", ".join(step for step, payload in journal.pending())
+            lines.append("JSS ID {}: {}".format(journal.jss_id, steps))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Ask the user whether to resume the offboards now.
+        msg = "{} offboard(s) didn't finish. The steps left are:\n\n{}\n\nResume them now? Steps that already " \
+              "finished won't be run again.".format(len(journals), "\n".join(lines))
+        if not tkMessageBox.askyesno("Interrupted Offboards", msg, parent=self._main_view):
+            self.logger.info("Interrupted offboards weren't resumed.")
+            return
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Resume every journal. One failing doesn't stop the others.
+        failed = []
+        for journal in journals:
+            try:
+                offboard_journal.resume(journal, self._jss_server, self._slack_data)
+                self.logger.info("Resumed offboard of JSS ID {}".format(journal.jss_id))
+            except Exception as e:
+                self.logger.exception("Resuming {} failed.".format(journal.path))
+                failed.append("JSS ID {}: {}".format(journal.jss_id, e))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if failed:
+            tkMessageBox.showerror("Interrupted Offboards", "Resuming failed for:\n\n{}\n\nThey'll be shown again "
+                                   "the next time Blade-Runner starts.".format("\n".join(failed)),
+                                   parent=self._main_view)
+        else:
+            tkMessageBox.showinfo("Interrupted Offboards", "Resumed {} offboard(s).".format(len(journals)),
+                                  parent=self._main_view)
+
     def secure_erase(self):
         """Runs secure_erase.sh, which runs secure_erase_internals, in a new terminal window.
 
@@ -196,6 +252,9 @@ class MainController(Controller):
         # Create a new SearchParams object.
         self.search_params = SearchParams(self.search_params_input)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Drop any Jamf Pro data cached for the previous computer.
+        self._jss_server.clear_cache()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.info("Blade-Runner reset.")
 
     def populate_config_combobox(self):
@@ -244,15 +303,9 @@ class MainController(Controller):
             void
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Parse XML file into an XML tree.
+        # Make sure the XML file is well-formed, minify it, and store it.
         xml_file = os.path.join(self._offboard_configs_dir, offboard_config)
-        xml_tree = ET.parse(xml_file)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the root of the tree.
-        xml_root = xml_tree.getroot()
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create offboard xml string and store it.
-        self._offboard_config = ET.tostring(xml_root)
+        self._offboard_config = xml_minifier.minify_file(xml_file)
 
     def search_sequence(self, input_type):
         """Determines the search window sequence based on the input type and previous search params.
@@ -264,22 +317,37 @@ class MainController(Controller):
             void
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Process the input type and handle the JSS search.
-        self._main(input_type)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # For every search parameter enabled
-        for param in self.search_params:
-            # If search parameter hasn't been searched yet.
-            if not self.search_params.was_searched(param):
-                # If user hasn't canceled operation and no match was found
-                if self._proceed is True and self._computer.jss_id is None:
-                    # Process the input type and handle the JSS search.
-                    self._main(param)
+        try:
+            # Process the input type and handle the JSS search.
+            self._main(input_type)
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # For every search parameter enabled
+            for param in self.search_params:
+                # If search parameter hasn't been searched yet.
+                if not self.search_params.was_searched(param):
+                    # If user hasn't canceled operation and no match was found
+                    if self._proceed is True and self._computer.jss_id is None:
+                        # Process the input type and handle the JSS search.
+                        self._main(param)
+        finally:
+            # Log the requests made for this computer, whether or not processing it succeeded.
+            self._log_request_summary()
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # All search params have been searched and Blade-Runner has finished processing the computer.
         # Restart Blade-Runner.
         self.restart()
 
+    def _log_request_summary(self):
+        """Logs a summary of the requests sent to the JSS since the last summary and starts a new one.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if self._request_stats.totals()["requests"]:
+            self.logger.info(self._request_stats.summary())
+        self._request_stats.reset()
+
     def _main(self, input_type):
         """Handles search events.
 
@@ -347,8 +415,12 @@ class MainController(Controller):
         elif self._computer.jss_id is None:
             return
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Write the plan of the offboard to the journal before changing anything, so that it can be resumed if it's
+        # interrupted.
+        self._journal = self._create_journal()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Push computer's identity fields to the JSS.
-        self._jss_server.push_identity_fields(self._computer)
+        self._journal.run("identity", self._jss_server.push_identity_fields, self._computer)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Offboard computer
         self._offboard()
@@ -357,7 +429,11 @@ class MainController(Controller):
         self._slack_handler(self._slack_data)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Create and print JssDoc according to settings.
-        self._jss_doc_handler(self._computer, self._jss_server, self._doc_settings)
+        self._journal.run("doc", self._jss_doc_handler, self._computer, self._jss_server, self._doc_settings)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Every step is done, so the journal is no longer needed.
+        self._journal.finish()
+        self._journal = None
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.info("Blade Runner successfully finished.")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -448,29 +524,50 @@ class MainController(Controller):
         # Store exit status of the view.
         self._proceed = self._verify_controller.proceed
 
-    def _offboard(self):
-        """Offboard computer object with the offboard config.
+    def _create_journal(self):
+        """Creates the journal of the offboard with the data every step needs: the identity XML, the offboard config
+        updated by the user, the Slack message, and whether or not the document is printed.
 
         Returns:
-
+            OffboardJournal
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Update the JSS record according to the implementation of the user.
+        # Update the offboard config according to the implementation of the user.
         user_actions.update_offboard_config(self)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Push the offboard config to the JSS to offboard the computer.
-        self._jss_server.push_xml_str(self._offboard_config, self._computer.jss_id)
+        # Plan the Jamf Pro steps.
+        plan = [("identity", {"xml": self._jss_server.identity_xml(self._computer)}),
+                ("offboard", {"xml": self._offboard_config}),
+                ("managed_check", {})]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Plan the Slack message according to the implementation of the user.
+        if self._slack_data['slack_enabled'] == "True":
+            message = user_actions.update_slack_message(self, self._slack_data['default_message'])
+            plan.append(("slack", {"message": message}))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        plan.append(("doc", {"print": self._doc_settings['print'].lower() == "true"}))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return OffboardJournal.create(self._journal_dir, self._computer, plan)
+
+    def _offboard(self):
+        """Offboard computer object with the offboard config.
+
+        Returns:
+
+        """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the new managed status and make sure it's false
-        post_managed_status = self._jss_server.get_managed_status(self._computer.jss_id)
-        self.logger.debug("post_managed_status: {}".format(post_managed_status))
+        # Push the offboard config to the JSS to offboard the computer. The config was updated according to the
+        # implementation of the user when the journal was created.
+        self._journal.run("offboard", self._jss_server.push_xml_str, self._offboard_config, self._computer.jss_id)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Make sure managed status is false. If not, exit.
-        if post_managed_status != 'false':
-            msg = "Managed status was not false after offboarding. Aborting."
-            self.logger.error(msg)
+        # Get the new managed status and make sure it's false. If not, exit.
+        try:
+            self._journal.run("managed_check", offboard_journal.check_managed_status, self._jss_server,
+                              self._computer.jss_id)
+        except SystemError as e:
+            self.logger.error(e)
             self.restart()
-            raise SystemError(msg)
+            raise
 
     def _slack_handler(self, slack_data):
         """Handles all Slack related items: sends Slack message and starts Slackify daemon.
@@ -482,11 +579,11 @@ class MainController(Controller):
             void
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Notify slack channel that offboard tool has finished.
+        # Notify slack channel that offboard tool has finished. The message was updated according to the
+        # implementation of the user when the journal was created.
         if slack_data['slack_enabled'] == "True":
-            message = slack_data['default_message']
-            message = user_actions.update_slack_message(self, message)
-            self.send_slack_message(message)
+            message = self._journal.payload("slack")["message"]
+            self._journal.run("slack", self.send_slack_message, message)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Start Slackify daemon
         if slack_data['slackify_daemon_enabled'] == 'True':
@@ -509,11 +606,8 @@ class MainController(Controller):
         # Prepare document for printing
         doc = JssDoc(jss_server, computer)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create html document from settings in JssDoc.
-        doc.create_html()
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Convert HTML document into a PDF document.
-        doc.html_to_pdf()
+        # Create PDF document from settings in JssDoc.
+        doc.create_pdf(doc_settings.get('pdf_renderer', "native"))
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # If document printing is enabled, print to the default printer.
         # if print_doc:
@@ -522,7 +616,8 @@ class MainController(Controller):
             doc.print_pdf_to_default()
 
     def send_slack_message(self, message):
-        """Sends a Slack message to a specified channel and Slack url.
+        """Queues a Slack message to a specified channel and Slack url. The message is sent by the background thread of
+        the Slack outbox, so a slow or unreachable Slack never blocks the window.
 
         Args:
             message (str): Message to be sent to the Slack channel.
@@ -534,11 +629,8 @@ class MainController(Controller):
         # Get the current IP
         current_ip = socket.gethostbyname(socket.gethostname())
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Set up the Slack bot
-        slack_bot = IWS(self._slack_data['slack_url'], bot_name=current_ip, channel=self._slack_data['slack_channel'])
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Send the Slack message
-        slack_bot.send_message(message)
+        # Queue the Slack message
+        slack_outbox.outbox.post(self._slack_data['slack_url'], self._slack_data['slack_channel'], current_ip, message)
 
     def start_slackify_reminder_dameon(self):
         """Start the Slackify reminder daemon.
@@ -665,6 +757,9 @@ def main():
     # Read from Slack config plist to set up Slack notifications
     slack_plist = os.path.join(blade_runner_dir, "config/slack_configs/slack.plist")
     slack_data = plistlib.readPlist(slack_plist)
+    # Send the Slack messages queued by earlier runs in the background.
+    if slack_data['slack_enabled'] == "True":
+        slack_outbox.outbox.start()
 
     # Read from verify params plist to set up verification parameters
     verify_config = os.path.join(blade_runner_dir, "config/verify_params_configs/verify_params.plist")
@@ -681,6 +776,11 @@ def main():
     # Run the application
     app = MainController(root, jss_server, slack_data, verify_params, search_params, print_settings)
     app.run()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # The outbox thread dies with the process. Send the queued Slack messages, e.g., the one of an offboard that just
+    # finished, before exiting. Whatever can't be sent now stays queued for the next launch.
+    if slack_data['slack_enabled'] == "True":
+        slack_outbox.outbox.flush()
     logger.info("Blade Runner exiting.")
 
 
@@ -25,6 +25,9 @@ import subprocess
 import webbrowser
 import logging
 
+from blade_runner.document.pdf import PdfDocument, html_font_points
+from blade_runner.document.print_spooler import PrintSpooler, SUBMITTED
+
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 logger = logging.getLogger(__name__)
 
@@ -69,42 +72,89 @@ def html_to_pdf(html):
         logger.error(e.output)
 
 
-def print_pdf_to_default(pdf):
-    """Print PDF file to default printer.
+def item_runs(item):
+    """Converts an item tuple, e.g., ("SSD", "Yes", "RAM", "16 GB"), into the runs of a PDF line: each key in bold
+    followed by its value, with the pairs separated by spaces.
+
+    Args:
+        item (tuple): Keys and values, alternating.
+
+    Returns:
+        List of (text, bold, color) tuples. Strings are kept as they are, so names from Jamf Pro that aren't ASCII
+        reach pdf_string() as unicode.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    def text(value):
+        return value if isinstance(value, basestring) else str(value)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    runs = []
+    for i in range(1, len(item), 2):
+        if i > 1:
+            runs.append(("    ", False, None))
+        runs.append((text(item[i - 1]) + ": ", True, None))
+        runs.append((text(item[i]), False, None))
+    return runs
+
+
+def items_to_pdf(items, pdf, font_size=5, footer=None):
+    """Writes a label-style PDF directly from item tuples, one line per item, without an HTML file or cupsfilter.
+
+    Args:
+        items (list): Item tuples, see item_runs().
+        pdf (str): Path of the PDF.
+        font_size (int): HTML font size of the text, 1 to 7.
+        footer (list): Lines added after the items, as lists of (text, bold, color) tuples.
+
+    Returns:
+        Path of the PDF (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    document = PdfDocument()
+    write_items(document, items, font_size, footer)
+    return document.write(pdf)
+
+
+def write_items(document, items, font_size=5, footer=None):
+    """Adds item tuples to a PDF document, one line per item, followed by the footer lines.
+
+    Args:
+        document (PdfDocument): Document to add the lines to.
+        items (list): Item tuples, see item_runs().
+        font_size (int): HTML font size of the text, 1 to 7.
+        footer (list): Lines added after the items, as lists of (text, bold, color) tuples.
 
     Returns:
         void
     """
-    base_no_ext = os.path.splitext(os.path.basename(pdf))[0]
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Build AppleScript to print PDF to default printer from Preview.
-    script = r'''
-    set theFile to POSIX path of "{}"
-    do shell script("open " & quoted form of theFile) 
-    tell application "Preview"
-        delay 2
-        set theOpenDocs to get name of every window
-        repeat with theDoc in theOpenDocs
-            if theDoc contains "{}" then
-                set theWindow to the first item of (get the windows whose name is theDoc)
-                print theWindow
-            end if
-        end repeat
-    end tell
-    '''.format(pdf, base_no_ext)
+    # Space the lines like the paragraphs of the HTML document.
+    size = html_font_points(font_size)
+    for item in items:
+        document.add_line(item_runs(item), size, leading=size * 1.8)
+    for runs in footer or []:
+        document.add_line(runs, size, leading=size * 1.8)
+
+
+def print_pdf_to_default(pdf, spooler=None):
+    """Print PDF file to default printer. The PDF is added to the print queue and the queue is sent to CUPS right
+    away. If lp rejects the job, it stays queued and is retried by the next print or by the print spooler.
+
+    Args:
+        pdf (str): Path of the PDF.
+        spooler (PrintSpooler): Queue to add the PDF to. Defaults to the queue in default_queue_dir.
+
+    Returns:
+        The print job (dict).
+    """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Write AppleScript text to a bash file.
-    with open("/tmp/print.sh", "w+") as f:
-        f.write(script)
+    spooler = spooler or PrintSpooler()
+    job = spooler.submit(pdf)
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    try:# run the AppleScript with osascript.
-        cmd = ['/usr/bin/osascript', '/tmp/print.sh']
-        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+    # Send the queue to CUPS. This also retries documents that failed to print earlier.
+    spooler.process()
+    job = spooler.job(job["id"])
+    if job["state"] == SUBMITTED:
         logger.info("Print successful.")
-        # Append file name with "printed".
-        pre_ext, ext = os.path.splitext(pdf)
-        os.rename(pdf, "{}_printed.pdf".format(pre_ext))
-    except subprocess.CalledProcessError as e:
-        logger.error(str(e.output))
-        logger.error("Document didn't print. Make sure a default printer has been configured.")
-
+    else:
+        logger.error("Document didn't print yet. Make sure a default printer has been configured.")
+    return job
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+
+"""Writes simple text PDFs without any external tool. Text is set in Helvetica and Helvetica-Bold, which every PDF
+reader provides, so no font is embedded. Lines are laid out top to bottom and a new page is started when a page is
+full. Lines aren't wrapped.
+"""
+
+import os
+import logging
+import itertools
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Points of the HTML <font size="#"> values the documents are written with.
+HTML_FONT_POINTS = {1: 7.5, 2: 10, 3: 12, 4: 13.5, 5: 18, 6: 24, 7: 36}
+
+# PDF color operators of the colors used in the documents.
+COLORS = {None: "0 g", "black": "0 g", "red": "1 0 0 rg"}
+
+
+def html_font_points(size):
+    """Converts an HTML font size to points. Sizes above 7 are shown as 7, like browsers do.
+
+    Args:
+        size (int): HTML font size, 1 to 7.
+
+    Returns:
+        Points (float).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return HTML_FONT_POINTS[max(1, min(7, int(size)))]
+
+
+def pdf_string(text):
+    """Encodes text as a PDF literal string in WinAnsiEncoding. Characters that can't be encoded are replaced by "?".
+
+    Args:
+        text (str or unicode): Text. A str is read as UTF-8.
+
+    Returns:
+        PDF literal string (str), e.g., (Name: \\(none\\)).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if not isinstance(text, unicode):
+        text = str(text).decode("utf-8", "replace")
+    encoded = text.encode("cp1252", "replace")
+    return "(" + encoded.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PdfDocument(object):
+    """A text document made of lines. Each line is a list of runs, and each run is a (text, bold, color) tuple, e.g.,
+    [("Name: ", True, None), ("lab-mac-01", False, "red")]. The runs of a line are set one after the other.
+
+    Attributes:
+        page_size (tuple): Width and height of the pages, in points. Defaults to US Letter.
+        margin (float): Margin around the text, in points.
+    """
+
+    def __init__(self, page_size=(612, 792), margin=54):
+        """Initialize the document with one empty page.
+
+        Args:
+            page_size (tuple): Width and height of the pages, in points.
+            margin (float): Margin around the text, in points.
+        """
+        self.page_size = page_size
+        self.margin = margin
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Content stream operators of each page, and the top of the free space on the last page.
+        self._pages = [[]]
+        self._y = page_size[1] - margin
+
+    @property
+    def page_count(self):
+        """Number of pages (int)."""
+        return len(self._pages)
+
+    def add_line(self, runs, size=12, leading=None):
+        """Adds a line below the previous one. Starts a new page if the line doesn't fit.
+
+        Args:
+            runs (list): (text, bold, color) tuples. color is None, "black" or "red".
+            size (float): Font size in points.
+            leading (float): Distance from the top of this line to the top of the next one. Defaults to 1.2 times the
+                size.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        leading = leading or size * 1.2
+        if self._y - size < self.margin and self._pages[-1]:
+            self._pages.append([])
+            self._y = self.page_size[1] - self.margin
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Set the runs from the left margin, on a baseline one font size below the top of the line.
+        ops = ["BT", "{0:g} {1:g} Td".format(self.margin, round(self._y - size, 2))]
+        for text, bold, color in runs:
+            ops.append("/{0} {1:g} Tf {2} {3} Tj".format("F2" if bold else "F1", size, COLORS[color],
+                                                         pdf_string(text)))
+        ops.append("ET")
+        self._pages[-1].append(" ".join(ops))
+        self._y -= leading
+
+    def new_page(self):
+        """Starts a new page. Does nothing if the current page is still empty.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if self._pages[-1]:
+            self._pages.append([])
+        self._y = self.page_size[1] - self.margin
+
+    def extend(self, other):
+        """Adds the pages of another document after the pages of this one. Lines added afterwards go on the last
+        page of the other document.
+
+        Args:
+            other (PdfDocument): Document with the same page size.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not self._pages[-1]:
+            self._pages.pop()
+        self._pages.extend(other._pages)
+        self._y = other._y
+
+    def add_space(self, points):
+        """Adds vertical space below the previous line.
+
+        Args:
+            points (float): Space in points.
+
+        Returns:
+            void
+        """
+        self._y -= points
+
+    def to_string(self):
+        """Serializes the document.
+
+        Returns:
+            PDF (str).
+        """
+        return "".join(self._chunks())
+
+    def _chunks(self):
+        """Serializes the document one object at a time, so it can be written to a file without building the whole
+        document in memory.
+
+        Returns:
+            Generator of chunks of the PDF (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Objects 1 to 4 are the catalog, the page tree and the two fonts. Each page is followed by its content.
+        width, height = self.page_size
+        kids = " ".join("{0} 0 R".format(5 + 2 * i) for i in range(len(self._pages)))
+        objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+                   "<< /Type /Pages /Kids [{0}] /Count {1} >>".format(kids, len(self._pages)),
+                   "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                   "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+
+        def page_objects():
+            for i, page in enumerate(self._pages):
+                content = "\n".join(page)
+                yield ("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {0:g} {1:g}] "
+                       "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {2} 0 R >>"
+                       .format(width, height, 6 + 2 * i))
+                yield "<< /Length {0} >>\nstream\n{1}\nendstream".format(len(content), content)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Write the objects, then the cross-reference table of their byte offsets.
+        header = "%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        yield header
+        offsets = []
+        position = len(header)
+        for number, body in enumerate(itertools.chain(objects, page_objects()), 1):
+            offsets.append(position)
+            chunk = "{0} 0 obj\n{1}\nendobj\n".format(number, body)
+            yield chunk
+            position += len(chunk)
+        yield "xref\n0 {0}\n0000000000 65535 f \n".format(len(offsets) + 1)
+        for offset in offsets:
+            yield "{0:010d} 00000 n \n".format(offset)
+        yield "trailer\n<< /Size {0} /Root 1 0 R >>\nstartxref\n{1}\n%%EOF\n".format(len(offsets) + 1, position)
+
+    def write(self, path):
+        """Writes the document to a file.
+
+        Args:
+            path (str): Path of the PDF.
+
+        Returns:
+            Path of the PDF (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in self._chunks():
+                f.write(chunk)
+        os.rename(tmp_path, path)
+        return path
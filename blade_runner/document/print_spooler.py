@@ -0,0 +1,541 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Print queue for generated documents.
+
+Documents are submitted by copying them into a queue directory with a small JSON file that tracks the state of the
+job. A spooler pass sends the queued documents to CUPS with lp, several documents per lp call, and a refresh pass
+checks lpstat to find out which jobs have finished printing. Submitting only copies a file, so offboarding never
+waits on the printer, and the queue can be drained by the same process in a background thread or by a separate
+spooler process. Passes over the same queue directory are serialized with a lock file, so several Blade Runner
+processes can share a queue without printing a document twice.
+
+Job states:
+    queued: Waiting to be sent to CUPS. Jobs that lp rejected wait here until their next attempt.
+    submitted: Accepted by CUPS and not finished printing.
+    printed: No longer in the CUPS queue.
+    failed: Rejected by lp max_attempts times. The PDF is kept so the job can be queued again.
+
+Example:
+
+    # Current working directory is "/path/to/Blade Runner.app/Contents/Resources/Blade Runner/"
+    python -m blade_runner.document.print_spooler --status
+    python -m blade_runner.document.print_spooler --interval 5
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import fcntl
+import errno
+import shutil
+import logging
+import argparse
+import threading
+import subprocess as sp
+
+blade_runner_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(blade_runner_dir))
+
+from blade_runner.utils.command_runner import CommandRunner
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+logger = logging.getLogger(__name__)
+
+# Directory the print queue is kept in.
+default_queue_dir = os.path.join(os.path.expanduser("~"), "Library/Application Support/Blade Runner/print_queue")
+
+# Job states.
+QUEUED = "queued"
+SUBMITTED = "submitted"
+PRINTED = "printed"
+FAILED = "failed"
+
+# Matches the job ID in lp's output, e.g., "request id is Front_Desk-42 (3 file(s))".
+request_id_re = re.compile(r"request id is (\S+)")
+
+
+class PrintSpooler(object):
+    """Queues PDFs in a directory and sends them to CUPS in batches.
+
+    Attributes:
+        queue_dir (str): Directory of the queued PDFs and their job files.
+        printer (str): CUPS destination of submitted jobs. None for the default printer.
+        batch_size (int): Maximum number of documents sent to CUPS with a single lp call.
+        max_attempts (int): Number of times lp is run for a job before the job fails.
+        retry_delay (float): Seconds before a rejected job is sent again. Doubles after every attempt.
+        keep_days (float): Days the job files of printed and failed jobs are kept.
+    """
+    lp = "/usr/bin/lp"
+    lpstat = "/usr/bin/lpstat"
+
+    def __init__(self, queue_dir=default_queue_dir, printer=None, batch_size=25, max_attempts=3, retry_delay=10,
+                 keep_days=7, runner=None):
+        """Initialize the spooler and create the queue directory if it doesn't exist.
+
+        Args:
+            queue_dir (str): Directory of the queue.
+            printer (str): CUPS destination of submitted jobs. None for the default printer.
+            batch_size (int): Maximum number of documents per lp call.
+            max_attempts (int): Number of times lp is run for a job before the job fails.
+            retry_delay (float): Seconds before a rejected job is sent again.
+            keep_days (float): Days the job files of finished jobs are kept.
+            runner (CommandRunner): Runs lp and lpstat. Defaults to a runner with a 30 second timeout.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.queue_dir = queue_dir
+        self.printer = printer
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.keep_days = keep_days
+        self._runner = runner or CommandRunner(timeout=30)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The background thread sleeps on _wake between passes. submit() sets it so new jobs go out right away.
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            os.makedirs(queue_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def submit(self, pdf, title=None):
+        """Adds a copy of the PDF to the queue. The copy is renamed to <job ID>_printed.pdf once CUPS accepts it. The
+        PDF itself is left as it is.
+
+        Args:
+            pdf (str): Path of the PDF.
+            title (str): Title of the print job. Defaults to the file name of the PDF.
+
+        Returns:
+            The job (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Job IDs sort in the order the jobs were submitted.
+        job_id = "{0:.6f}-{1}".format(time.time(), uuid.uuid4().hex[:8])
+        job = {
+            "id": job_id,
+            "source": os.path.abspath(pdf),
+            "title": title or os.path.basename(pdf),
+            "printer": self.printer,
+            "state": QUEUED,
+            "attempts": 0,
+            "next_attempt": 0,
+            "cups_job": None,
+            "error": None,
+            "submitted": time.time(),
+            "updated": time.time(),
+        }
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Copy the PDF before writing the job file, so a spooler never sees a job without its PDF.
+        queued_pdf = self._path(job_id, ".pdf")
+        shutil.copyfile(pdf, queued_pdf + ".tmp")
+        os.rename(queued_pdf + ".tmp", queued_pdf)
+        self._save(job)
+        self.logger.info("Queued {0} as print job {1}".format(pdf, job_id))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._wake.set()
+        return job
+
+    def job(self, job_id):
+        """Reads a job from the queue.
+
+        Args:
+            job_id (str): ID of the job.
+
+        Returns:
+            The job (dict), or None if it isn't in the queue.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            with open(self._path(job_id, ".json")) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            # The job was purged, or never existed.
+            return None
+
+    def jobs(self, state=None):
+        """Reads the jobs in the queue.
+
+        Args:
+            state (str): Only return jobs in this state. None for every job.
+
+        Returns:
+            List of jobs (dict), oldest first.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        jobs = []
+        for name in sorted(os.listdir(self.queue_dir)):
+            if not name.endswith(".json"):
+                continue
+            # The job is None if another spooler purged it while the directory was being read.
+            job = self.job(name[:-len(".json")])
+            if job is not None and (state is None or job["state"] == state):
+                jobs.append(job)
+        return jobs
+
+    def status(self):
+        """Counts the jobs in each state.
+
+        Returns:
+            Dictionary of state to number of jobs.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        counts = dict.fromkeys([QUEUED, SUBMITTED, PRINTED, FAILED], 0)
+        for job in self.jobs():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
+
+    def process(self):
+        """Sends the queued jobs that are due to CUPS, batch_size documents per lp call. Does nothing if another
+        spooler is working on the queue.
+
+        Returns:
+            Number of jobs CUPS accepted (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._locked() as locked:
+            if not locked:
+                return 0
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Group the jobs that are due by printer. A single lp call can only print to one destination.
+            now = time.time()
+            by_printer = {}
+            for job in self.jobs(QUEUED):
+                if job["next_attempt"] <= now:
+                    by_printer.setdefault(job["printer"], []).append(job)
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            accepted = 0
+            for printer, jobs in by_printer.items():
+                for i in range(0, len(jobs), self.batch_size):
+                    accepted += self._send(printer, jobs[i:i + self.batch_size])
+            return accepted
+
+    def refresh(self):
+        """Checks lpstat for the submitted jobs that have finished and marks them printed. Also purges the job files
+        of finished jobs older than keep_days.
+
+        Returns:
+            Number of jobs marked printed (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._locked() as locked:
+            if not locked:
+                return 0
+            submitted = self.jobs(SUBMITTED)
+            if submitted:
+                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+                # List the CUPS jobs that haven't finished. If lpstat fails, check again on the next refresh.
+                try:
+                    output = self._runner.check_output([self.lpstat, "-W", "not-completed", "-o"])
+                except (sp.CalledProcessError, OSError) as e:
+                    self.logger.warn("Couldn't check print jobs with lpstat: {0}".format(e))
+                    submitted = []
+                else:
+                    active = set(line.split()[0] for line in output.splitlines() if line.strip())
+                    submitted = [job for job in submitted if job["cups_job"] not in active]
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Jobs no longer in the CUPS queue are done. Their PDF isn't needed anymore.
+            for job in submitted:
+                job["state"] = PRINTED
+                self._save(job)
+                self._remove(job["id"], "_printed.pdf")
+                self.logger.info("Print job {0} ({1}) printed.".format(job["id"], job["cups_job"]))
+            self._purge()
+            return len(submitted)
+
+    def requeue_failed(self):
+        """Queues the failed jobs again.
+
+        Returns:
+            Number of jobs queued (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._locked(blocking=True):
+            failed = self.jobs(FAILED)
+            for job in failed:
+                job.update(state=QUEUED, attempts=0, next_attempt=0, error=None)
+                self._save(job)
+        self._wake.set()
+        return len(failed)
+
+    def start(self, interval=5):
+        """Starts a background thread that runs process() and refresh() every interval seconds, and right away when
+        a job is submitted.
+
+        Args:
+            interval (float): Seconds between passes.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="print-spooler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=60):
+        """Sends the jobs that are queued and due to CUPS, then stops the background thread. Doesn't wait for the
+        jobs to finish printing.
+
+        Args:
+            timeout (float): Seconds to wait for the queue to drain.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self, interval):
+        """Body of the background thread.
+
+        Args:
+            interval (float): Seconds between passes.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        while True:
+            self._wake.clear()
+            accepted = 0
+            try:
+                accepted = self.process()
+                self.refresh()
+            except Exception:
+                self.logger.exception("Print spooler pass failed.")
+            if self._stop.is_set():
+                # Drain the jobs submitted during the last pass before exiting. Stop once a pass sends nothing: either
+                # nothing is due, lp rejected the jobs, or another spooler holds the queue and will send them.
+                if not accepted or not any(job["next_attempt"] <= time.time() for job in self.jobs(QUEUED)):
+                    return
+                continue
+            self._wake.wait(interval)
+
+    def _send(self, printer, jobs):
+        """Sends jobs to CUPS with a single lp call and updates their state.
+
+        Args:
+            printer (str): CUPS destination. None for the default printer.
+            jobs (list): Jobs to send.
+
+        Returns:
+            Number of jobs CUPS accepted (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        cmd = [self.lp]
+        if printer:
+            cmd += ["-d", printer]
+        title = jobs[0]["title"] if len(jobs) == 1 else "Blade Runner ({0} documents)".format(len(jobs))
+        cmd += ["-t", title, "--"] + [self._path(job["id"], ".pdf") for job in jobs]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            output = self._runner.check_output(cmd, merge_stderr=True)
+            match = request_id_re.search(output)
+            if match is None:
+                raise sp.CalledProcessError(0, cmd, output)
+        except (sp.CalledProcessError, OSError) as e:
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Try the jobs again later, waiting twice as long after every attempt.
+            error = (getattr(e, "output", None) or str(e)).strip()
+            self.logger.error("lp rejected {0} print job(s): {1}".format(len(jobs), error))
+            for job in jobs:
+                job["attempts"] += 1
+                job["error"] = error
+                if job["attempts"] >= self.max_attempts:
+                    job["state"] = FAILED
+                    self.logger.error("Print job {0} failed. Make sure a default printer has been "
+                                      "configured.".format(job["id"]))
+                else:
+                    job["next_attempt"] = time.time() + self.retry_delay * 2 ** (job["attempts"] - 1)
+                self._save(job)
+            return 0
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Mark the jobs submitted and rename their queued copies to show they've been sent to the printer. The
+        # caller's PDFs are left alone, since the caller may still use them.
+        cups_job = match.group(1)
+        for job in jobs:
+            job.update(state=SUBMITTED, cups_job=cups_job, error=None)
+            job["attempts"] += 1
+            self._save(job)
+            try:
+                os.rename(self._path(job["id"], ".pdf"), self._path(job["id"], "_printed.pdf"))
+            except OSError:
+                pass
+        self.logger.info("Sent {0} document(s) to the printer as {1}.".format(len(jobs), cups_job))
+        return len(jobs)
+
+    def _purge(self):
+        """Removes the job files of printed and failed jobs older than keep_days, and the PDFs of the failed ones.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        cutoff = time.time() - self.keep_days * 86400
+        for job in self.jobs():
+            if job["state"] in [PRINTED, FAILED] and job["updated"] < cutoff:
+                self._remove(job["id"], ".pdf")
+                self._remove(job["id"], "_printed.pdf")
+                self._remove(job["id"], ".json")
+
+    def _locked(self, blocking=False):
+        """Locks the queue directory against other spoolers.
+
+        Args:
+            blocking (bool): Wait for the lock instead of giving up if another spooler holds it.
+
+        Returns:
+            Context manager that yields whether or not the lock was acquired.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return _QueueLock(os.path.join(self.queue_dir, ".lock"), blocking)
+
+    def _save(self, job):
+        """Writes the job file. The file is replaced atomically, so readers never see a partial job.
+
+        Args:
+            job (dict): Job to save.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        job["updated"] = time.time()
+        path = self._path(job["id"], ".json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(job, f, sort_keys=True)
+        os.rename(path + ".tmp", path)
+
+    def _remove(self, job_id, ext):
+        """Removes a file of a job if it exists.
+
+        Args:
+            job_id (str): ID of the job.
+            ext (str): ".pdf", "_printed.pdf", or ".json".
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            os.remove(self._path(job_id, ext))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _path(self, job_id, ext):
+        return os.path.join(self.queue_dir, job_id + ext)
+
+
+class _QueueLock(object):
+    """flock on the lock file of a queue directory. Also held between the threads of a process, since every lock
+    opens its own file descriptor."""
+
+    def __init__(self, path, blocking):
+        self._path = path
+        self._blocking = blocking
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._path, "a")
+        try:
+            fcntl.flock(self._f, fcntl.LOCK_EX if self._blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            if e.errno not in [errno.EAGAIN, errno.EACCES]:
+                raise
+            self._f.close()
+            self._f = None
+            return False
+        return True
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Parse the arguments.
+    parser = argparse.ArgumentParser(description="Send the queued Blade Runner documents to the printer.")
+    parser.add_argument("--queue-dir", default=default_queue_dir, help="Directory of the print queue.")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between passes over the queue.")
+    parser.add_argument("--once", action="store_true", help="Make a single pass over the queue and exit.")
+    parser.add_argument("--status", action="store_true", help="Print the number of jobs in each state and exit.")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue the failed jobs again.")
+    args = parser.parse_args()
+    spooler = PrintSpooler(args.queue_dir)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if args.status:
+        counts = spooler.status()
+        print(", ".join("{0} {1}".format(counts[state], state) for state in [QUEUED, SUBMITTED, PRINTED, FAILED]))
+        for job in spooler.jobs(FAILED):
+            print("{0}: {1}".format(job["source"], job["error"]))
+        return
+    if args.retry_failed:
+        print("Queued {0} failed job(s) again.".format(spooler.requeue_failed()))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Make passes over the queue until interrupted.
+    while True:
+        spooler.process()
+        spooler.refresh()
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Set up logging vars.
+    fmt = '%(asctime)s %(process)d: %(levelname)8s: %(name)s.%(funcName)s: %(message)s'
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    log_dir = os.path.join(os.path.expanduser("~"), "Library/Logs/Blade Runner")
+    filepath = os.path.join(log_dir, script_name + ".log")
+
+    # Create log path.
+    try:
+        os.makedirs(log_dir)
+    except OSError as e:
+        if e.errno != 17:
+            raise
+
+    # Set up logger.
+    logging.basicConfig(level=logging.DEBUG, format=fmt, filemode='a', filename=filepath)
+    logger = logging.getLogger(script_name)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Run main.
+    main()
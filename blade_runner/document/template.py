@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+"""Templates for the generated documents. A template is parsed once, when it's created, into its literal text and
+its fields, so rendering only looks up the values and appends the pieces to a list that is joined once at the end.
+
+Fields are written {{name}}, or {{name|escape}} to HTML-escape the value. A value that is a list is taken to be
+already rendered pieces, e.g., the output list of another template, and is added as is.
+
+Example:
+
+    row = Template("<tr><td>{{name|escape}}</td><td>{{size}}</td></tr>")
+    out = []
+    for disk in disks:
+        row.write(out, name=disk.name, size=disk.size)
+    html = page.render(rows=out)
+"""
+
+import re
+import cgi
+import logging
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Matches a field, e.g., {{ serial }} or {{serial|escape}}.
+field_re = re.compile(r"\{\{\s*(\w+)\s*(?:\|\s*(\w+)\s*)?\}\}")
+
+# Filters that can be applied to the value of a field.
+filters = {"escape": cgi.escape}
+
+
+class TemplateError(Exception):
+    """Raised when a template uses an unknown filter or is rendered without a value for one of its fields."""
+
+
+class Template(object):
+    """A template compiled into a list of (literal text, field name, filter) segments.
+
+    Attributes:
+        fields (list): Names of the fields in the template, in order of first use.
+    """
+
+    def __init__(self, source):
+        """Compile the template.
+
+        Args:
+            source (str): Template text.
+
+        Raises:
+            TemplateError: If a field uses an unknown filter.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.fields = []
+        self._segments = []
+        position = 0
+        for match in field_re.finditer(source):
+            name, filter_name = match.groups()
+            if filter_name is not None and filter_name not in filters:
+                raise TemplateError("Unknown filter \"{0}\" in {1}".format(filter_name, match.group(0)))
+            self._segments.append((source[position:match.start()], name, filters.get(filter_name)))
+            if name not in self.fields:
+                self.fields.append(name)
+            position = match.end()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Text after the last field.
+        self._tail = source[position:]
+
+    def write(self, out, **values):
+        """Appends the rendered pieces of the template to a list.
+
+        Args:
+            out (list): Pieces rendered so far.
+            **values: Value of each field.
+
+        Returns:
+            out (list), so writes can be chained.
+
+        Raises:
+            TemplateError: If a field has no value.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        append = out.append
+        for literal, name, filter_func in self._segments:
+            append(literal)
+            try:
+                value = values[name]
+            except KeyError:
+                raise TemplateError("No value for field \"{0}\"".format(name))
+            if isinstance(value, list):
+                out.extend(value)
+                continue
+            if not isinstance(value, basestring):
+                value = str(value)
+            append(filter_func(value) if filter_func else value)
+        append(self._tail)
+        return out
+
+    def render(self, **values):
+        """Renders the template.
+
+        Args:
+            **values: Value of each field.
+
+        Returns:
+            Rendered text (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return "".join(self.write([], **values))
@@ -0,0 +1,269 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+import time
+import errno
+import socket
+import urllib
+import httplib
+import urllib2
+import logging
+import threading
+from StringIO import StringIO
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class _StaleConnection(Exception):
+    """Raised by ConnectionPool._send when the connection was closed before the server could have seen the request,
+    i.e., sending it failed with ECONNRESET or EPIPE, or the server closed the connection without sending a status
+    line. Only then is it safe to send the request again, even if it's a PUT or DELETE.
+
+    Attributes:
+        error (Exception): The socket.error or httplib.HTTPException that was raised.
+    """
+
+    def __init__(self, error):
+        Exception.__init__(self, error)
+        self.error = error
+
+
+class ConnectionPool(object):
+    """Keeps persistent HTTP/HTTPS connections open so that requests to the same host reuse a socket instead of
+    paying for a new TCP and TLS handshake every time.
+
+    Connections are pooled per (scheme, host). At most max_size idle connections are kept per host, and connections
+    that have been idle for longer than idle_timeout seconds are closed instead of reused.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=60):
+        """Initialize the pool.
+
+        Args:
+            max_size (int): Maximum number of idle connections kept per host.
+            idle_timeout (float): Seconds an idle connection is kept before it is evicted.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Maps (scheme, host) to a list of (time last used, connection).
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def open(self, request):
+        """Sends a urllib2.Request over a pooled connection.
+
+        The whole response body is read before returning so that the connection can be put back into the pool right
+        away.
+
+        Args:
+            request (urllib2.Request): Request to send. Must already have been processed by urllib2's request
+                handlers, i.e., it must have its Host and Content-Length headers.
+
+        Returns:
+            Response (urllib.addinfourl) with code and msg attributes, like the one urllib2.urlopen returns. Its
+            body_length attribute holds the size of the body.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Build the headers. Unlike urllib2, ask the server to keep the connection open.
+        headers = dict(request.unredirected_hdrs)
+        headers.update(request.headers)
+        headers['Connection'] = 'keep-alive'
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        key = (request.get_type(), request.get_host())
+        conn, reused = self._get_connection(key, request.timeout)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Send the request. A reused connection may have been closed by the server while it sat in the pool. In that
+        # case, send the request again once over a new connection. Any other failure, e.g., a timeout after the request
+        # was sent, may have reached the server, so it's left to the caller's retry policy.
+        try:
+            response, body = self._send(conn, request, headers)
+        except _StaleConnection as stale:
+            conn.close()
+            if not reused:
+                raise urllib2.URLError(stale.error)
+            self.logger.debug("Pooled connection to {} was stale. Reconnecting.".format(key[1]))
+            conn, reused = self._new_connection(key, request.timeout), False
+            try:
+                response, body = self._send(conn, request, headers)
+            except _StaleConnection as stale:
+                conn.close()
+                raise urllib2.URLError(stale.error)
+            except (socket.error, httplib.HTTPException) as error:
+                conn.close()
+                raise urllib2.URLError(error)
+        except (socket.error, httplib.HTTPException) as error:
+            conn.close()
+            raise urllib2.URLError(error)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Return the connection to the pool unless the server is closing it.
+        if response.will_close:
+            conn.close()
+        else:
+            self._put_connection(key, conn)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Wrap the response so it looks like the one returned by urllib2.urlopen.
+        wrapped = urllib.addinfourl(StringIO(body), response.msg, request.get_full_url(), response.status)
+        wrapped.msg = response.reason
+        wrapped.body_length = len(body)
+        return wrapped
+
+    def close(self):
+        """Closes every idle connection in the pool.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for last_used, conn in connections:
+                conn.close()
+
+    def _send(self, conn, request, headers):
+        """Sends the request over the connection and reads the whole response.
+
+        Args:
+            conn (httplib.HTTPConnection): Connection to send the request over.
+            request (urllib2.Request): Request to send.
+            headers (dict): Headers to send.
+
+        Returns:
+            The response (httplib.HTTPResponse) and its body (str).
+
+        Raises:
+            _StaleConnection: If the connection was closed before the server could have seen the request.
+            socket.error, httplib.HTTPException: If anything else fails.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            conn.request(request.get_method(), request.get_selector(), request.get_data(), headers)
+        except socket.error as error:
+            if error.errno in (errno.ECONNRESET, errno.EPIPE):
+                raise _StaleConnection(error)
+            raise
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The server closed the connection without answering.
+        try:
+            response = conn.getresponse()
+        except httplib.BadStatusLine as error:
+            raise _StaleConnection(error)
+        return response, response.read()
+
+    def _get_connection(self, key, timeout):
+        """Gets an idle connection for the key from the pool, or a new one if none is available.
+
+        Args:
+            key (tuple): (scheme, host)
+            timeout (float): Socket timeout for a new connection.
+
+        Returns:
+            The connection and whether or not it was reused (tuple).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Evict connections that have been idle too long and take the most recently used one that's left.
+        now = time.time()
+        with self._lock:
+            connections = self._idle.get(key, [])
+            fresh = [(last_used, c) for last_used, c in connections if now - last_used < self.idle_timeout]
+            stale = [c for last_used, c in connections if now - last_used >= self.idle_timeout]
+            conn = fresh.pop()[1] if fresh else None
+            self._idle[key] = fresh
+        for candidate in stale:
+            candidate.close()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if conn is not None:
+            return conn, True
+        return self._new_connection(key, timeout), False
+
+    def _new_connection(self, key, timeout):
+        """Opens a new connection for the key.
+
+        Args:
+            key (tuple): (scheme, host)
+            timeout (float): Socket timeout.
+
+        Returns:
+            httplib.HTTPConnection or httplib.HTTPSConnection
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        scheme, host = key
+        self.logger.debug("Opening new {} connection to {}".format(scheme, host))
+        if scheme == "https":
+            return httplib.HTTPSConnection(host, timeout=timeout)
+        return httplib.HTTPConnection(host, timeout=timeout)
+
+    def _put_connection(self, key, conn):
+        """Returns a connection to the pool. If the pool for the key is full, the connection is closed.
+
+        Args:
+            key (tuple): (scheme, host)
+            conn (httplib.HTTPConnection): Connection to return.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.max_size:
+                connections.append((time.time(), conn))
+                return
+        conn.close()
+
+
+class PooledHTTPHandler(urllib2.HTTPHandler):
+    """urllib2 handler that sends http requests through a ConnectionPool."""
+
+    def __init__(self, pool):
+        urllib2.HTTPHandler.__init__(self)
+        self._pool = pool
+
+    def http_open(self, req):
+        return self._pool.open(req)
+
+
+class PooledHTTPSHandler(urllib2.HTTPSHandler):
+    """urllib2 handler that sends https requests through a ConnectionPool."""
+
+    def __init__(self, pool):
+        urllib2.HTTPSHandler.__init__(self)
+        self._pool = pool
+
+    def https_open(self, req):
+        return self._pool.open(req)
+
+
+def build_pooled_opener(pool):
+    """Builds a urllib2 opener that sends its requests through the pool. The opener still raises urllib2.HTTPError
+    and urllib2.URLError like urllib2.urlopen does.
+
+    Args:
+        pool (ConnectionPool): Pool to send requests through.
+
+    Returns:
+        urllib2.OpenerDirector
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return urllib2.build_opener(PooledHTTPHandler(pool), PooledHTTPSHandler(pool))
@@ -0,0 +1,184 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import re
+import logging
+import threading
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Parts of request URLs that identify a record. They are replaced so that requests for different records are
+# aggregated under the same URL template.
+_url_patterns = [(re.compile(r"/computers/id/[^/]+"), "/computers/id/{id}"),
+                 (re.compile(r"/computers/match/[^/]+"), "/computers/match/{term}")]
+
+
+def url_template(url, base_url=""):
+    """Returns the URL without its base and with record identifiers replaced by placeholders.
+
+    Examples:
+        https://jss.edu:8443/JSSResource/computers/id/1234/subset/General becomes
+        /JSSResource/computers/id/{id}/subset/General
+
+    Args:
+        url (str): Request URL.
+        base_url (str): JSS URL to strip from the URL.
+
+    Returns:
+        URL template (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if base_url and url.startswith(base_url):
+        url = url[len(base_url):]
+    for pattern, placeholder in _url_patterns:
+        url = pattern.sub(placeholder, url)
+    return url
+
+
+class RequestEvent(object):
+    """Describes a request sent to the JSS. Passed to the pre-request hooks before the request is sent and to the
+    post-request hooks once it has finished, succeeded or not.
+
+    Attributes:
+        method (str): HTTP method.
+        url (str): Full request URL.
+        url_template (str): URL without the JSS URL and with record identifiers replaced, e.g.,
+            "/JSSResource/computers/id/{id}/subset/General".
+        bytes_sent (int): Size of the request body.
+        status (int): HTTP status code of the last attempt, or None if no response was received.
+        bytes_received (int): Size of the response body.
+        duration (float): Seconds from the first attempt until the request finished, including retries.
+        retries (int): Number of times the request was sent again.
+        error (str): Error the request failed with, or None if it succeeded.
+    """
+
+    def __init__(self, method, url, url_template, bytes_sent=0):
+        self.method = method
+        self.url = url
+        self.url_template = url_template
+        self.bytes_sent = bytes_sent
+        self.status = None
+        self.bytes_received = 0
+        self.duration = 0.0
+        self.retries = 0
+        self.error = None
+
+
+class RequestStats(object):
+    """In-memory aggregator of the requests sent to the JSS. Register post with JssServer.add_request_hooks."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Maps (method, url template) to the list of events.
+        self._events = {}
+
+    def post(self, event):
+        """Post-request hook. Records the finished request.
+
+        Args:
+            event (RequestEvent): Finished request.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            self._events.setdefault((event.method, event.url_template), []).append(event)
+
+    def reset(self):
+        """Forgets every recorded request.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            self._events = {}
+
+    def totals(self):
+        """Returns the totals over every recorded request.
+
+        Returns:
+            dict with the keys requests, errors, retries, bytes_sent, bytes_received, and duration.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            events = [event for endpoint_events in self._events.values() for event in endpoint_events]
+        return _aggregate(events)
+
+    def endpoints(self):
+        """Returns the aggregates of every endpoint, slowest in total first.
+
+        Returns:
+            List of dicts with the keys method, url_template, requests, errors, retries, bytes_sent, bytes_received,
+            duration, p50, and p95.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            items = [(key, list(events)) for key, events in self._events.items()]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        endpoints = []
+        for (method, template), events in items:
+            endpoint = _aggregate(events)
+            durations = sorted(event.duration for event in events)
+            endpoint.update({"method": method,
+                             "url_template": template,
+                             "p50": durations[int(0.5 * (len(durations) - 1))],
+                             "p95": durations[int(0.95 * (len(durations) - 1))]})
+            endpoints.append(endpoint)
+        return sorted(endpoints, key=lambda endpoint: endpoint["duration"], reverse=True)
+
+    def summary(self):
+        """Returns a human readable summary of the recorded requests.
+
+        Returns:
+            Summary (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        totals = self.totals()
+        lines = ["Jamf Pro requests: {requests} ({errors} failed, {retries} retries), {duration:.3f}s, "
+                 "{bytes_sent} bytes sent, {bytes_received} bytes received".format(**totals)]
+        for endpoint in self.endpoints():
+            lines.append("  {method:<6} {url_template}: {requests} request(s), {errors} failed, {retries} retries, "
+                         "{duration:.3f}s total, p50 {p50:.3f}s, p95 {p95:.3f}s, "
+                         "{bytes_received} bytes received".format(**endpoint))
+        return "\n".join(lines)
+
+
+def _aggregate(events):
+    """Sums up a list of events.
+
+    Args:
+        events (list): RequestEvents.
+
+    Returns:
+        dict with the keys requests, errors, retries, bytes_sent, bytes_received, and duration.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return {"requests": len(events),
+            "errors": len([event for event in events if event.error is not None]),
+            "retries": sum(event.retries for event in events),
+            "bytes_sent": sum(event.bytes_sent for event in events),
+            "bytes_received": sum(event.bytes_received for event in events),
+            "duration": sum(event.duration for event in events)}
@@ -21,17 +21,57 @@
 ################################################################################
 
 import os
+import time
 import logging
+from multiprocessing.pool import ThreadPool
 
 from blade_runner.document import document as doc
+from blade_runner.document.pdf import PdfDocument
+from blade_runner.document.template import Template
+from blade_runner.jamf_pro.computer import Computer
 from blade_runner.user_actions import user_actions
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
+# <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+# Templates of the HTML document, compiled once when the module is imported.
+PAGE = Template("""
+         <!DOCTYPE HTML PUBLIC " -//W3C//DTD HTML 4.01 Transition//EN"
+         "http://www.w3.org/TR/htm14/loose.dtd">
+         <html>
+           <head>
+             <title>Inventory</title>
+             <link rel="stylesheet" href="myCs325Style.css" type="text/css"/>
+           </head>
+           <body>
+             <font size="{{font_size}}">
+         {{data}}{{review}}
+             </font>
+           </body>
+         </html>""")
+
+# A key and its value. The pairs of an item are separated by PAIR_SEPARATOR, and every item ends with ITEM_END.
+ITEM_PAIR = Template("<b>{{key}}: </b> {{value}}")
+PAIR_SEPARATOR = " &nbsp;&nbsp; "
+ITEM_END = "\n<p>\n"
+
+# The fields to review, i.e., the previous values of the fields that were changed, with the values in red.
+REVIEW_HEADER = "<b>Review these to fix any Jamf Pro inconsistencies.</b>"
+REVIEW_ITEM = Template("""
+            <p>
+            <b>{{label}}: </b> <font color="red">{{value}}</font>
+            """)
+
 
 class JssDoc(object):
     """Creates a document by querying the JSS for a given computer and by using the "incorrect" fields stored
-    in Computer."""
+    in Computer.
+
+    Attributes
+        subsets (list): JSS record subsets the document is built from. They are fetched in a single request.
+    """
+
+    subsets = ["General", "Hardware"]
 
     def __init__(self, jss_server, computer, filename="barcode_1"):
         """Initialize JssDoc.
@@ -47,6 +87,9 @@ class JssDoc(object):
         self.jss_server = jss_server
         self.computer = computer
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Fetch every subset the document needs in one request.
+        self.jss_server.prefetch(self.computer.jss_id, self.subsets)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get path to Python script.
         blade_runner_dir = os.path.abspath(__file__)
         for i in range(3):
@@ -82,9 +125,13 @@ class JssDoc(object):
         # Set the HTML font size
         self.font_size = 5
 
-    def _build_html(self):
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the name from the previous computer name extension attribute.
+    def _build_items(self):
+        """Queries the JSS for the data of the document and builds the item tuples from it. The items can be modified
+        by user_actions.modify_items().
+
+        Returns:
+            List of item tuples, e.g., ("SSD", "Yes", "RAM", "16 GB").
+        """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get the name of the computer.
         name = self.jss_server.get_name(self.computer.jss_id)
@@ -119,55 +166,6 @@ class JssDoc(object):
         # Get serial number.
         serial_number = self.jss_server.get_serial(self.computer.jss_id)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Lambda expression for filtering out None and replacing it with "".
-        none_filter = lambda x : "" if x is None else x
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Build review HTML string.
-        review = False
-        # Review content string will be built and used only if one of the "incorrect" fields is not None.
-        review_content = """<b>Review these to fix any Jamf Pro inconsistencies.</b>"""
-        # Check if any field needs to be reviewed.
-        if self.computer.incorrect_barcode_1:
-            review = True
-            review_content += """
-            <p>
-            <b>Previous barcode 1: </b> <font color="red">{0}</font>
-            """.format(none_filter(self.computer.incorrect_barcode_1))
-        if self.computer.incorrect_barcode_2:
-            review = True
-            review_content += """
-            <p>
-            <b>Previous barcode 2: </b> <font color="red">{0}</font>
-            """.format(none_filter(self.computer.incorrect_barcode_2))
-        if self.computer.incorrect_asset:
-            review = True
-            review_content += """
-            <p>
-            <b>Previous asset tag: </b> <font color="red">{0}</font>
-            """.format(none_filter(self.computer.incorrect_asset))
-        if self.computer.incorrect_serial:
-            review = True
-            review_content += """
-            <p>
-            <b>Previous serial: </b> <font color="red">{0}</font>
-            """.format(none_filter(self.computer.incorrect_serial))
-        # If there's nothing to review, set review_content to empty string.
-        if not review:
-            review_content = ""
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Build HTML string
-        start_content = """
-         <!DOCTYPE HTML PUBLIC " -//W3C//DTD HTML 4.01 Transition//EN"
-         "http://www.w3.org/TR/htm14/loose.dtd">
-         <html>
-           <head>
-             <title>Inventory</title>
-             <link rel="stylesheet" href="myCs325Style.css" type="text/css"/>
-           </head>
-           <body>
-             <font size=\"""" + str(self.font_size) + """\">
-         """
-
         items = [("Name", name),
                 ("Barcode 1", barcode_1),
                 ("Barcode 2", barcode_2),
@@ -179,31 +177,73 @@ class JssDoc(object):
                 ("Storage", drive_capacity)]
 
         user_actions.modify_items(self, items)
-        mid_content = self._build_data(items)
+        return items
 
-        end_content = review_content + """
-             </font>
-           </body>
-         </html>"""
+    def _review_items(self):
+        """Gets the "incorrect" fields stored in Computer, i.e., the previous values of the fields that were changed.
 
-        file_content = start_content + mid_content + end_content
+        Returns:
+            List of (label, value) tuples. Empty if there's nothing to review.
+        """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        fields = [("Previous barcode 1", self.computer.incorrect_barcode_1),
+                  ("Previous barcode 2", self.computer.incorrect_barcode_2),
+                  ("Previous asset tag", self.computer.incorrect_asset),
+                  ("Previous serial", self.computer.incorrect_serial)]
+        return [(label, value) for label, value in fields if value]
 
-        return file_content
+    def _build_html(self, items=None, review=None):
+        """Builds the HTML document.
+
+        Args:
+            items (list): Item tuples. Built with _build_items() if None.
+            review (list): (label, value) tuples of the fields to review. Built with _review_items() if None.
+
+        Returns:
+            HTML (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        items = self._build_items() if items is None else items
+        review = self._review_items() if review is None else review
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Build review HTML. It's only added if one of the "incorrect" fields is not None.
+        review_content = []
+        if review:
+            review_content.append(REVIEW_HEADER)
+            for label, value in review:
+                REVIEW_ITEM.write(review_content, label=label, value=value)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return PAGE.render(font_size=self.font_size, data=self._write_data([], items), review=review_content)
 
     def _build_data(self, items):
-        data_content = ""
-        for pair in items:
-            for i, val in enumerate(pair):
-                if i > 2:
-                    data_content += " &nbsp;&nbsp; "
+        """Builds the HTML of the items, one paragraph per item.
 
-                if i % 2 == 1:
-                    data_content += "<b>" + str(pair[i - 1]) + ": </b> " + str(pair[i])
+        Args:
+            items (list): Item tuples.
 
-            data_content += "\n<p>\n"
+        Returns:
+            HTML (str).
+        """
+        return "".join(self._write_data([], items))
 
-        return data_content
+    def _write_data(self, out, items):
+        """Appends the HTML of the items to a list of rendered pieces.
+
+        Args:
+            out (list): Pieces rendered so far.
+            items (list): Item tuples, e.g., ("SSD", "Yes", "RAM", "16 GB").
+
+        Returns:
+            out (list)
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for item in items:
+            for i in range(1, len(item), 2):
+                if i > 1:
+                    out.append(PAIR_SEPARATOR)
+                ITEM_PAIR.write(out, key=item[i - 1], value=item[i])
+            out.append(ITEM_END)
+        return out
 
     def create_html(self):
         """Creates an .html JSS document.
@@ -214,15 +254,116 @@ class JssDoc(object):
         file_content = self._build_html()
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Make directory for the generated JSS document if it doesn't exist.
+        self._make_docs_dir()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Create HTML document.
+        doc.create_html(file_content, self.html_doc)
+
+    def create_pdf(self, renderer="native"):
+        """Creates the .pdf JSS document. The native renderer writes the PDF directly from the items, without an HTML
+        file or cupsfilter. The "cupsfilter" renderer creates the .html document and converts it with cupsfilter,
+        which is also used if the native renderer fails.
+
+        Args:
+            renderer (str): "native" or "cupsfilter".
+
+        Returns:
+            Path of the PDF (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        items = self._build_items()
+        review = self._review_items()
+        self._make_docs_dir()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Write the PDF. The review fields are listed after the items, with their values in red.
+        if renderer == "native":
+            try:
+                return doc.items_to_pdf(items, self.pdf_doc, self.font_size, review_footer(review))
+            except (IOError, OSError, UnicodeError) as e:
+                self.logger.warn("Couldn't render {0}: {1}. Falling back to cupsfilter.".format(self.pdf_doc, e))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Convert the HTML document with cupsfilter.
+        doc.create_html(self._build_html(items, review), self.html_doc)
+        doc.html_to_pdf(self.html_doc)
+        return self.pdf_doc
+
+    @classmethod
+    def create_batch_pdf(cls, jss_server, computers, pdf, workers=4):
+        """Creates a single PDF with the label of every computer, one label per page, after an index of the labels.
+        Records are fetched concurrently, and subsets already in the cache of the JSS server, e.g., because the
+        computers were just offboarded, aren't fetched again. Labels are added to the document in the order of the
+        computers as soon as their record arrives.
+
+        Args:
+            jss_server (JssServer): JSS server to query.
+            computers (list): Computer objects, or JSS IDs.
+            pdf (str): Path of the PDF.
+            workers (int): Maximum number of records fetched at the same time.
+
+        Returns:
+            List of the index entries (dict), in the order of the computers. Each entry has the jss_id, name,
+            barcode_1 and serial_number of the computer and the page of its label, or the error if its record couldn't
+            be fetched.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        computers = [computer if isinstance(computer, Computer) else _computer(computer) for computer in computers]
+
+        def fetch(computer):
+            # Builds the items of a label in a worker thread. Errors are returned in the entry.
+            entry = {"jss_id": computer.jss_id, "page": None, "error": None}
+            try:
+                label = cls(jss_server, computer, filename=None)
+                entry["name"] = jss_server.get_name(computer.jss_id)
+                entry["barcode_1"] = jss_server.get_barcode_1(computer.jss_id)
+                entry["serial_number"] = jss_server.get_serial(computer.jss_id)
+                entry["label"] = (label._build_items(), label._review_items(), label.font_size)
+            except Exception as e:
+                entry["error"] = "{0}: {1}".format(type(e).__name__, e)
+            return entry
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Add each label on a new page.
+        labels = PdfDocument()
+        entries = []
+        pool = ThreadPool(workers)
+        try:
+            for entry in pool.imap(fetch, computers):
+                if entry["error"] is None:
+                    items, review, font_size = entry.pop("label")
+                    labels.new_page()
+                    entry["page"] = labels.page_count
+                    doc.write_items(labels, items, font_size, review_footer(review))
+                else:
+                    logging.getLogger(__name__).error("No label for JSS ID {0}: {1}".format(entry["jss_id"],
+                                                                                        entry["error"]))
+                entries.append(entry)
+        finally:
+            pool.close()
+            pool.join()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Lay out the index once to find out how many pages it takes, then again with the final page numbers.
+        index_pages = _batch_index(entries).page_count
+        for entry in entries:
+            if entry["page"] is not None:
+                entry["page"] += index_pages
+        document = _batch_index(entries)
+        if any(entry["page"] is not None for entry in entries):
+            document.extend(labels)
+        document.write(pdf)
+        return entries
+
+    def _make_docs_dir(self):
+        """Makes the directory for the generated JSS documents if it doesn't exist.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         try:
             os.makedirs(self.jamf_pro_docs)
         except OSError as e:
             # Errno 17 is "Directory exists".
             if e.errno != 17:
                 raise
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create HTML document.
-        doc.create_html(file_content, self.html_doc)
 
     def open_html(self):
         """Open the html file in Safari.
@@ -262,3 +403,65 @@ class JssDoc(object):
         doc.print_pdf_to_default(self.pdf_doc)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.info("print_pdf_to_default: finished")
+
+
+def review_footer(review):
+    """Builds the PDF lines of the fields to review, with their values in red.
+
+    Args:
+        review (list): (label, value) tuples, see JssDoc._review_items().
+
+    Returns:
+        List of lines, as lists of (text, bold, color) tuples. Empty if there's nothing to review.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if not review:
+        return []
+    footer = [[("Review these to fix any Jamf Pro inconsistencies.", True, None)]]
+    footer.extend([("{0}: ".format(label), True, None), ("{0}".format(value), False, "red")]
+                  for label, value in review)
+    return footer
+
+
+def _computer(jss_id):
+    """Makes a Computer with only its JSS ID set.
+
+    Args:
+        jss_id (str): JSS ID of the computer.
+
+    Returns:
+        Computer
+    """
+    computer = Computer()
+    computer.jss_id = str(jss_id)
+    return computer
+
+
+def _batch_index(entries):
+    """Lays out the index of a batch PDF: a line per label with its page, and the records that have no label in red.
+
+    Args:
+        entries (list): Index entries, see JssDoc.create_batch_pdf(). The page of each label must already count the
+            pages of the index.
+
+    Returns:
+        PdfDocument
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    index = PdfDocument()
+    index.add_line([("Blade Runner labels", True, None)], 14)
+    labeled = len([entry for entry in entries if entry["page"] is not None])
+    summary = "{0} of {1} record(s) labeled on {2}".format(labeled, len(entries), time.strftime("%Y-%m-%d %H:%M"))
+    index.add_line([(summary, False, None)], 10)
+    index.add_space(10)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    for entry in entries:
+        if entry["page"] is None:
+            index.add_line([("No label  ", True, "red"),
+                            ("JSS ID {0}: {1}".format(entry["jss_id"], entry["error"]), False, "red")], 10)
+            continue
+        index.add_line([("Page {0}  ".format(entry["page"]), True, None),
+                        (u"{0}".format(entry["name"]), False, None),
+                        ("    Barcode 1: ", True, None), (u"{0}".format(entry["barcode_1"]), False, None),
+                        ("    Serial: ", True, None), (u"{0}".format(entry["serial_number"]), False, None)], 10)
+    return index
@@ -24,12 +24,19 @@ import re
 import os
 import sys
 import json
+import time
 import base64
 import urllib2
+import threading
 import subprocess
 import xml.etree.cElementTree as ET
 import logging
 
+from blade_runner.jamf_pro import xml_minifier
+from blade_runner.jamf_pro.retry_policy import RetryPolicy
+from blade_runner.jamf_pro.instrumentation import RequestEvent, url_template
+from blade_runner.jamf_pro.connection_pool import ConnectionPool, build_pooled_opener
+
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 
@@ -50,6 +57,13 @@ class JssServer(object):
             _invite (str): JSS invite for enrolling.
             _jamf_binary_1: Location of Jamf binary on computer.
             _jamf_binary_2: Location of Jamf binary on external drive.
+            _cache_ttl (str): Seconds a fetched subset stays valid in the subset cache. Defaults to 60.
+            _pool_size (str): Maximum number of idle keep-alive connections kept open to the JSS. Defaults to 4.
+            _pool_idle_timeout (str): Seconds an idle keep-alive connection is kept open. Defaults to 60.
+            _retry_attempts (str): Maximum times an idempotent request is sent when it fails with a URL error or a
+                retryable HTTP status code. Defaults to 3.
+            _retry_base_delay (str): Seconds waited before the first retry. Doubles after every retry. Defaults to 1.
+            _retry_max_delay (str): Maximum seconds waited between retries. Defaults to 30.
 
         """
         self.logger = logging.getLogger(__name__)
@@ -59,6 +73,33 @@ class JssServer(object):
         self._invite = kwargs.get('invite', None)
         self._jamf_binary_1 = kwargs.get('jamf_binary_1', None)
         self._jamf_binary_2 = kwargs.get('jamf_binary_2', None)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Subset cache. Maps (jss_id, subset) to (time fetched, subset data) so that a single offboard only fetches
+        # each subset of a record once.
+        self._cache_ttl = float(kwargs.get('cache_ttl', None) or 60)
+        self._subset_cache = {}
+        self._cache_lock = threading.Lock()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Persistent connections to the JSS. Every request is sent through the pool so that repeated requests reuse
+        # the same socket instead of making a new TCP and TLS handshake.
+        self._pool = ConnectionPool(max_size=int(kwargs.get('pool_size', None) or 4),
+                                    idle_timeout=float(kwargs.get('pool_idle_timeout', None) or 60))
+        self._opener = build_pooled_opener(self._pool)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Optional rate limiter. When set, a token is taken from it before every request.
+        self._rate_limiter = None
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Retry policy for requests that fail with a transient error. The number of retries made is counted in
+        # self.retries.
+        self._retry_policy = RetryPolicy(attempts=int(kwargs.get('retry_attempts', None) or 3),
+                                         base_delay=float(kwargs.get('retry_base_delay', None) or 1),
+                                         max_delay=float(kwargs.get('retry_max_delay', None) or 30))
+        self.retries = 0
+        self._retries_lock = threading.Lock()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Instrumentation hooks called before and after every request with a RequestEvent.
+        self._pre_request_hooks = []
+        self._post_request_hooks = []
 
     def match(self, search_param):
         """Returns the JSS ID of a computer matching the search parameter. Fulfills Jamf's match API.
@@ -122,22 +163,8 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_hardware_data: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Set API request URL
-        request_url = "{0}/JSSResource/computers/id/{1}/subset/Hardware".format(self._jss_url, jss_id)
-        self.logger.debug("Request URL: {}".format(request_url))
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create GET request
-        request = self.create_get_request_handler(request_url)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open/send the request
-        response = self.open_request_handler(request)
-        self.logger.info("Status code from request: {}".format(response.code))
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Read the JSON from the response.
-        response_json = json.loads(response.read())
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the hardware data from the JSON
-        hardware_inventory = response_json['computer']['hardware']
+        # Get the hardware data from the Hardware subset.
+        hardware_inventory = self.get_computer(jss_id, ["Hardware"])['hardware']
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_hardware_data: finished")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -155,22 +182,8 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_general_data: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create API request URL
-        request_url = "{0}/JSSResource/computers/id/{1}/subset/General".format(self._jss_url, jss_id)
-        self.logger.debug("Request URL: {}".format(request_url))
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create GET request
-        request = self.create_get_request_handler(request_url)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open/send the request
-        response = self.open_request_handler(request)
-        self.logger.info("Status code from request: {}".format(response.code))
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Read the JSON from the response.
-        response_json = json.loads(response.read())
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the general data from the JSON
-        general_inv = response_json['computer']['general']
+        # Get the general data from the General subset.
+        general_inv = self.get_computer(jss_id, ["General"])['general']
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_general_data: finished")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -188,21 +201,8 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_extension_attributes: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create API request URL
-        request_url = "{0}/JSSResource/computers/id/{1}/subset/extension_attributes".format(self._jss_url, jss_id)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create GET request
-        request = self.create_get_request_handler(request_url)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open/send the request
-        response = self.open_request_handler(request)
-        self.logger.info("Status code from request: {}".format(response.code))
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Read the JSON from the response.
-        response_json = json.loads(response.read())
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the extension attributes from the JSON response.
-        ext_attrs = response_json.get('computer', {}).get('extension_attributes', {})
+        # Get the extension attributes from the extension_attributes subset.
+        ext_attrs = self.get_computer(jss_id, ["extension_attributes"]).get('extension_attributes', {})
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_extension_attributes: finished")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -252,8 +252,55 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_location_data: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create API request URL
-        request_url = "{0}/JSSResource/computers/id/{1}/subset/Location".format(self._jss_url, jss_id)
+        # Get the location data from the Location subset.
+        jss_location_fields = self.get_computer(jss_id, ["Location"]).get('location', {})
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger.debug("get_location_data: finished")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return jss_location_fields
+
+    def get_computer(self, jss_id, subsets):
+        """Gets the given subsets of the computer record corresponding to the JSS ID in a single request. Subsets that
+        are already in the subset cache and haven't expired are not requested again. Every subset received is stored
+        in the cache so that the typed getters, e.g., get_general_data or get_model, can use it without making another
+        request.
+
+        Examples:
+            This is an example of the API call made when jss_id = "1234" and subsets = ["General", "Hardware"]
+
+                https://casper.indentifier.domain:1111/JSSResource/computers/id/1234/subset/General&Hardware
+
+        Args:
+            jss_id (str): JSS ID of computer.
+            subsets (list): Names of the subsets, e.g., ["General", "Hardware", "Location"].
+
+        Returns:
+            The "computer" portion of the JSON response with a key for each subset received (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger.debug("get_computer: started")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Take what can be taken from the cache and note which subsets still need to be requested.
+        computer_data = {}
+        missing = []
+        now = time.time()
+        with self._cache_lock:
+            for subset in subsets:
+                cached = self._subset_cache.get((str(jss_id), subset.lower()), None)
+                if cached is not None and now - cached[0] < self._cache_ttl:
+                    computer_data[subset.lower()] = cached[1]
+                elif subset not in missing:
+                    missing.append(subset)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # If everything was cached, there's nothing to request.
+        if not missing:
+            self.logger.debug("Using cached {} subset(s) for JSS ID {}".format("&".join(subsets), jss_id))
+            self.logger.debug("get_computer: finished")
+            return computer_data
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Set API request URL
+        request_url = "{0}/JSSResource/computers/id/{1}/subset/{2}".format(self._jss_url, jss_id, "&".join(missing))
+        self.logger.debug("Request URL: {}".format(request_url))
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Create GET request
         request = self.create_get_request_handler(request_url)
@@ -262,69 +309,81 @@ class JssServer(object):
         response = self.open_request_handler(request)
         self.logger.info("Status code from request: {}".format(response.code))
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Read the JSON from the response.
-        response_json = json.loads(response.read())
+        # Read the JSON from the response and get the computer data.
+        response_data = json.loads(response.read()).get('computer', {})
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the location data from the JSON response.
-        jss_location_fields = response_json.get('computer', {}).get('location', {})
+        # Store each subset received in the cache.
+        now = time.time()
+        with self._cache_lock:
+            for subset in missing:
+                if subset.lower() in response_data:
+                    self._subset_cache[(str(jss_id), subset.lower())] = (now, response_data[subset.lower()])
+        computer_data.update(response_data)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        self.logger.debug("get_location_data: finished")
+        self.logger.debug("get_computer: finished")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        return jss_location_fields
+        return computer_data
+
+    def prefetch(self, jss_id, subsets):
+        """Fetches the given subsets of the computer record corresponding to the JSS ID in a single request and stores
+        them in the subset cache. Meant to be called before a series of getter calls so that they are all served by
+        one request.
+
+        Args:
+            jss_id (str): JSS ID of computer.
+            subsets (list): Names of the subsets, e.g., ["General", "Hardware"].
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.get_computer(jss_id, subsets)
 
     def get_subsets_data(self, jss_id, xml_file):
-        """Gets all the data in each subset of the xml file for the given JSS ID.
+        """Gets all the data in each subset of the xml file for the given JSS ID. The XML returned by the JSS is
+        passed through as is.
 
         Args:
             jss_id (str): JSS ID of computer.
             xml_file (str): File path to XML file.
 
         Returns:
-
+            XML string (str).
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_subsets_data: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Parse the xml file into an element tree
-        tree = ET.parse(xml_file)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Get the root element of the tree.
-        root = tree.getroot()
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # For each subset in the xml file/element tree, add it to the subsets list.
-        subsets = []
-        for subset in root.findall("./"):
-            subsets.append(subset.tag)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Initialize subset request that will be appended to the API request.
-        subset_request = ""
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # For each subset in the list, add it to the subset request.
-        for subset in subsets:
-            subset_request += subset + "&"
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Remove the last ampersand.
-        subset_request = subset_request[:-1]
+        # Get the subsets from the top level tags of the xml file.
+        subsets = [subset.tag for subset in ET.parse(xml_file).getroot().findall("./")]
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Create request URL.
-        request_url = "{0}/JSSResource/computers/id/{1}/subset/{2}".format(self._jss_url, jss_id, subset_request)
+        request_url = "{0}/JSSResource/computers/id/{1}/subset/{2}".format(self._jss_url, jss_id, "&".join(subsets))
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Create GET request
-        request = self.create_get_request_handler(request_url)
+        # Create GET request for XML.
+        request = self.create_get_request_handler(request_url, accept='text/xml')
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Open/send the request
         response = self.open_request_handler(request)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Turn the xml response into an element tree.
-        xml = ET.fromstring(response.read())
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Change the element tree into an xml string.
-        xml_string = ET.tostring(xml, encoding='utf-8')
+        # No transform is needed, so return the bytes instead of parsing and re-serializing them.
+        xml_string = response.read()
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("get_subsets_data: finished")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         return xml_string
 
+    def clear_cache(self):
+        """Clears the subset cache. Called when Blade Runner moves on to a new computer so that cached data from a
+        previous offboard is never reused.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._cache_lock:
+            self._subset_cache.clear()
+        self.logger.debug("Subset cache cleared.")
+
     def delete_record(self, jss_id):
         """Delete the JSS record corresponding to the JSS ID.
 
@@ -353,6 +412,22 @@ class JssServer(object):
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("push_identity_fields: started")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Push xml string and update the computer in the JSS.
+        self._push_xml_str_handler(self.identity_xml(computer), computer.jss_id)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger.debug("push_identity_fields: finished")
+
+    def identity_xml(self, computer):
+        """Creates the XML that push_identity_fields sends for the computer.
+
+        Args:
+            computer (Computer): Provides data to send to the JSS.
+
+        Returns:
+            XML string (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         encoding = 'utf-8'
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # v BEGIN: Create XML structure that will be sent through the api call
@@ -389,12 +464,7 @@ class JssServer(object):
         # ^ END: Create XML structure that will be sent through the api call
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Convert xml tree to an xml string.
-        xml = ET.tostring(top)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Push xml string and update the computer in the JSS.
-        self._push_xml_str_handler(xml, computer.jss_id)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        self.logger.debug("push_identity_fields: finished")
+        return ET.tostring(top)
 
     def push_xml(self, xml, jss_id):
         """Push data from XML file to update JSS record for the given JSS ID.
@@ -409,17 +479,8 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("push_xml: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Parse XML file into an element tree.
-        tree = ET.parse(xml)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Convert element tree into an XML string.
-        xml = ET.tostring(tree.getroot(), encoding='utf-8')
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Remove new lines from xml string.
-        xml = re.sub("\n", "", xml)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Remove white space between tags.
-        xml = re.sub("(>)\s+(<)", r"\1\2", xml)
+        # Minify the XML file into an XML string.
+        xml = xml_minifier.minify_file(xml)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Push XML string to udpate JSS record.
         self._push_xml_str_handler(xml, jss_id)
@@ -439,11 +500,8 @@ class JssServer(object):
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("push_xml_str: started")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Remove new lines from xml string.
-        xml_str = re.sub("\n", "", xml_str)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Remove white space between tags.
-        xml_str = re.sub("(>)\s+(<)", r"\1\2", xml_str)
+        # Remove new lines and white space between tags.
+        xml_str = xml_minifier.minify(xml_str)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Push XML string to udpate JSS record.
         self._push_xml_str_handler(xml_str, jss_id)
@@ -673,6 +731,9 @@ class JssServer(object):
         self.logger.debug("enroll_computer: activated")
         self.logger.info('Enrolling computer.')
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Enrolling changes the computer's record in the JSS, so any cached subsets are stale.
+        self.clear_cache()
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         try: # enrolling computer. If the process hangs, see Note section in docstring.
             # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
             # Run enroll command
@@ -817,14 +878,95 @@ class JssServer(object):
         # Set the method to DELETE
         request.get_method = lambda: 'DELETE'
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open/send the request.
-        response = self.open_request_handler(request)
+        # Open/send the request. Drop the record's cached subsets even if the request fails, since the server may
+        # have applied the delete anyway.
+        try:
+            response = self.open_request_handler(request)
+        finally:
+            self._invalidate_cache(jss_id)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("HTML DELETE response code: {}".format(response.code))
         self.logger.debug("_delete_handler: finished")
 
+    def _invalidate_cache(self, jss_id):
+        """Removes every cached subset of the computer record corresponding to the JSS ID. Must be called whenever
+        the record is modified.
+
+        Args:
+            jss_id (str): JSS ID of computer.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._cache_lock:
+            for key in list(self._subset_cache):
+                if key[0] == str(jss_id):
+                    del self._subset_cache[key]
+
+    def set_rate_limiter(self, rate_limiter):
+        """Limits the rate of requests sent to the JSS. Used in batch mode so that many workers don't flood the JSS.
+
+        Args:
+            rate_limiter (TokenBucket): Rate limiter with an acquire() method, or None to remove the limit.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._rate_limiter = rate_limiter
+
+    def set_retry_policy(self, retry_policy):
+        """Sets the policy used to retry requests that fail with a transient error.
+
+        Args:
+            retry_policy (RetryPolicy): Retry policy.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._retry_policy = retry_policy
+
+    def add_request_hooks(self, pre=None, post=None):
+        """Adds instrumentation hooks. The pre hook is called with a RequestEvent before a request is sent, and the
+        post hook is called with the same event, now holding the status, bytes received, duration, retries, and error,
+        once the request has finished. Hooks may be called from several threads at once. An exception raised by a
+        hook is logged and doesn't affect the request.
+
+        Args:
+            pre (func): Called before every request.
+            post (func): Called after every request, whether it succeeded or not.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if pre is not None:
+            self._pre_request_hooks.append(pre)
+        if post is not None:
+            self._post_request_hooks.append(post)
+
+    def remove_request_hooks(self, pre=None, post=None):
+        """Removes instrumentation hooks added with add_request_hooks.
+
+        Args:
+            pre (func): Pre-request hook to remove.
+            post (func): Post-request hook to remove.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if pre in self._pre_request_hooks:
+            self._pre_request_hooks.remove(pre)
+        if post in self._post_request_hooks:
+            self._post_request_hooks.remove(post)
+
     def open_request_handler(self, request):
-        """Handles open requests for requests that are urllib2.Request.
+        """Handles open requests for requests that are urllib2.Request. Requests are sent over the connection pool.
+        Requests that fail with a transient error are sent again according to the retry policy. The instrumentation
+        hooks are called before and after the request.
 
         Args:
             request (urllib2.Request): Request to send.
@@ -833,10 +975,111 @@ class JssServer(object):
             Response from request (str).
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open the request and handle it accordingly.
+        method = request.get_method()
+        event = RequestEvent(method, request.get_full_url(), url_template(request.get_full_url(), self._jss_url),
+                             len(request.get_data() or ""))
+        self._call_hooks(self._pre_request_hooks, event)
+        start = time.time()
         try:
-            response = urllib2.urlopen(request)
-        except urllib2.HTTPError as error:
+            response = self._send_with_retries(request, method, event)
+        except Exception as error:
+            event.status = getattr(error, 'code', None)
+            event.error = "{}: {}".format(type(error).__name__, error)
+            raise
+        else:
+            event.status = response.code
+            # Responses from the connection pool know the size of their body. Otherwise, trust the header.
+            event.bytes_received = getattr(response, 'body_length', None) or \
+                int(response.info().getheader('Content-Length', 0) or 0)
+        finally:
+            event.duration = time.time() - start
+            self._call_hooks(self._post_request_hooks, event)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return response
+
+    def _send_with_retries(self, request, method, event):
+        """Sends the request, and sends it again according to the retry policy if it fails with a transient error.
+
+        Args:
+            request (urllib2.Request): Request to send.
+            method (str): HTTP method of the request.
+            event (RequestEvent): Instrumentation event of the request. Its retries are counted.
+
+        Returns:
+            Response from request.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        attempt = 1
+        while True:
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Wait for the rate limiter if there is one.
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Open the request and handle it accordingly.
+            try:
+                response = self._opener.open(request)
+            except urllib2.URLError as error:
+                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+                # A DELETE that is replayed after the first one went through finds nothing to delete.
+                if method == 'DELETE' and attempt > 1 and getattr(error, 'code', None) == 404:
+                    self.logger.info("Record was deleted by an earlier attempt.")
+                    return error
+                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+                # Give up if the error isn't transient or the request has been sent too many times.
+                if not self._retry_policy.should_retry(method, error, attempt):
+                    if attempt > 1:
+                        self.logger.error("{} {} failed after {} attempt(s).".format(method, request.get_full_url(),
+                                                                                     attempt))
+                    self._log_request_error(error)
+                    raise error
+                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+                # Wait and send the request again.
+                delay = self._retry_policy.delay(attempt, error)
+                self.logger.warn("{} {} failed on attempt {} ({}). Retrying in {:.1f}s.".format(
+                    method, request.get_full_url(), attempt, getattr(error, 'code', None) or error.reason, delay))
+                with self._retries_lock:
+                    self.retries += 1
+                event.retries += 1
+                self._retry_policy.sleep(delay)
+                attempt += 1
+                continue
+            except Exception as error:
+                self.logger.debug("Error submitting to JSS: {}".format(error))
+                raise error
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            if attempt > 1:
+                self.logger.info("{} {} succeeded on attempt {}.".format(method, request.get_full_url(), attempt))
+            return response
+
+    def _call_hooks(self, hooks, event):
+        """Calls each instrumentation hook with the event. Errors raised by hooks are logged and ignored.
+
+        Args:
+            hooks (list): Hooks to call.
+            event (RequestEvent): Event to pass.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for hook in list(hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                self.logger.error("Request hook {} failed: {}".format(getattr(hook, "__name__", hook), e))
+
+    def _log_request_error(self, error):
+        """Logs the reason a request failed.
+
+        Args:
+            error (urllib2.URLError): Error raised by the request.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if isinstance(error, urllib2.HTTPError):
             contents = error.read()
             self.logger.error("HTTP error contents: {}".format(contents))
             if error.code == 400:
@@ -852,22 +1095,16 @@ class JssServer(object):
                 self.logger.error("HTTP code {}: {} {}".format(error.code, "Resource conflict", error_message[0]))
             else:
                 self.logger.error("HTTP code {}: {}".format(error.code, "Misc HTTP error."))
-            raise error
-        except urllib2.URLError as error:
+        else:
             self.logger.error("URL error reason: {}".format(error.reason))
             self.logger.error("Error contacting JSS.")
-            raise error
-        except Exception as error:
-            self.logger.debug("Error submitting to JSS: {}".format(error))
-            raise error
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        return response
 
-    def create_get_request_handler(self, request_url):
+    def create_get_request_handler(self, request_url, accept='application/json'):
         """Creates a GET request from a URL.
 
         Args:
             request_url (str): The request URL.
+            accept (str): Content type the JSS should answer with.
 
         Returns:
             The created request.
@@ -877,7 +1114,7 @@ class JssServer(object):
         request = urllib2.Request(request_url)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Add headers to the request
-        request.add_header('Accept', 'application/json')
+        request.add_header('Accept', accept)
         # Format credentials for header.
         creds = base64.b64encode("{}:{}".format(self._username, self._password))
         # Add credentials to header
@@ -913,8 +1150,12 @@ class JssServer(object):
         # Set the request method.
         request.get_method = lambda: 'PUT'
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Open/send the request.
-        response = self.open_request_handler(request)
+        # Open/send the request. Drop the record's cached subsets even if the request fails, since the server may
+        # have applied the change anyway.
+        try:
+            response = self.open_request_handler(request)
+        finally:
+            self._invalidate_cache(jss_id)
         self.logger.info("   HTML PUT response code: {}".format(response.code))
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         self.logger.debug("_push_xml_str_handler: finished")
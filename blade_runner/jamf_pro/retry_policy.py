@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import time
+import random
+import urllib2
+import logging
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class RetryPolicy(object):
+    """Decides whether a failed JSS request is sent again and how long to wait before sending it.
+
+    Only idempotent requests are retried, i.e., GET, HEAD, PUT, and DELETE. A PUT sends the whole offboard XML, so
+    sending it twice leaves the record in the same state as sending it once. A request is retried if it failed with a
+    URL error (timeout, connection reset, etc.) or an HTTP status code in retryable_codes. The wait doubles after every
+    attempt and is jittered so that several clients don't retry in lockstep. A Retry-After header sent by the JSS is
+    used instead when there is one.
+
+    Attributes:
+        idempotent_methods (tuple): HTTP methods that are safe to send more than once.
+    """
+    idempotent_methods = ("GET", "HEAD", "PUT", "DELETE")
+
+    def __init__(self, attempts=3, base_delay=1.0, max_delay=30.0, jitter=0.5,
+                 retryable_codes=(429, 500, 502, 503, 504)):
+        """Initialize the policy.
+
+        Args:
+            attempts (int): Maximum number of times a request is sent, including the first time. 1 disables retries.
+            base_delay (float): Seconds waited after the first failed attempt. Doubles after every attempt.
+            max_delay (float): Maximum seconds waited between attempts.
+            jitter (float): Fraction of the wait that is randomized, between 0 and 1. 0 disables jitter.
+            retryable_codes (tuple): HTTP status codes that are retried.
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable_codes = retryable_codes
+
+    def should_retry(self, method, error, attempt):
+        """Returns whether or not a failed request should be sent again.
+
+        Args:
+            method (str): HTTP method of the request.
+            error (urllib2.URLError): Error raised by the attempt.
+            attempt (int): Number of the attempt that failed, starting at 1.
+
+        Returns:
+            True if the request should be sent again, False otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if attempt >= self.attempts or method not in self.idempotent_methods:
+            return False
+        if isinstance(error, urllib2.HTTPError):
+            return error.code in self.retryable_codes
+        return isinstance(error, urllib2.URLError)
+
+    def delay(self, attempt, error):
+        """Returns the number of seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 1.
+            error (urllib2.URLError): Error raised by the attempt.
+
+        Returns:
+            Seconds to wait (float).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Use the JSS's Retry-After header if there is one.
+        if isinstance(error, urllib2.HTTPError) and error.info() is not None:
+            retry_after = error.info().getheader('Retry-After')
+            if retry_after and retry_after.strip().isdigit():
+                return min(float(retry_after), self.max_delay)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Exponential backoff, with the jittered fraction taken off at random.
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
+
+    def sleep(self, seconds):
+        """Waits before the next attempt.
+
+        Args:
+            seconds (float): Seconds to wait.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        time.sleep(seconds)
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import re
+import logging
+import xml.etree.cElementTree as ET
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Matches new lines and white space between tags. Removing every match in one pass does what removing new lines and
+# then removing white space between tags did in two.
+_minify_pattern = re.compile(r"(?<=>)\s+(?=<)|\n")
+# Matches the XML declaration and other processing instructions, comments, and a DOCTYPE without an internal subset.
+# ElementTree drops all of them when a file is parsed and written back out.
+_prolog_pattern = re.compile(r"<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>\[]*>", re.S)
+
+
+def minify(xml_str):
+    """Removes new lines and white space between tags from an XML string in a single pass.
+
+    Args:
+        xml_str (str): XML string.
+
+    Returns:
+        Minified XML string (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return _minify_pattern.sub("", xml_str)
+
+
+def iter_minify(fileobj, chunk_size=65536):
+    """Minifies XML read from a file object chunk by chunk, so the whole document is never held twice in memory.
+
+    Each chunk is cut at its last ">" and the rest is carried into the next chunk. White space between tags always
+    starts right after a ">", so a run of it is never split across two chunks.
+
+    Args:
+        fileobj (file): File object open for reading.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        Generator of minified XML strings.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    carry = ""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        data = carry + chunk
+        cut = data.rfind(">")
+        if cut <= 0:
+            carry = data
+            continue
+        carry = data[cut:]
+        yield minify(data[:cut])
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if carry:
+        yield minify(carry)
+
+
+def minify_file(path, validate=True):
+    """Minifies an XML file and strips its XML declaration and comments, like parsing it with ElementTree and writing
+    the root element back out would.
+
+    Args:
+        path (str): Path to the XML file.
+        validate (bool): Make sure the file is well-formed XML first. Elements are discarded as soon as they're
+            parsed, so the tree is never built.
+
+    Returns:
+        Minified XML string (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Raise a SyntaxError (ET.ParseError) if the file isn't well-formed.
+    if validate:
+        for event, element in ET.iterparse(path):
+            element.clear()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    with open(path) as f:
+        return _prolog_pattern.sub("", "".join(iter_minify(f)))
@@ -0,0 +1,396 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Write-ahead journal for offboards.
+
+Before an offboard changes anything, the whole plan of the offboard (the computer, the identity XML, the offboard XML,
+the Slack message, etc.) is written to a journal file. Each step is then marked as started before it runs and as done
+after it finishes. When an offboard is interrupted, e.g., the network drops in the middle of it, its journal file is
+left behind, and the steps that aren't done can be replayed with the resume command instead of searching for and
+verifying the computer again. The journal file is deleted when the offboard finishes.
+
+Example:
+
+    # Current working directory is "/path/to/Blade Runner.app/Contents/Resources/Blade Runner/"
+    sudo python -m blade_runner.journal.offboard_journal --list
+    sudo python -m blade_runner.journal.offboard_journal
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import plistlib
+
+blade_runner_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(blade_runner_dir, "dependencies"))
+sys.path.insert(0, os.path.dirname(blade_runner_dir))
+
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.slack import slack_outbox
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+logger = logging.getLogger(__name__)
+
+# Directory the journal files are kept in.
+default_journal_dir = os.path.join(os.path.expanduser("~"), "Library/Application Support/Blade Runner/journal")
+
+# Computer attributes saved in the journal. The incorrect fields are needed for the document.
+computer_fields = ["jss_id", "serial_number", "barcode_1", "barcode_2", "asset_tag", "name", "incorrect_barcode_1",
+                   "incorrect_barcode_2", "incorrect_asset", "incorrect_serial"]
+
+
+class OffboardJournal(object):
+    """Journal of a single offboard, stored as a JSON lines file.
+
+    The first line holds the computer and the plan, i.e., the list of steps and the data each step needs. Every
+    following line marks a step as started or done.
+    """
+
+    def __init__(self, path):
+        """Initialize the journal from an existing journal file.
+
+        Args:
+            path (str): Path to the journal file.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._entries = []
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Read the entries. A line that was only partly written when the offboard was interrupted is ignored.
+        with open(path) as f:
+            for line in f:
+                try:
+                    self._entries.append(json.loads(line))
+                except ValueError:
+                    self.logger.warn("Ignoring incomplete journal entry in {}".format(path))
+
+    @classmethod
+    def create(cls, journal_dir, computer, plan):
+        """Creates the journal of a new offboard and writes its plan.
+
+        Args:
+            journal_dir (str): Directory to create the journal file in.
+            computer (Computer): Computer being offboarded. Must have its JSS ID.
+            plan (list): (step, payload) tuples in the order the steps will run. Each payload is a dict holding the
+                data the step needs to be replayed.
+
+        Returns:
+            OffboardJournal
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Create the journal directory if it DNE.
+        try:
+            os.makedirs(journal_dir)
+        except OSError as e:
+            if e.errno != 17:
+                raise
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Write the plan as the first entry.
+        path = os.path.join(journal_dir, "{}_{}.jsonl".format(computer.jss_id, int(time.time() * 1000)))
+        entry = {"event": "begin",
+                 "time": time.time(),
+                 "computer": dict((field, getattr(computer, field)) for field in computer_fields),
+                 "plan": [{"step": step, "payload": payload} for step, payload in plan]}
+        _append(path, entry)
+        return cls(path)
+
+    @classmethod
+    def unfinished(cls, journal_dir):
+        """Returns the journals of the offboards that didn't finish, oldest first.
+
+        Args:
+            journal_dir (str): Directory of the journal files.
+
+        Returns:
+            List of OffboardJournal.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not os.path.isdir(journal_dir):
+            return []
+        names = sorted((name for name in os.listdir(journal_dir) if name.endswith(".jsonl")),
+                       key=lambda name: os.path.getmtime(os.path.join(journal_dir, name)))
+        return [cls(os.path.join(journal_dir, name)) for name in names]
+
+    @property
+    def plan(self):
+        """List of (step, payload) tuples in the order the steps run."""
+        return [(item["step"], item["payload"]) for item in self._entries[0]["plan"]]
+
+    @property
+    def jss_id(self):
+        """JSS ID of the offboarded computer."""
+        return self._entries[0]["computer"]["jss_id"]
+
+    def computer(self):
+        """Returns a Computer with the attributes saved in the journal.
+
+        Returns:
+            Computer
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        computer = Computer()
+        for field, value in self._entries[0]["computer"].items():
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            setattr(computer, field, value)
+        return computer
+
+    def payload(self, step):
+        """Returns the payload planned for a step.
+
+        Args:
+            step (str): Name of the step.
+
+        Returns:
+            dict
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return dict(self.plan)[step]
+
+    def done(self):
+        """Returns the names of the steps that are done.
+
+        Returns:
+            set
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return set(entry["step"] for entry in self._entries if entry["event"] == "done")
+
+    def pending(self):
+        """Returns the planned steps that aren't done, including a step that started but didn't finish.
+
+        Returns:
+            List of (step, payload) tuples.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        done = self.done()
+        return [(step, payload) for step, payload in self.plan if step not in done]
+
+    def run(self, step, func, *args, **kwargs):
+        """Marks the step as started, runs it, and marks it as done. If func raises, the step stays pending.
+
+        Args:
+            step (str): Name of the step.
+            func (func): Function that runs the step.
+            *args: Arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Returns:
+            Return value of func.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._write({"event": "start", "step": step, "time": time.time()})
+        result = func(*args, **kwargs)
+        self._write({"event": "done", "step": step, "time": time.time()})
+        return result
+
+    def finish(self):
+        """Deletes the journal file once every step is done.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.logger.debug("Offboard of JSS ID {} finished. Removing {}".format(self.jss_id, self.path))
+        os.remove(self.path)
+
+    def _write(self, entry):
+        """Appends an entry to the journal file.
+
+        Args:
+            entry (dict): Entry to append.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        _append(self.path, entry)
+        self._entries.append(entry)
+
+
+def _append(path, entry):
+    """Appends an entry to a journal file and makes sure it's on disk before returning.
+
+    Args:
+        path (str): Path to the journal file.
+        entry (dict): Entry to append.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    with open(path, "a") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def check_managed_status(jss_server, jss_id):
+    """Makes sure the managed status of the offboarded computer is false.
+
+    Args:
+        jss_server (JssServer): The JSS server to connect to.
+        jss_id (str): JSS ID of computer.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Fetch the offboarded record in one request. General is needed for the managed status and JssDoc's subsets are
+    # needed for the document that follows.
+    jss_server.prefetch(jss_id, ["General"] + JssDoc.subsets)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    post_managed_status = jss_server.get_managed_status(jss_id)
+    logger.debug("post_managed_status: {}".format(post_managed_status))
+    if post_managed_status != 'false':
+        raise SystemError("Managed status was not false after offboarding. Aborting.")
+
+
+def resume(journal, jss_server, slack_data):
+    """Replays the steps of an interrupted offboard that aren't done, then deletes the journal.
+
+    Args:
+        journal (OffboardJournal): Journal of the interrupted offboard.
+        jss_server (JssServer): The JSS server to connect to.
+        slack_data (dict): Slack configuration data.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    computer = journal.computer()
+    for step, payload in journal.pending():
+        logger.info("Resuming step \"{}\" for JSS ID {}".format(step, computer.jss_id))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Identity and offboard steps push the XML that was planned.
+        if step in ["identity", "offboard"]:
+            journal.run(step, jss_server.push_xml_str, payload["xml"], computer.jss_id)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        elif step == "managed_check":
+            journal.run(step, check_managed_status, jss_server, computer.jss_id)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        elif step == "slack":
+            current_ip = socket.gethostbyname(socket.gethostname())
+            journal.run(step, slack_outbox.outbox.post, slack_data['slack_url'], slack_data['slack_channel'],
+                        current_ip, payload["message"])
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        elif step == "doc":
+            journal.run(step, _create_doc, jss_server, computer, payload["print"])
+        else:
+            raise SystemError("Unknown journal step \"{}\" in {}".format(step, journal.path))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    journal.finish()
+
+
+def _create_doc(jss_server, computer, print_doc):
+    """Creates the JssDoc of the computer and prints it if print_doc is True.
+
+    Args:
+        jss_server (JssServer): The JSS server to connect to.
+        computer (Computer): Offboarded computer.
+        print_doc (bool): Print the document to the default printer.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    doc = JssDoc(jss_server, computer)
+    doc.create_pdf()
+    if print_doc:
+        doc.print_pdf_to_default()
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Parse the arguments.
+    parser = argparse.ArgumentParser(description="Resume offboards that were interrupted.")
+    parser.add_argument("journals", nargs="*", help="Journal files to resume. Defaults to every unfinished offboard.")
+    parser.add_argument("--list", action="store_true", help="List the unfinished offboards and exit.")
+    parser.add_argument("--journal-dir", default=default_journal_dir, help="Directory of the journal files.")
+    parser.add_argument("--config-dir", default=os.path.join(os.path.dirname(blade_runner_dir), "config"),
+                        help="Configuration directory. Defaults to Blade Runner's config directory.")
+    args = parser.parse_args()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if args.journals:
+        journals = [OffboardJournal(path) for path in args.journals]
+    else:
+        journals = OffboardJournal.unfinished(args.journal_dir)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # List the unfinished offboards.
+    if args.list or not journals:
+        for journal in journals:
+            print("{}: JSS ID {}, pending steps: {}".format(journal.path, journal.jss_id,
+                                                            ", ".join(step for step, payload in journal.pending())))
+        if not journals:
+            print("No unfinished offboards.")
+        return
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read from jss config plist and set up the Jamf Pro server. Read the Slack config.
+    jss_server_data = plistlib.readPlist(os.path.join(args.config_dir, "jamf_pro_configs/jamf_pro.plist"))
+    jss_server = JssServer(**jss_server_data)
+    slack_data = plistlib.readPlist(os.path.join(args.config_dir, "slack_configs/slack.plist"))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Resume every journal. One failing doesn't stop the others.
+    failed = 0
+    for journal in journals:
+        try:
+            resume(journal, jss_server, slack_data)
+            print("Resumed JSS ID {}".format(journal.jss_id))
+        except Exception as e:
+            failed += 1
+            logger.exception("Resuming {} failed.".format(journal.path))
+            print("Resuming JSS ID {} failed: {}".format(journal.jss_id, e))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Send the queued Slack messages before exiting. Whatever can't be sent now stays queued for the next run.
+    slack_outbox.outbox.flush()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Set up logging vars.
+    fmt = '%(asctime)s %(process)d: %(levelname)8s: %(name)s.%(funcName)s: %(message)s'
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    log_dir = os.path.join(os.path.expanduser("~"), "Library/Logs/Blade Runner")
+    filepath = os.path.join(log_dir, script_name + ".log")
+
+    # Create log path.
+    try:
+        os.makedirs(log_dir)
+    except OSError as e:
+        if e.errno != 17:
+            raise
+
+    # Set up logger.
+    logging.basicConfig(level=logging.DEBUG, format=fmt, filemode='a', filename=filepath)
+    logger = logging.getLogger(script_name)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Run main.
+    main()
@@ -0,0 +1,518 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+"""Backends that run the disk operations of secure_erase_internals.
+
+DiskutilBackend runs them with macOS diskutil. SimulatedBackend models disks as sparse files, so that erase scheduling,
+retries and verification can be tested and timed on any OS, e.g.:
+
+    backend = SimulatedBackend("/tmp/disks", throughput=200 * 1000 * 1000)
+    backend.add_disk("disk0", 10 * 1000 * 1000 * 1000, busy=True)
+    secure_erase_internals.disk_backend = backend
+
+Both raise subprocess.CalledProcessError, with the output of the operation, when an operation fails. DiskutilBackend
+runs diskutil through a CommandRunner, so an operation that hangs is killed and raises CommandTimeout, which is a
+CalledProcessError.
+"""
+
+import os
+import time
+import logging
+import plistlib
+import threading
+import subprocess as sp
+
+from blade_runner.utils.command_runner import CommandRunner, CommandTimeout
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def read_plist(output):
+    """Parses the output of a command that outputs a plist.
+
+    Args:
+        output (str): Output of the command.
+
+    Returns:
+        Parsed plist (dict).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return plistlib.readPlistFromString(output)
+
+
+class DiskutilBackend(object):
+    """Runs disk operations with diskutil.
+
+    Every operation has a timeout. secure_erase() has none, since erasing a large disk takes hours, but it is killed if
+    diskutil stops printing its progress for longer than the "secure_erase_idle" timeout. Operations that only read
+    are run again if they time out.
+
+    Attributes:
+        erase_method (str): How secure_erase() erases a disk, as recorded in the erase report.
+        timeouts (dict): Seconds each operation is allowed to run.
+        read_only (tuple): Operations that are run again if they time out.
+        retries (int): Number of times a read only operation is run again.
+    """
+    erase_method = "diskutil secureErase 0"
+    timeouts = {"list": 60, "info": 60, "core_storage_info": 60, "unmount": 120, "delete_core_storage": 600,
+                "verify": 600, "repair": 3600, "secure_erase_idle": 1800}
+    read_only = ("list", "info", "core_storage_info", "verify")
+    retries = 2
+
+    def __init__(self, runner=None, timeouts=None):
+        """Initialize the backend.
+
+        Args:
+            runner (CommandRunner): Runs the diskutil commands.
+            timeouts (dict): Timeouts that replace the default ones, e.g., {"repair": 7200}.
+        """
+        self.runner = runner or CommandRunner()
+        self.timeouts = dict(DiskutilBackend.timeouts, **(timeouts or {}))
+
+    def _run(self, operation, cmd, merge_stderr=True):
+        """Runs a diskutil command with the timeout of the operation.
+
+        Args:
+            operation (str): Name of the operation, a key of timeouts.
+            cmd (list): Command to run.
+            merge_stderr (bool): Merge standard error into the output.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        retries = self.retries if operation in self.read_only else 0
+        return self.runner.check_output(cmd, merge_stderr, timeout=self.timeouts[operation], retries=retries)
+
+    def list(self, disk=None):
+        """Lists the disks, or the partitions of a single disk.
+
+        Args:
+            disk (str): Disk to list. Lists every disk if None.
+
+        Returns:
+            Parsed output of "diskutil list -plist" (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        cmd = ['diskutil', 'list', '-plist']
+        return read_plist(self._run("list", cmd + [disk] if disk else cmd, merge_stderr=False))
+
+    def list_text(self):
+        """Lists the disks in a human readable table.
+
+        Returns:
+            Output of "diskutil list" (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return self._run("list", ['diskutil', 'list'], merge_stderr=False)
+
+    def info(self, disk):
+        """Gets information about a disk.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Parsed output of "diskutil info -plist" (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return read_plist(self._run("info", ['diskutil', 'info', '-plist', disk], merge_stderr=False))
+
+    def core_storage_info(self, disk):
+        """Gets CoreStorage information about a disk. Fails with "is not a CoreStorage disk" in the output if the
+        disk isn't one.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Parsed output of "diskutil coreStorage info -plist" (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return read_plist(self._run("core_storage_info", ['diskutil', 'coreStorage', 'info', '-plist', disk]))
+
+    def unmount(self, disk, whole_disk=False):
+        """Force unmounts a volume, or every volume of a disk.
+
+        Args:
+            disk (str): Disk or volume.
+            whole_disk (bool): Unmount every volume of the disk.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        cmd = ['diskutil', 'unmountDisk' if whole_disk else 'unmount', 'force', disk]
+        return self._run("unmount", cmd)
+
+    def delete_core_storage(self, lvg_uuid):
+        """Deletes a CoreStorage logical volume group.
+
+        Args:
+            lvg_uuid (str): lvgUUID of the group.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return self._run("delete_core_storage", ['diskutil', 'cs', 'delete', lvg_uuid])
+
+    def secure_erase(self, disk, on_output=None):
+        """Erases a disk with a single-pass zero-fill erase.
+
+        Args:
+            disk (str): Disk.
+            on_output (func): Called with each chunk of output as it is printed. diskutil doesn't end its progress
+                line until the erase is done, so chunks aren't whole lines.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Read the output as it is written. The erase is never run again here; secure_erase_internals decides how to
+        # recover from a failed erase.
+        cmd = ['diskutil', 'secureErase', '0', disk]
+        return self.runner.check_output(cmd, merge_stderr=True, timeout=None,
+                                        idle_timeout=self.timeouts["secure_erase_idle"], retries=0,
+                                        on_output=on_output)
+
+    def device_path(self, disk):
+        """Gets the raw device of a disk, which reads and writes without going through the buffer cache.
+
+        Args:
+            disk (str): Disk, e.g., disk2 or /dev/disk2.
+
+        Returns:
+            Path to the raw device (str), e.g., /dev/rdisk2.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return "/dev/r" + os.path.basename(disk)
+
+    def verify(self, disk):
+        """Verifies the partition map of a disk. An erased disk has none, so its verification fails.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Output (str), whether the verification passed or not.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            return self._run("verify", ['diskutil', 'verifyDisk', disk])
+        except CommandTimeout:
+            raise
+        except sp.CalledProcessError as e:
+            return "{0}".format(e.output)
+
+    def repair(self, disk):
+        """Repairs a disk/volume.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return self._run("repair", ['diskutil', 'repairVolume', disk])
+
+
+class SimulatedDisk(object):
+    """A whole disk of a SimulatedBackend. Its bytes are kept in a sparse file. The disk has a partition map, and
+    its volumes, as long as its first sector isn't zeros, so it looks erased however it was zeroed. A disk with a
+    mount point can be looked up by it, like "diskutil info /".
+    """
+
+    def __init__(self, name, path, size, internal=True, volumes=("Macintosh HD",), lvg_uuid=None,
+                 physical_store=None, busy=False, needs_repair=False, mount_point=None):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.internal = internal
+        self.lvg_uuid = lvg_uuid
+        self.physical_store = physical_store
+        self.busy = busy
+        self.needs_repair = needs_repair
+        self.mount_point = mount_point
+        self._volumes = list(volumes)
+
+    def has_partition_map(self):
+        """True if the first sector of the disk isn't zeros. False otherwise."""
+        with open(self.path, "rb") as f:
+            return f.read(512).strip("\0") != ""
+
+    def clear_partition_map(self):
+        """Zeroes the first sector of the disk."""
+        with open(self.path, "r+b") as f:
+            f.write("\0" * 512)
+
+    @property
+    def volumes(self):
+        """Names of the volumes of the disk (list)."""
+        return self._volumes if self.has_partition_map() else []
+
+    @property
+    def content(self):
+        """Partition map scheme of the disk (str). Empty if it has none."""
+        return "GUID_partition_scheme" if self.has_partition_map() else ""
+
+    @property
+    def partitions(self):
+        """Identifiers of the partitions of the disk: an EFI partition plus one per volume (list)."""
+        count = len(self.volumes) + 1 if self.volumes else 0
+        return ["{0}s{1}".format(self.name, i + 1) for i in range(count)]
+
+
+class SimulatedBackend(object):
+    """Models disks as sparse files. Erasing a disk takes size / throughput seconds, prints the same progress as
+    diskutil, and leaves the file zeroed and the disk with no partition map.
+
+    A busy disk fails to erase until it is unmounted, and a disk that needs repair fails to erase until it is
+    repaired, which exercises the recovery steps. Failures can also be injected with fail().
+
+    Attributes:
+        calls (dict): Number of times each operation was called, e.g., calls["info"].
+        erase_method (str): How secure_erase() erases a disk, as recorded in the erase report.
+    """
+    erase_method = "simulated"
+
+    def __init__(self, directory, throughput=None, steps=10):
+        """Initialize the backend with no disks.
+
+        Args:
+            directory (str): Directory the sparse files are created in.
+            throughput (float): Bytes erased per second. None erases instantly.
+            steps (int): Number of progress updates printed during an erase.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.throughput = throughput
+        self.steps = steps
+        self.calls = {}
+        self._disks = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def add_disk(self, name, size, data="Blade Runner", **kwargs):
+        """Adds a disk. Its sparse file starts with data, which stands for its partition map.
+
+        Args:
+            name (str): Identifier of the disk, e.g., disk0.
+            size (int): Size in bytes.
+            data (str): Bytes written at the start of the disk.
+            **kwargs: Passed to SimulatedDisk, e.g., internal=False, busy=True, lvg_uuid="...".
+
+        Returns:
+            SimulatedDisk
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        path = os.path.join(self.directory, name + ".img")
+        with open(path, "wb") as f:
+            f.write(data)
+            f.truncate(size)
+        with self._lock:
+            self._disks[name] = SimulatedDisk(name, path, size, **kwargs)
+            return self._disks[name]
+
+    def disk(self, name):
+        """Gets a disk.
+
+        Args:
+            name (str): Identifier or mount point of the disk.
+
+        Returns:
+            SimulatedDisk, or None if it doesn't exist.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for d in self._disks.values():
+            if d.mount_point is not None and d.mount_point == name:
+                return d
+        return self._disks.get(os.path.basename(name), None)
+
+    def fail(self, operation, disk, count=1, output="Error: simulated failure"):
+        """Makes the next calls of an operation on a disk fail.
+
+        Args:
+            operation (str): Name of the operation, e.g., "secure_erase".
+            disk (str): Disk, or lvgUUID for delete_core_storage.
+            count (int): Number of calls that fail.
+            output (str): Output of the failed calls.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            self._failures[(operation, os.path.basename(disk))] = [count, output]
+
+    def list(self, disk=None):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("list", disk)
+        with self._lock:
+            disks = [self._get(disk)] if disk else [self._disks[name] for name in sorted(self._disks)]
+            return {'WholeDisks': [d.name for d in disks],
+                    'AllDisks': [name for d in disks for name in [d.name] + d.partitions],
+                    'VolumesFromDisks': [volume for d in disks for volume in d.volumes],
+                    'AllDisksAndPartitions': [{'DeviceIdentifier': d.name,
+                                               'Partitions': [{'DeviceIdentifier': p} for p in d.partitions]}
+                                              for d in disks]}
+
+    def list_text(self):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("list_text")
+        with self._lock:
+            lines = ["{0} ({1}, {2} bytes): {3}".format(d.path, "internal" if d.internal else "external", d.size,
+                                                       ", ".join(d.volumes) or "no volumes")
+                     for name, d in sorted(self._disks.items())]
+        return "\n".join(lines) + "\n"
+
+    def info(self, disk):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("info", disk)
+        with self._lock:
+            d = self._get(disk)
+            info = {'DeviceIdentifier': d.name, 'DeviceNode': d.path, 'Internal': d.internal, 'Content': d.content,
+                    'TotalSize': d.size, 'VirtualOrPhysical': 'Virtual' if d.physical_store else 'Physical',
+                    'ParentWholeDisk': d.name, 'MediaName': "Simulated {0}".format(d.name),
+                    'MountPoint': d.mount_point or ""}
+            if d.physical_store:
+                info['APFSPhysicalStores'] = [{'APFSPhysicalStore': d.physical_store + "s2"}]
+            return info
+
+    def core_storage_info(self, disk):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("core_storage_info", disk)
+        with self._lock:
+            d = self._get(disk)
+            if d.lvg_uuid is None:
+                raise sp.CalledProcessError(1, ["core_storage_info", disk],
+                                            "Error: {0} is not a CoreStorage disk".format(disk))
+            return {'MemberOfCoreStorageLogicalVolumeGroup': d.lvg_uuid}
+
+    def unmount(self, disk, whole_disk=False):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("unmount", disk)
+        with self._lock:
+            self._get(disk).busy = False
+        return "Forced unmount of {0} succeeded".format(disk)
+
+    def delete_core_storage(self, lvg_uuid):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The logical volume goes away and its physical volumes are left with no partition map.
+        self._call("delete_core_storage", lvg_uuid)
+        with self._lock:
+            for d in [d for d in self._disks.values() if d.lvg_uuid == lvg_uuid]:
+                d.lvg_uuid = None
+                d.clear_partition_map()
+        return "Core Storage LVG UUID: {0} deleted".format(lvg_uuid)
+
+    def secure_erase(self, disk, on_output=None):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("secure_erase", disk)
+        with self._lock:
+            d = self._get(disk)
+            if d.busy:
+                raise sp.CalledProcessError(1, ["secure_erase", disk], "Error: Couldn't unmount disk")
+            if d.needs_repair:
+                raise sp.CalledProcessError(1, ["secure_erase", disk], "Error: The disk needs to be repaired")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Print the progress like diskutil does while the erase takes its time.
+        output = []
+
+        def write(chunk):
+            output.append(chunk)
+            if on_output is not None:
+                on_output(chunk)
+        write("Started erase on {0}\n[ / 0%..".format(d.name))
+        for step in range(1, self.steps + 1):
+            if self.throughput:
+                time.sleep(float(d.size) / self.throughput / self.steps)
+            write("{0}%..".format(100 * step // self.steps) if step < self.steps else "100% ] \n")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Zero the disk. Truncating keeps the file sparse. Disks built on it go away with it.
+        with open(d.path, "r+b") as f:
+            f.truncate(0)
+            f.truncate(d.size)
+        with self._lock:
+            for name in [n for n, other in self._disks.items() if other.physical_store == d.name]:
+                del self._disks[name]
+        write("Finished erase on {0}\n".format(d.name))
+        return "".join(output)
+
+    def device_path(self, disk):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            return self._get(disk).path
+
+    def verify(self, disk):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("verify", disk)
+        with self._lock:
+            d = self.disk(disk)
+            if d is None:
+                return "Could not find disk: {0}".format(disk)
+            if not d.content:
+                return "Error: -69842: The partition map of {0} is Nonexistent".format(disk)
+            return "The partition map appears to be OK"
+
+    def repair(self, disk):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._call("repair", disk)
+        with self._lock:
+            self._get(disk).needs_repair = False
+        return "Finished file system repair on {0}".format(disk)
+
+    def _call(self, operation, disk=None):
+        """Counts a call of an operation and raises if a failure was injected for it.
+
+        Args:
+            operation (str): Name of the operation.
+            disk (str): Disk the operation is called on.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            failure = self._failures.get((operation, os.path.basename(disk or "")), None)
+            if failure is None or failure[0] <= 0:
+                return
+            failure[0] -= 1
+        raise sp.CalledProcessError(1, [operation, disk], failure[1])
+
+    def _get(self, disk):
+        """Gets a disk. Must be called with the lock held.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            SimulatedDisk
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        d = self.disk(disk)
+        if d is None:
+            raise sp.CalledProcessError(1, ["diskutil", disk], "Could not find disk: {0}".format(disk))
+        return d
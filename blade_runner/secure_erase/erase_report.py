@@ -0,0 +1,461 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+
+"""Machine-readable record of a secure erase run. The report is written as JSON, one file per run, and the printable
+secure erase document is rendered from it.
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import logging
+import datetime
+import subprocess as sp
+from collections import OrderedDict
+
+from blade_runner.document.pdf import PdfDocument, html_font_points
+from blade_runner.document.document import item_runs
+from blade_runner.document.template import Template
+from blade_runner.utils.command_runner import CommandRunner
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Version of the report format. Increase it when a key is renamed or removed.
+REPORT_VERSION = 1
+# Columns of the disk table of the printable document.
+DISK_COLUMNS = ("Disk", "Size", "Method", "Duration", "Throughput", "Retries", "Verification")
+DISK_HEADER = "".join("<th>{0}</th>".format(name) for name in DISK_COLUMNS)
+
+# Templates of the printable document, compiled once when the module is imported.
+DOCUMENT = Template("""<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN" "http://www.w3.org/TR/html4/loose.dtd">
+<html>
+<head>
+<title>Secure Erase Report</title>
+</head>
+<body>
+<font size="10">
+<br>
+<br>
+<b>{{status}}</b><br><br><b><font color="red">{{surplus}}</font></b>
+</font>
+<p>
+Serial number: {{serial|escape}}<br>
+Host name: {{hostname|escape}}<br>
+Erased: {{started}} to {{finished}}
+</p>
+<table border="1" cellpadding="4">
+<tr>{{header}}</tr>
+{{rows}}
+</table>
+</body>
+</html>
+""")
+TABLE_CELL = Template("<td>{{cell|escape}}</td>")
+
+
+def machine_serial(runner=None):
+    """Gets the serial number of the computer.
+
+    Args:
+        runner (CommandRunner): Runs system_profiler.
+
+    Returns:
+        Serial number (str), or None if it couldn't be read.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    try:
+        output = (runner or CommandRunner()).check_output(["system_profiler", "SPHardwareDataType"], timeout=60)
+    except (OSError, sp.CalledProcessError) as e:
+        logging.getLogger(__name__).warn("Couldn't get the serial number: {0}".format(e))
+        return None
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    match = re.search('Serial Number .system.: (.*)', output)
+    return match.group(1).strip() if match else None
+
+
+def timestamp(seconds):
+    """Formats seconds since the epoch as an ISO 8601 UTC time, e.g., 2019-05-01T17:30:00Z.
+
+    Args:
+        seconds (float): Seconds since the epoch, or None.
+
+    Returns:
+        str, or None if seconds is None.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if seconds is None:
+        return None
+    return datetime.datetime.utcfromtimestamp(seconds).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class DiskEraseRecord(object):
+    """Record of the erase of one disk.
+
+    Attributes:
+        disk (str): Disk erased.
+        size (int): Size of the disk in bytes, or None if unknown.
+        method (str): How the disk was erased, e.g., "diskutil secureErase 0" or "zero_fill".
+        media_name (str): Name of the disk's media, e.g., "APPLE SSD SM0256L Media". Tells disks apart in fleet mode.
+        attempts (int): Number of times the erase was run. More than 1 means the erase was retried.
+        recovery (list): Recovery steps taken between attempts, e.g., ["force_unmount", "repair"].
+        erased (bool): Whether or not the erase succeeded. None if it hasn't finished.
+        started (float): Seconds since the epoch the erase started at.
+        duration (float): Seconds the erase took, including retries.
+        verification (DiskVerification): Result of the verification tests, or None if the disk wasn't verified.
+    """
+
+    def __init__(self, disk, size=None, method=None, media_name=None):
+        """Initialize the record before the erase starts.
+
+        Args:
+            disk (str): Disk.
+            size (int): Size of the disk in bytes.
+            method (str): How the disk is erased.
+            media_name (str): Name of the disk's media.
+        """
+        self.disk = disk
+        self.size = size
+        self.method = method
+        self.media_name = media_name
+        self.attempts = 0
+        self.recovery = []
+        self.erased = None
+        self.started = None
+        self.duration = None
+        self.verification = None
+
+    @property
+    def retries(self):
+        """Number of times the erase was retried (int)."""
+        return max(0, self.attempts - 1)
+
+    @property
+    def throughput(self):
+        """MB erased per second, including retries (float). None if the size or duration is unknown. MB are 10^6
+        bytes, like the GB of the sizes and the MB/s of the erase progress."""
+        if not self.size or not self.duration:
+            return None
+        return self.size / 1e6 / self.duration
+
+    @property
+    def passed(self):
+        """True if the disk was erased and passed every verification test. False otherwise."""
+        return bool(self.erased) and self.verification is not None and self.verification.passed
+
+    def as_dict(self):
+        """Returns the record as a dictionary that can be serialized to JSON.
+
+        Returns:
+            OrderedDict
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        throughput = self.throughput
+        return OrderedDict([
+            ("disk", self.disk), ("media_name", self.media_name), ("size", self.size), ("method", self.method),
+            ("erased", self.erased),
+            ("passed", self.passed), ("started", timestamp(self.started)), ("duration", self.duration),
+            ("throughput_mb_s", round(throughput, 2) if throughput is not None else None),
+            ("attempts", self.attempts), ("retries", self.retries), ("recovery", self.recovery),
+            ("verification", self.verification.as_dict() if self.verification is not None else None)])
+
+
+class EraseReport(object):
+    """Report of a secure erase run: the computer, and a DiskEraseRecord per disk.
+
+    Attributes:
+        serial_number (str): Serial number of the computer.
+        hostname (str): Host name of the computer.
+        mode (str): "internal" if the computer's internal disks were erased, "fleet" if external disks were.
+        started (float): Seconds since the epoch the run started at.
+        finished (float): Seconds since the epoch the run finished at, or None if it hasn't finished.
+        disks (list): DiskEraseRecord of each disk, in the order they were added.
+    """
+
+    def __init__(self, serial_number=None, hostname=None, mode="internal"):
+        """Initialize the report. The run starts now.
+
+        Args:
+            serial_number (str): Serial number of the computer.
+            hostname (str): Host name of the computer. Defaults to the host name of this computer.
+            mode (str): "internal" or "fleet".
+        """
+        self.logger = logging.getLogger(__name__)
+        self.serial_number = serial_number
+        self.hostname = hostname or socket.gethostname()
+        self.mode = mode
+        self.started = time.time()
+        self.finished = None
+        self.disks = []
+
+    def add_disk(self, disk, size=None, method=None, media_name=None):
+        """Adds a record for a disk that is about to be erased.
+
+        Args:
+            disk (str): Disk.
+            size (int): Size of the disk in bytes.
+            method (str): How the disk is erased.
+            media_name (str): Name of the disk's media.
+
+        Returns:
+            DiskEraseRecord
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        record = DiskEraseRecord(disk, size, method, media_name)
+        self.disks.append(record)
+        return record
+
+    def disk(self, disk):
+        """Gets the record of a disk.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            DiskEraseRecord, or None if the disk isn't in the report.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for record in self.disks:
+            if record.disk == disk:
+                return record
+        return None
+
+    def add_verifications(self, verifications):
+        """Adds the verification of each disk to its record. Disks that aren't in the report are added.
+
+        Args:
+            verifications (list): DiskVerification of each disk.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for verification in verifications:
+            record = self.disk(verification.disk) or self.add_disk(verification.disk)
+            record.verification = verification
+
+    def summary(self):
+        """Describes the result of each disk in one line, e.g., "disk2: PASSED, erased in 612 s with 0 retries".
+
+        Returns:
+            Lines (list).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        lines = []
+        for record in self.disks:
+            if record.passed:
+                result = "PASSED, erased in {0:.0f} s with {1} retries".format(record.duration or 0, record.retries)
+            elif not record.erased:
+                result = "FAILED, not erased after {0} attempt(s)".format(record.attempts)
+            elif record.verification is None:
+                result = "FAILED, not verified"
+            else:
+                result = "FAILED verification: {0}".format(", ".join(record.verification.failed))
+            lines.append("{0}: {1}".format(record.disk, result))
+        return lines
+
+    def finish(self):
+        """Marks the run as finished.
+
+        Returns:
+            void
+        """
+        self.finished = time.time()
+
+    @property
+    def passed(self):
+        """True if there are disks in the report and every one of them was erased and verified. False otherwise."""
+        return bool(self.disks) and all(record.passed for record in self.disks)
+
+    def as_dict(self):
+        """Returns the report as a dictionary that can be serialized to JSON.
+
+        Returns:
+            OrderedDict
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        duration = self.finished - self.started if self.finished is not None else None
+        return OrderedDict([
+            ("report_version", REPORT_VERSION), ("serial_number", self.serial_number), ("hostname", self.hostname),
+            ("mode", self.mode), ("started", timestamp(self.started)), ("finished", timestamp(self.finished)),
+            ("duration", duration), ("passed", self.passed), ("disks", [record.as_dict() for record in self.disks])])
+
+    def to_json(self):
+        """Serializes the report.
+
+        Returns:
+            JSON (str).
+        """
+        return json.dumps(self.as_dict(), indent=2)
+
+    def filename(self):
+        """Name of the report file. Unique per computer and run, e.g.,
+        secure_erase_report_C02XXXXXXXXX_20190501-173000.json, or secure_erase_report_fleet_C02XXXXXXXXX_... in fleet
+        mode.
+
+        Returns:
+            str
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', self.serial_number or self.hostname)
+        if self.mode != "internal":
+            name = "{0}_{1}".format(self.mode, name)
+        started = datetime.datetime.utcfromtimestamp(self.started).strftime("%Y%m%d-%H%M%S")
+        return "secure_erase_report_{0}_{1}.json".format(name, started)
+
+    def write(self, directory):
+        """Writes the report to a JSON file in the directory. The file is written to a temporary file first and then
+        renamed, so a reader never sees a partial report.
+
+        Args:
+            directory (str): Directory to write the report to.
+
+        Returns:
+            Path of the report (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        path = os.path.join(directory, self.filename())
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_json())
+        os.rename(tmp_path, path)
+        self.logger.info("Secure erase report written to {0}".format(path))
+        return path
+
+
+def load(path):
+    """Reads a report written by EraseReport.write().
+
+    Args:
+        path (str): Path of the report.
+
+    Returns:
+        Report (dict).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def disk_cells(disk):
+    """Formats the entry of a disk in a report for the printable document.
+
+    Args:
+        disk (dict): Entry of the disk, from the "disks" list of a report.
+
+    Returns:
+        OrderedDict of column names and values (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    verification = disk["verification"]
+    if verification is None:
+        verified = "Not verified"
+    elif verification["passed"]:
+        verified = "Passed"
+    else:
+        failed = [name for name, passed in verification["tests"].items() if not passed]
+        verified = "Failed: {0}".format(", ".join(failed))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return OrderedDict(zip(DISK_COLUMNS, [
+        disk["disk"],
+        "{0:.1f} GB".format(disk["size"] / 1e9) if disk["size"] else "Unknown",
+        disk["method"] or "",
+        "{0:.0f} s".format(disk["duration"]) if disk["duration"] is not None else "",
+        "{0:.1f} MB/s".format(disk["throughput_mb_s"]) if disk["throughput_mb_s"] is not None else "",
+        str(disk["retries"]),
+        verified]))
+
+
+def banner(report):
+    """Gets the banner of the printable document, which says whether the computer is ready for surplus.
+
+    Args:
+        report (dict): Report.
+
+    Returns:
+        The two lines of the banner (tuple).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if report["passed"]:
+        return "SECURE ERASED", "READY FOR SURPLUS"
+    return "SECURE ERASE FAILED", "NOT READY FOR SURPLUS"
+
+
+def render_pdf(report, pdf):
+    """Writes the printable secure erase document from a report directly to a PDF, without cupsfilter.
+
+    Args:
+        report (dict): Report, as returned by EraseReport.as_dict() or load().
+        pdf (str): Path of the PDF.
+
+    Returns:
+        Path of the PDF (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # The banner in large type, then the computer and one block of lines per disk.
+    document = PdfDocument()
+    status, surplus = banner(report)
+    document.add_space(72)
+    document.add_line([(status, True, None)], html_font_points(7), leading=72)
+    document.add_line([(surplus, True, "red")], html_font_points(7), leading=72)
+    size = html_font_points(3)
+    for item in [("Serial number", report["serial_number"] or "Unknown"),
+                 ("Host name", report["hostname"] or "Unknown"),
+                 ("Erased", "{0} to {1}".format(report["started"], report["finished"] or ""))]:
+        document.add_line(item_runs(item), size)
+    for disk in report["disks"]:
+        cells = disk_cells(disk).items()
+        document.add_space(size)
+        for i in range(0, len(cells), 3):
+            document.add_line(item_runs(sum(cells[i:i + 3], ())), size)
+    return document.write(pdf)
+
+
+def render_html(report):
+    """Renders the printable secure erase document from a report.
+
+    Args:
+        report (dict): Report, as returned by EraseReport.as_dict() or load().
+
+    Returns:
+        HTML (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # The banner says whether the computer is ready for surplus.
+    status, surplus = banner(report)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # One row per disk.
+    rows = []
+    for disk in report["disks"]:
+        if rows:
+            rows.append("\n")
+        rows.append("<tr>")
+        for cell in disk_cells(disk).values():
+            TABLE_CELL.write(rows, cell=cell)
+        rows.append("</tr>")
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return DOCUMENT.render(status=status, surplus=surplus, serial=report["serial_number"] or "Unknown",
+                           hostname=report["hostname"] or "Unknown", started=report["started"],
+                           finished=report["finished"] or "", rows=rows, header=DISK_HEADER)
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+"""Checks that an erased device is zeros by reading back a random sample of its blocks, plus its first and last MBs,
+instead of the whole device. The result comes with a confidence figure: the probability that the sample would have
+found data if at least a given fraction (the tolerance) of the blocks still held data.
+"""
+
+import os
+import math
+import stat
+import errno
+import time
+import random
+import logging
+from collections import OrderedDict
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class ReadBackResult(object):
+    """Result of reading back a device.
+
+    Attributes:
+        path (str): Device that was read.
+        size (int): Size of the device in bytes.
+        blocks (int): Number of blocks the sample was drawn from, i.e., blocks outside the first and last MBs.
+        sampled (int): Number of those blocks read.
+        bytes_read (int): Bytes read, including the first and last MBs.
+        nonzero_offset (int): Offset of the first block that wasn't zeros, or None if every block read was zeros.
+        tolerance (float): Fraction of blocks the confidence is computed for.
+        duration (float): Seconds the read back took.
+    """
+
+    def __init__(self, path, size, blocks, tolerance):
+        self.path = path
+        self.size = size
+        self.blocks = blocks
+        self.tolerance = tolerance
+        self.sampled = 0
+        self.bytes_read = 0
+        self.nonzero_offset = None
+        self.duration = None
+
+    @property
+    def zero(self):
+        """True if every block read was zeros. False otherwise."""
+        return self.nonzero_offset is None
+
+    @property
+    def confidence(self):
+        """Probability (float) that the sample would have found data if at least tolerance of the blocks held data.
+        0 if data was found, 1 if every block was read.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not self.zero:
+            return 0.0
+        if self.sampled >= self.blocks:
+            return 1.0
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The blocks are sampled without replacement, so the chance of missing every block with data is
+        # hypergeometric: the product of (good blocks left / blocks left) over the draws.
+        bad = max(1, int(math.ceil(self.tolerance * self.blocks)))
+        miss = 1.0
+        for i in range(self.sampled):
+            miss *= float(self.blocks - bad - i) / (self.blocks - i)
+            if miss <= 0:
+                return 1.0
+        return 1.0 - miss
+
+    def as_dict(self):
+        """Returns the result as a dictionary that can be serialized to JSON.
+
+        Returns:
+            dict
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return OrderedDict([("path", self.path), ("zero", self.zero), ("confidence", round(self.confidence, 6)),
+                            ("tolerance", self.tolerance), ("sampled_blocks", self.sampled), ("blocks", self.blocks),
+                            ("bytes_read", self.bytes_read), ("nonzero_offset", self.nonzero_offset),
+                            ("duration", self.duration)])
+
+    def __str__(self):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not self.zero:
+            return "{0}: data found at offset {1}".format(self.path, self.nonzero_offset)
+        return "{0}: {1} of {2} blocks read back as zeros, {3:.2%} confidence that less than {4:g}% hold data".format(
+            self.path, self.sampled, self.blocks, self.confidence, self.tolerance * 100)
+
+
+class ReadBackVerifier(object):
+    """Reads back a random sample of blocks, plus the first and last MBs, of a device and checks that they're zeros.
+
+    Attributes:
+        samples (int): Number of blocks sampled.
+        block_size (int): Size of each block read.
+        edge_bytes (int): Bytes at the start and end of the device that are always read.
+        tolerance (float): Fraction of blocks the confidence is computed for.
+    """
+
+    def __init__(self, samples=256, block_size=1024 * 1024, edge_bytes=1024 * 1024, tolerance=0.01):
+        """Initialize the verifier.
+
+        Args:
+            samples (int): Number of blocks sampled.
+            block_size (int): Size of each block read. Large reads keep the check fast on spinning disks.
+            edge_bytes (int): Bytes at the start and end of the device that are always read. This is where the
+                partition map and its backup are.
+            tolerance (float): Fraction of blocks the confidence is computed for, e.g., 0.01 for 1%.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.samples = samples
+        self.block_size = block_size
+        self.edge_bytes = edge_bytes
+        self.tolerance = tolerance
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Blocks are compared to this, which compares the whole block at once instead of byte by byte.
+        self._zeros = "\0" * block_size
+
+    def check(self, path, size=None):
+        """Reads back the device.
+
+        Args:
+            path (str): Device or file, e.g., /dev/rdisk2.
+            size (int): Size of the device. Required for devices, since macOS reports a size of 0 for raw devices.
+                Defaults to the size of the file if path is a regular file.
+
+        Returns:
+            ReadBackResult
+
+        Raises:
+            IOError: If the size of the device is unknown or 0. Reading nothing would pass as zeros.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Only a regular file reports its real size.
+        if not size:
+            status = os.stat(path)
+            size = status.st_size if stat.S_ISREG(status.st_mode) else 0
+        if not size:
+            raise IOError(errno.EINVAL, "Size of {0} is unknown, nothing was read back".format(path))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        start = time.time()
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Split the device into the edges, which are read whole, and the blocks in between, which are sampled.
+            total = (size + self.block_size - 1) // self.block_size
+            edge = min(total, (self.edge_bytes + self.block_size - 1) // self.block_size)
+            middle = xrange(edge, max(edge, total - edge))
+            result = ReadBackResult(path, size, len(middle), self.tolerance)
+            sample = random.sample(middle, min(len(middle), self.samples))
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Read the blocks in order so that the reads move in one direction.
+            blocks = sorted(set(range(edge)) | set(range(max(edge, total - edge), total)) | set(sample))
+            for block in blocks:
+                offset = block * self.block_size
+                data = self._read_at(fd, offset, min(self.block_size, size - offset))
+                result.bytes_read += len(data)
+                if not self._is_zero(data):
+                    result.nonzero_offset = offset
+                    break
+            result.sampled = len(sample) if result.zero else 0
+        finally:
+            os.close(fd)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        result.duration = time.time() - start
+        self.logger.info(str(result))
+        return result
+
+    def _is_zero(self, data):
+        """Checks if data is all zeros.
+
+        Args:
+            data (str): Data read.
+
+        Returns:
+            True if data is all zeros.
+            False otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if len(data) == self.block_size:
+            return data == self._zeros
+        return not data.strip("\0")
+
+    def _read_at(self, fd, offset, length):
+        """Reads length bytes at offset. Stops early at the end of the device.
+
+        Args:
+            fd (int): File descriptor.
+            offset (int): Offset to read at.
+            length (int): Bytes to read.
+
+        Returns:
+            Data read (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        os.lseek(fd, offset, os.SEEK_SET)
+        chunks = []
+        while length > 0:
+            chunk = os.read(fd, length)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+        return "".join(chunks)
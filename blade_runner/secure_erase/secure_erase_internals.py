@@ -25,12 +25,18 @@ folder on the external HD.
 """
 
 import os
+import re
 import sys
+import time
 import socket
 import logging
+import argparse
+import datetime
+import threading
 import urllib2
 import plistlib
 import subprocess as sp
+from collections import OrderedDict
 
 blade_runner_dir = os.path.dirname(os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(blade_runner_dir, "dependencies"))
@@ -39,6 +45,13 @@ sys.path.insert(0, blade_runner_dir)
 
 from blade_runner.windows.msg_box import MsgBox
 from blade_runner.document import document as doc
+from blade_runner.batch.engine import BatchEngine
+from blade_runner.secure_erase.zero_fill import ZeroFill
+from blade_runner.secure_erase.read_back import ReadBackVerifier
+from blade_runner.secure_erase.erase_report import (EraseReport, DiskEraseRecord, machine_serial, render_html,
+                                                    render_pdf)
+from blade_runner.secure_erase.disk_backend import DiskutilBackend
+from blade_runner.utils.command_runner import CommandRunner
 from blade_runner.dependencies.management_tools.slack import IncomingWebhooksSender as IWS
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -46,6 +59,15 @@ logging.getLogger(__name__).addHandler(logging.StreamHandler(sys.stdout))
 
 logger = logging.getLogger(__name__)
 
+# Runs diskutil and firmwarepasswd with timeouts, so that a wedged disk can't hang the station.
+command_runner = CommandRunner()
+# Runs the disk operations. Replace with a SimulatedBackend to run the erase against sparse files instead of disks.
+disk_backend = DiskutilBackend(command_runner)
+# Erases the disks by writing zeros to their raw devices. If None, the backend's secure erase is used.
+zero_fill_engine = None
+# Reads back a sample of each erased disk during verification. If None, only the disk metadata is verified.
+read_back_verifier = None
+
 
 def firmware_pass_exists():
     """Checks for the existence of a firmware password.
@@ -60,7 +82,7 @@ def firmware_pass_exists():
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Check firmware password status.
     try:
-        firm_status = sp.check_output(cmd, stderr=sp.STDOUT)
+        firm_status = command_runner.check_output(cmd, merge_stderr=True, timeout=30, retries=1)
         if firm_status.find("Yes") != -1:
             logger.info("Firmware password is enabled")
             return True
@@ -81,60 +103,148 @@ def firmware_pass_exists():
     return False
 
 
-def list_main_disks():
+class DiskInventory(object):
+    """Snapshot of the disks on the computer. Instead of every helper running diskutil on its own, the helpers query
+    the snapshot, which runs one "diskutil list -plist" and at most one "diskutil info -plist" per disk, and parses
+    each output once.
+
+    Outputs are fetched the first time they're needed and kept until refresh() is called. The snapshot doesn't know
+    when the disks change, so call refresh() after anything destructive, e.g., deleting a CoreStorage volume or
+    erasing a disk.
+    """
+
+    def __init__(self, backend=None):
+        """Initialize the snapshot. Nothing is run until the snapshot is queried.
+
+        Args:
+            backend: Backend the disks are read from. Defaults to disk_backend.
+        """
+        self.backend = backend or disk_backend
+        self.refresh()
+
+    def refresh(self):
+        """Drops everything in the snapshot so that the next query runs diskutil again.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._list = None
+        self._disk_lists = {}
+        self._info = {}
+        self._core_storage = {}
+
+    @property
+    def whole_disks(self):
+        """Whole disks on the computer, from "diskutil list -plist".
+
+        Returns:
+            List of whole disks.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if self._list is None:
+            self._list = self.backend.list()
+        return self._list['WholeDisks']
+
+    def disk_list(self, disk):
+        """Output of "diskutil list -plist" for a single disk.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Parsed plist (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if disk not in self._disk_lists:
+            self._disk_lists[disk] = self.backend.list(disk)
+        return self._disk_lists[disk]
+
+    def info(self, disk):
+        """Output of "diskutil info -plist" for a disk.
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            Parsed plist (dict).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if disk not in self._info:
+            self._info[disk] = self.backend.info(disk)
+        return self._info[disk]
+
+    def lvg_uuid(self, disk):
+        """lvgUUID of the CoreStorage logical volume group the disk belongs to, from "diskutil coreStorage info
+        -plist".
+
+        Args:
+            disk (str): Disk.
+
+        Returns:
+            lvgUUID (str) if the disk is a CoreStorage disk.
+            None otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if disk not in self._core_storage:
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Run command. If the output indicates it's not a CoreStorage, remember that. Raise otherwise.
+            try:
+                cs_info = self.backend.core_storage_info(disk)
+            except sp.CalledProcessError as e:
+                if str(e.output).find("is not a CoreStorage disk") == -1:
+                    logger.debug(e.output)
+                    raise
+                cs_info = {}
+            self._core_storage[disk] = cs_info.get('MemberOfCoreStorageLogicalVolumeGroup', None)
+        return self._core_storage[disk]
+
+
+def list_main_disks(inventory=None):
     """List main disks.
 
+    Args:
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
     Returns:
         List of main disks.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Get main disks.
-    cmd = ['diskutil', 'list', '-plist']
-    disk_output = sp.check_output(cmd)
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Parse the output into a dictionary.
-    disks_info = plistlib.readPlistFromString(disk_output)
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Return the list of the disks.
-    return disks_info['WholeDisks']
+    inventory = inventory or DiskInventory()
+    return inventory.whole_disks
 
 
-def whole_disks(disk):
+def whole_disks(disk, inventory=None):
     """Get whole disks of a disk.
 
+    Args:
+        disk (str): Disk.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
     Returns:
         List of whole disks.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Get whole disks.
-    cmd = ['diskutil', 'list', '-plist', disk]
-    disk_output = sp.check_output(cmd)
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Parse the output into a dictionary.
-    disks_info = plistlib.readPlistFromString(disk_output)
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Return the list of the disks.
-    return disks_info['WholeDisks']
+    inventory = inventory or DiskInventory()
+    return inventory.disk_list(disk)['WholeDisks']
 
 
-def find_internal_disks(main_disks):
+def find_internal_disks(main_disks, inventory=None):
     """Find the internal disks from a list of disks.
 
     Args:
         main_disks (list): List of disks.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
     Returns:
         List of internal disks.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # For each disk, see if it's an internal disk.
-    internal_disks = []
-    for disk in main_disks:
-        cmd = ['diskutil', 'info', '-plist', disk]
-        disk_output = sp.check_output(cmd)
-        disk_info = plistlib.readPlistFromString(disk_output)
-        if disk_info['Internal']:
-            internal_disks.append(disk)
+    inventory = inventory or DiskInventory()
+    internal_disks = [disk for disk in main_disks if inventory.info(disk)['Internal']]
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Return internal disks.
     logger.debug("Internal Disks: " + str(internal_disks))
@@ -169,6 +279,49 @@ def interactive(question, default=None):
     return True if response in ['yes', 'y'] else False
 
 
+class DiskVerification(object):
+    """Results of the VerifyErase tests run on one disk.
+
+    Attributes:
+        disk (str): Disk that was verified.
+        results (OrderedDict): Maps the name of each test to whether or not it passed.
+        duration (float): Seconds the tests took.
+        read_back (ReadBackResult): Result of reading back the disk, or None if it wasn't read back.
+    """
+
+    def __init__(self, disk):
+        """Initialize the verification with no results.
+
+        Args:
+            disk (str): Disk that was verified.
+        """
+        self.disk = disk
+        self.results = OrderedDict()
+        self.duration = None
+        self.read_back = None
+
+    @property
+    def passed(self):
+        """True if every test ran and passed. False otherwise."""
+        return bool(self.results) and all(self.results.values())
+
+    @property
+    def failed(self):
+        """Names of the tests that failed (list)."""
+        return [test for test, passed in self.results.items() if not passed]
+
+    def as_dict(self):
+        """Returns the verification as a dictionary that can be serialized to JSON.
+
+        Returns:
+            dict
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return OrderedDict([("disk", self.disk), ("passed", self.passed), ("tests", self.results),
+                            ("duration", self.duration),
+                            ("read_back", self.read_back.as_dict() if self.read_back is not None else None)])
+
+
 class VerifyErase(object):
     """A series of tests to verify if a disk was secure erased. If all pass, the disk was secure erased.
     """
@@ -186,14 +339,10 @@ class VerifyErase(object):
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Run command.
-        cmd = ['diskutil', 'verifyDisk', disk]
-        try:
-            output = sp.check_output(cmd, stderr=sp.STDOUT)
-        except sp.CalledProcessError as e:
-            output = "{0}".format(e.output)
+        output = disk_backend.verify(disk)
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Return True or False.
-        if ("Nonexistent" or "unknown" or "damaged") in output:
+        if any(word in output for word in ["Nonexistent", "unknown", "damaged"]):
             logger.info("Secure erase successful as per by_verify_disk()")
             return True
         else:
@@ -201,23 +350,21 @@ class VerifyErase(object):
             return False
 
     @staticmethod
-    def by_type_name(disk):
+    def by_type_name(disk, inventory=None):
         """Checks the value of "Content" to determine if a disk was secure erased.
 
         Args:
             disk (str): Diskk
+            inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
         Returns:
             True if value of "Content" is "".
             False otherwise.
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Run command.
-        cmd = ['diskutil', 'info', '-plist', disk]
-        output = sp.check_output(cmd)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get value of "Content" and return True of False.
-        type_name = plistlib.readPlistFromString(output)['Content']
+        inventory = inventory or DiskInventory()
+        type_name = inventory.info(disk)['Content']
         if type_name == '':
             logger.info("Secure erase successful as per by_type_name()")
             return True
@@ -226,23 +373,21 @@ class VerifyErase(object):
             return False
 
     @staticmethod
-    def by_all_disks(disk):
+    def by_all_disks(disk, inventory=None):
         """Checks the value of "AllDisks" to determine if a disk was secure erased.
 
         Args:
             disk (str): Disk.
+            inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
         Returns:
             True if length of "AllDisks" is 1.
             False otherwise.
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Run command.
-        cmd = ['diskutil', 'list', '-plist', disk]
-        output = sp.check_output(cmd)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get value of "AllDisks"
-        all_disks = plistlib.readPlistFromString(output)['AllDisks']
+        inventory = inventory or DiskInventory()
+        all_disks = inventory.disk_list(disk)['AllDisks']
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # If length of "AllDisks" is 1, return True.
         if len(all_disks) == 1:
@@ -252,23 +397,21 @@ class VerifyErase(object):
         return False
 
     @staticmethod
-    def by_volumes_from_disks(disk):
+    def by_volumes_from_disks(disk, inventory=None):
         """Checks value of "VolumesFromDisks" to determine if a disk was secure erased.
 
         Args:
             disk (str): Disk.
+            inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
         Returns:
             True if length of "VolumesFromDisks" is 0.
             False otherwise.
         """
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Run command.
-        cmd = ['diskutil', 'list', '-plist', disk]
-        output = sp.check_output(cmd)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # Get value of "VolumesFromDisks".
-        vols_from_disks = plistlib.readPlistFromString(output)['VolumesFromDisks']
+        inventory = inventory or DiskInventory()
+        vols_from_disks = inventory.disk_list(disk)['VolumesFromDisks']
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
         # If length of value is 0, return True.
         if len(vols_from_disks) == 0:
@@ -278,70 +421,148 @@ class VerifyErase(object):
         return False
 
 
-def is_coreStorage(disk):
+    @staticmethod
+    def by_read_back(disk, inventory=None, verifier=None):
+        """Reads back a sample of the disk's blocks, plus its first and last MBs, to check that the bytes themselves
+        were erased, not just the partition map.
+
+        Args:
+            disk (str): Disk.
+            inventory (DiskInventory): Snapshot to get the size of the disk from. A new snapshot is taken if not
+                given.
+            verifier (ReadBackVerifier): Verifier that reads the disk. Defaults to read_back_verifier, or to one with
+                the default settings if that isn't set.
+
+        Returns:
+            ReadBackResult. Its zero attribute is True if every block read was zeros.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        inventory = inventory or DiskInventory()
+        verifier = verifier or read_back_verifier or ReadBackVerifier()
+        size = inventory.info(disk).get('TotalSize', None)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            result = verifier.check(disk_backend.device_path(disk), size)
+        except (IOError, OSError) as e:
+            raise sp.CalledProcessError(1, ["read_back", disk], "{0}".format(e))
+        if result.zero:
+            logger.info("Secure erase successful as per by_read_back()")
+        else:
+            logger.warn("Secure erase failed as per by_read_back()")
+        return result
+
+    @staticmethod
+    def verify(disk, inventory=None):
+        """Runs every test on a disk. A test that can't be run, e.g., because diskutil fails, counts as failed. The
+        disk is also read back if read_back_verifier is set.
+
+        Args:
+            disk (str): Disk.
+            inventory (DiskInventory): Snapshot to query. Should be taken after the erase. A new snapshot is taken if
+                not given.
+
+        Returns:
+            DiskVerification
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        inventory = inventory or DiskInventory()
+        verification = DiskVerification(disk)
+        start = time.time()
+        tests = [("by_verify_disk", lambda: VerifyErase.by_verify_disk(disk)),
+                 ("by_type_name", lambda: VerifyErase.by_type_name(disk, inventory)),
+                 ("by_all_disks", lambda: VerifyErase.by_all_disks(disk, inventory)),
+                 ("by_volumes_from_disks", lambda: VerifyErase.by_volumes_from_disks(disk, inventory))]
+        if read_back_verifier is not None:
+            def read_back():
+                verification.read_back = VerifyErase.by_read_back(disk, inventory)
+                return verification.read_back.zero
+            tests.append(("by_read_back", read_back))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Run the tests. The last three share the info and list of the disk in the snapshot.
+        for name, test in tests:
+            try:
+                verification.results[name] = test()
+            except (sp.CalledProcessError, KeyError) as e:
+                logger.warn("{0} couldn't be run on {1}: {2}".format(name, disk, e))
+                verification.results[name] = False
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        verification.duration = time.time() - start
+        return verification
+
+    @staticmethod
+    def verify_disks(disks, inventory=None, max_parallel=None):
+        """Runs every test on every disk. The disks are verified at the same time.
+
+        Args:
+            disks (list): Disks.
+            inventory (DiskInventory): Snapshot to query. Should be taken after the erase. A new snapshot is taken if
+                not given.
+            max_parallel (int): Maximum number of disks verified at the same time. Defaults to all of them.
+
+        Returns:
+            List of DiskVerification, in the order of disks.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        inventory = inventory or DiskInventory()
+        engine = BatchEngine(max_in_flight=max(1, max_parallel or len(disks)))
+        verifications = dict((v.disk, v) for v in engine.map(lambda d: VerifyErase.verify(d, inventory), disks))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Log the disks that failed.
+        for disk in disks:
+            if not verifications[disk].passed:
+                logger.warn("{0} failed verification: {1}".format(disk, ", ".join(verifications[disk].failed)))
+        return [verifications[disk] for disk in disks]
+
+
+def is_coreStorage(disk, inventory=None):
     """Checks if a disk is CoreStorage.
 
     Args:
         disk (str): Disk.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
     Returns:
         True if CoreStorage.
         False otherwise.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Run command. If plist key exists, return True.
-    try:
-        cmd = ["diskutil", "coreStorage", "info", "-plist", disk]
-        output = sp.check_output(cmd, stderr=sp.STDOUT)
-        plistlib.readPlistFromString(output)['MemberOfCoreStorageLogicalVolumeGroup']
+    # If the disk belongs to a logical volume group, it's a CoreStorage.
+    inventory = inventory or DiskInventory()
+    if inventory.lvg_uuid(disk) is not None:
         logger.debug("{0} is a CoreStorage".format(disk))
         return True
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # If key doesn't exist, return False.
-    except KeyError as e:
-        logger.debug("{0}".format(e))
-        logger.debug("{0} is not a CoreStorage".format(disk))
-        return False
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # If output indicates its not a CoreStorage, return False. Raise otherwise.
-    except sp.CalledProcessError as e:
-        if str(e.output).find("is not a CoreStorage disk") != -1:
-            logger.debug("{0} is not a CoreStorage".format(disk))
-            return False
-        logger.debug(e.output)
-        raise
+    logger.debug("{0} is not a CoreStorage".format(disk))
+    return False
 
 
-def get_lvgUUID(disk):
+def get_lvgUUID(disk, inventory=None):
     """Get lvgUUID of the disk if it exists.
 
     Args:
         disk (str): Disk.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
 
     Returns:
         lvgUUID (str) of disk if it exists.
         Returns False otherwise.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Run command and get lvgUUID.
-    cmd = ['diskutil', 'coreStorage', 'info', '-plist', disk]
+    # Get lvgUUID.
+    inventory = inventory or DiskInventory()
     try:
-        output = sp.check_output(cmd)
-        lvgUUID = plistlib.readPlistFromString(output)['MemberOfCoreStorageLogicalVolumeGroup']
-        logger.debug("{} lvgUUID is {}".format(disk, lvgUUID))
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # If key doesn't exist, return False.
-    except KeyError as e:
-        logger.debug("{0}".format(e))
-        logger.debug("{0} is not a CoreStorage. Couldn't retrieve lvgUUID".format(disk))
-        return False
+        lvgUUID = inventory.lvg_uuid(disk)
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # If other failure, raise.
+    # If failure, raise.
     except sp.CalledProcessError as e:
         logger.error(e.output)
         logger.error("Couldn't retrieve lvgUUID for {0}".format(disk))
         raise
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # If disk isn't a CoreStorage, return False.
+    if lvgUUID is None:
+        logger.debug("{0} is not a CoreStorage. Couldn't retrieve lvgUUID".format(disk))
+        return False
+    logger.debug("{} lvgUUID is {}".format(disk, lvgUUID))
     return lvgUUID
 
 
@@ -357,9 +578,8 @@ def force_unmount(disk):
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Run command to force unmount disk. If successful, return True.
-    cmd = ['diskutil', 'unmount', 'force', disk]
     try:
-        output = sp.check_output(cmd, stderr=sp.STDOUT)
+        output = disk_backend.unmount(disk)
         logger.debug(output)
         logger.info("{0} successfully force umounted.".format(disk))
         return True
@@ -383,9 +603,8 @@ def delete_corestorage(lvgUUID):
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Run command to delete CoreStorage volume. If successful, return True.
-    cmd = ['diskutil', 'cs', 'delete', lvgUUID]
     try:
-        output = sp.check_output(cmd, stderr=sp.STDOUT)
+        output = disk_backend.delete_core_storage(lvgUUID)
         logger.debug(output)
         return True
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -407,9 +626,8 @@ def repair_volume(disk):
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Run repair command. Return True if successful.
-    cmd = ['diskutil', 'repairVolume', disk]
     try:
-        output = sp.check_output(cmd, stderr=sp.STDOUT)
+        output = disk_backend.repair(disk)
         logger.debug(output)
         logger.info("{0} was successfully repaired.".format(disk))
         return True
@@ -421,11 +639,211 @@ def repair_volume(disk):
         return False
 
 
-def secure_erase(disk):
+class EraseProgress(object):
+    """Progress of the erase of a disk, parsed from the output of "diskutil secureErase" as it is printed.
+
+    Attributes:
+        disk (str): Disk being erased.
+        size (int): Size of the disk in bytes, or None if unknown.
+        percent (float): Percent of the disk erased.
+    """
+
+    # Matches the percentages diskutil prints, e.g., "[ / 0%..10%..20%.. ]".
+    _percent_pattern = re.compile(r"(\d{1,3}(?:\.\d+)?)%")
+
+    def __init__(self, disk, size=None, clock=time.time):
+        """Initialize the progress. The erase is considered started.
+
+        Args:
+            disk (str): Disk being erased.
+            size (int): Size of the disk in bytes.
+            clock (func): Returns the current time in seconds.
+        """
+        self.disk = disk
+        self.size = size
+        self.percent = 0.0
+        self._clock = clock
+        self._started = clock()
+        self._tail = ""
+
+    def feed(self, output):
+        """Parses a chunk of the erase's output. A percentage may be split across chunks.
+
+        Args:
+            output (str): Output read from diskutil.
+
+        Returns:
+            True if the percent went up.
+            False otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Keep the end of the chunk in case a percentage is cut in two.
+        text = self._tail + output
+        self._tail = text[-8:]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Take the highest percentage seen.
+        percents = [float(p) for p in self._percent_pattern.findall(text) if float(p) <= 100]
+        return self.update(max(percents)) if percents else False
+
+    def update(self, percent):
+        """Sets the percent erased, for erases that report it directly instead of printing it.
+
+        Args:
+            percent (float): Percent of the disk erased.
+
+        Returns:
+            True if the percent went up.
+            False otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if percent > self.percent:
+            self.percent = percent
+            return True
+        return False
+
+    @property
+    def elapsed(self):
+        """Seconds since the erase started (float)."""
+        return self._clock() - self._started
+
+    @property
+    def throughput(self):
+        """Average MB/s written so far (float), or None if the size of the disk is unknown."""
+        if not self.size or self.elapsed <= 0:
+            return None
+        return self.size * self.percent / 100.0 / self.elapsed / 1000000.0
+
+    @property
+    def eta(self):
+        """Estimated seconds until the erase is done (float), or None if nothing has been erased yet."""
+        if self.percent <= 0:
+            return None
+        return self.elapsed * (100.0 - self.percent) / self.percent
+
+    def __str__(self):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # e.g., "disk0: 40% erased, 118.2 MB/s, 0:12:31 left"
+        msg = "{0}: {1:g}% erased".format(self.disk, self.percent)
+        if self.throughput is not None:
+            msg += ", {0:.1f} MB/s".format(self.throughput)
+        if self.eta is not None:
+            msg += ", {0} left".format(datetime.timedelta(seconds=int(self.eta)))
+        return msg
+
+
+def log_progress(progress):
+    """Progress callback that logs the progress of an erase on its own line. Because the line is printed to stdout, it
+    is also what a StallWindow running this script as a process displays.
+
+    Args:
+        progress (EraseProgress): Progress of the erase.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    logger.info(str(progress))
+
+
+class SlackProgress(object):
+    """Progress callback that sends a Slack message every time an erase passes a multiple of step percent."""
+
+    def __init__(self, bot, step=25):
+        """Initialize the callback.
+
+        Args:
+            bot (IncomingWebhooksSender): Slack bot.
+            step (int): Percent between messages.
+        """
+        self.bot = bot
+        self.step = step
+        self._sent = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, progress):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Only send a message when a new multiple of step is reached for the disk.
+        milestone = int(progress.percent // self.step) * self.step
+        with self._lock:
+            if milestone <= self._sent.get(progress.disk, 0):
+                return
+            self._sent[progress.disk] = milestone
+        self.bot.send_message(str(progress))
+
+
+def progress_to(*callbacks):
+    """Combines progress callbacks into one. A callback that fails is logged and doesn't stop the erase.
+
+    Args:
+        *callbacks (func): Progress callbacks. None is ignored.
+
+    Returns:
+        Progress callback (func).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    def progress(erase_progress):
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(erase_progress)
+            except Exception as e:
+                logger.warn("Progress callback {0} failed: {1}".format(callback, e))
+    return progress
+
+
+def run_secure_erase(disk, progress=None, size=None):
+    """Runs a single-pass zero-fill erase on a disk, calling progress every time the erase moves forward. The erase is
+    done by zero_fill_engine if it is set, and by the backend's secure erase otherwise.
+
+    Args:
+        disk (str): Disk.
+        progress (func): Called with an EraseProgress every time the percent erased goes up.
+        size (int): Size of the disk in bytes. Used to compute the throughput, and as the number of bytes
+            zero_fill_engine writes. Taken from "diskutil info" if not given and zero_fill_engine is set.
+
+    Returns:
+        Output of the command (str).
+
+    Raises:
+        sp.CalledProcessError: If the erase fails.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # The zero-fill engine must know how many bytes to write, and raw devices don't report it, so ask diskutil.
+    if zero_fill_engine is not None and not size:
+        size = DiskInventory().info(disk).get('TotalSize', None)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    tracker = EraseProgress(disk, size)
+    callback = progress_to(progress)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Write zeros to the raw device. The disk must be unmounted for it to be written to.
+    if zero_fill_engine is not None:
+        path = disk_backend.device_path(disk)
+        try:
+            disk_backend.unmount(disk, whole_disk=True)
+            zero_fill_engine.erase(path, size, lambda percent: tracker.update(percent) and callback(tracker))
+        except (IOError, OSError) as e:
+            raise sp.CalledProcessError(1, ["zero_fill", path], "{0}".format(e))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Make sure the zeros made it to the disk.
+        if not zero_fill_engine.read_back(path, size):
+            raise sp.CalledProcessError(1, ["zero_fill", path], "Data was read back from {0}".format(path))
+        return "Zero-filled {0} in {1:.1f} seconds".format(disk, tracker.elapsed)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Call progress every time a chunk of output moves the erase forward.
+    def on_output(chunk):
+        if tracker.feed(chunk):
+            callback(tracker)
+    return disk_backend.secure_erase(disk, on_output)
+
+
+def secure_erase(disk, progress=None, size=None):
     """Secure erase the disk with a single-pass zero-fill erase.
 
     Args:
         disk (str): Disk.
+        progress (func): Called with an EraseProgress every time the erase moves forward.
+        size (int): Size of the disk in bytes.
 
     Returns:
         True if successful.
@@ -435,9 +853,8 @@ def secure_erase(disk):
     logger.warn("SECURE ERASING " + disk)
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Run command to secure erase disk. Return True if successful.
-    cmd = ['diskutil', 'secureErase', '0', disk]
     try:
-        sp.check_output(cmd, stderr=sp.STDOUT)
+        run_secure_erase(disk, progress, size)
         logger.warn('{0} successfully erased.'.format(disk))
         return True
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
@@ -448,6 +865,46 @@ def secure_erase(disk):
         return False
 
 
+def zero_fill_from_config(settings):
+    """Creates the erase engine selected in secure_erase.plist.
+
+    Args:
+        settings (dict): Contents of secure_erase.plist.
+
+    Returns:
+        ZeroFill if erase_engine is "zero_fill".
+        None otherwise, which erases with "diskutil secureErase 0".
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if (settings.get("erase_engine", None) or "diskutil").lower() != "zero_fill":
+        return None
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read the tuning settings.
+    block_size = int(float(settings.get("block_size_mb", None) or 8) * 1024 * 1024)
+    unbuffered = (settings.get("unbuffered", None) or "True").lower() == "true"
+    samples = int(settings.get("read_back_samples", None) or 64)
+    logger.info("Erasing with zero fill. Block size: {0} bytes, unbuffered: {1}".format(block_size, unbuffered))
+    return ZeroFill(block_size, unbuffered, samples)
+
+
+def read_back_from_config(settings):
+    """Creates the read back verifier enabled in secure_erase.plist.
+
+    Args:
+        settings (dict): Contents of secure_erase.plist.
+
+    Returns:
+        ReadBackVerifier if read_back_verify is "True".
+        None otherwise.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if (settings.get("read_back_verify", None) or "False").lower() != "true":
+        return None
+    samples = int(settings.get("read_back_samples", None) or 256)
+    tolerance = float(settings.get("read_back_tolerance_percent", None) or 1) / 100
+    return ReadBackVerifier(samples=samples, tolerance=tolerance)
+
+
 def diskutil_list():
     """List the disks using "diskutil list".
 
@@ -456,97 +913,312 @@ def diskutil_list():
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # List the disks and return the output.
-    cmd = ['diskutil', 'list']
-    disk_output = sp.check_output(cmd)
-    return disk_output
+    return disk_backend.list_text()
+
+
+def whole_disk_of(device):
+    """Get the whole disk a device belongs to, e.g., disk0 for disk0s2.
+
+    Args:
+        device (str): Device, e.g., disk0s2 or /dev/disk0s2.
+
+    Returns:
+        Whole disk (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    match = re.search(r"disk\d+", device)
+    return match.group(0) if match else device
+
+
+def independent_disks(disks, inventory=None):
+    """Drops the virtual disks that are built on other disks of the list, e.g., an APFS container on disk0 when disk0
+    is in the list. Erasing the physical disk erases the virtual disk along with it, and erasing both at the same time
+    would have two erases fight over the same device.
+
+    Args:
+        disks (list): Whole disks.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
+    Returns:
+        List of disks that can be erased independently of each other.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    inventory = inventory or DiskInventory()
+    listed = set(whole_disk_of(disk) for disk in disks)
+    independent = []
+    for disk in disks:
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Get the whole disks the disk is built on.
+        stores = inventory.info(disk).get('APFSPhysicalStores', [])
+        physical = set(whole_disk_of(store['APFSPhysicalStore']) for store in stores)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Skip the disk if all of them will be erased.
+        if physical and physical.issubset(listed) and whole_disk_of(disk) not in physical:
+            logger.info("{0} is on {1} and will be erased with it.".format(disk, ", ".join(sorted(physical))))
+            continue
+        independent.append(disk)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    logger.debug("Independent disks: " + str(independent))
+    return independent
+
+
+def mount_point(path):
+    """Gets the mount point of the volume a path is on.
+
+    Args:
+        path (str): Path.
+
+    Returns:
+        Mount point (str), e.g., / or /Volumes/Blade Runner.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path
+
+
+def protected_disks(paths, inventory=None):
+    """Gets the whole disks that hold the given paths, including the physical disks of their APFS containers. Fleet
+    mode never erases these.
+
+    Args:
+        paths (list): Paths, e.g., "/" for the boot disk.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
+    Returns:
+        Set of whole disks.
+
+    Raises:
+        SystemExit: If the disk of a path can't be found. Fleet mode doesn't run without knowing what to protect.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    inventory = inventory or DiskInventory()
+    protected = set()
+    for path in paths:
+        try:
+            info = inventory.info(mount_point(path))
+        except (sp.CalledProcessError, KeyError) as e:
+            raise SystemExit("Couldn't find the disk of {0}: {1}".format(path, e))
+        protected.add(whole_disk_of(info['ParentWholeDisk']))
+        protected.update(whole_disk_of(store['APFSPhysicalStore']) for store in info.get('APFSPhysicalStores', []))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    logger.debug("Protected disks: " + str(sorted(protected)))
+    return protected
+
+
+def fleet_disks(disks, protected, inventory=None):
+    """Checks the disks requested in fleet mode. A disk is only erased if it is an external whole disk that isn't, and
+    isn't built on, a protected disk.
+
+    Args:
+        disks (list): Requested disks, e.g., ["disk2", "/dev/disk3"].
+        protected (set): Whole disks that must not be erased. See protected_disks().
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
+    Returns:
+        List of the disks that can be erased, and an OrderedDict of the rejected disks and why they were rejected.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    inventory = inventory or DiskInventory()
+    accepted = []
+    rejected = OrderedDict()
+    for requested in disks:
+        disk = os.path.basename(requested)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Reject partitions, unknown disks and duplicates.
+        if disk not in inventory.whole_disks:
+            rejected[requested] = "not a whole disk"
+            continue
+        if disk in accepted:
+            continue
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Reject the disks of this Mac and the disks that hold the boot volume or Blade Runner.
+        info = inventory.info(disk)
+        stores = set(whole_disk_of(store['APFSPhysicalStore']) for store in info.get('APFSPhysicalStores', []))
+        if disk in protected:
+            rejected[requested] = "boot disk or Blade Runner disk"
+        elif stores & protected:
+            rejected[requested] = "on {0}, which is protected".format(", ".join(sorted(stores & protected)))
+        elif info.get('Internal', True):
+            rejected[requested] = "internal disk"
+        else:
+            accepted.append(disk)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    for disk, reason in rejected.items():
+        logger.warn("Not erasing {0}: {1}.".format(disk, reason))
+    return accepted, rejected
+
+
+def dismantle_corestorage(disks, inventory=None):
+    """Force unmounts the disks that are CoreStorage volumes and deletes their logical volume groups.
+
+    Args:
+        disks (list): Disks.
+        inventory (DiskInventory): Snapshot to query. A new snapshot is taken if not given.
+
+    Returns:
+        True if a CoreStorage volume was deleted. The snapshot should then be refreshed.
+        False otherwise.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # See if any of them are CoreStorage volumes.
+    logger.info("Checking for CoreStorage.")
+    inventory = inventory or DiskInventory()
+    deleted_corestorage = False
+    for disk in disks:
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Force unmount disk and delete the CoreStorage volume.
+        try:
+            if is_coreStorage(disk, inventory):
+                force_unmount(disk)
+                lvgUUID = get_lvgUUID(disk, inventory)
+                logger.info("Deleting CoreStorage on {0}".format(disk))
+                delete_corestorage(lvgUUID)
+                deleted_corestorage = True
+        except SystemExit as e:
+            logger.info(e)
+    return deleted_corestorage
+
+
+def erase_method():
+    """Describes how disks are erased, for the erase report.
+
+    Returns:
+        str
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if zero_fill_engine is not None:
+        return "zero_fill"
+    return disk_backend.erase_method
+
+
+def secure_erase_with_recovery(disk, progress=None, size=None, record=None):
+    """Secure erase a disk with a single-pass zero-fill erase. If the erase fails, the disk is force unmounted and
+    erased again. If that fails, the disk is repaired and erased a final time.
+
+    Args:
+        disk (str): Disk.
+        progress (func): Called with an EraseProgress every time the erase moves forward.
+        size (int): Size of the disk in bytes.
+        record (DiskEraseRecord): Record the attempts and recovery steps are counted in.
+
+    Returns:
+        True if successful.
+        False otherwise.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    record = record or DiskEraseRecord(disk, size)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # First attempt to secure erase disk.
+    try:
+        logger.warn("SECURE ERASING " + disk)
+        record.attempts += 1
+        run_secure_erase(disk, progress, size)
+        logger.warn('{0} successfully erased.'.format(disk))
+        return True
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Handle error. Try again.
+    except sp.CalledProcessError as exc:
+        logger.warn("{1}: Failure in erasing {0}.".format(disk, exc.output))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Try to force unmount disk.
+    try:
+        logger.info("Attemping to force unmount " + disk)
+        record.recovery.append("force_unmount")
+        unmount_output = disk_backend.unmount(disk, whole_disk=True)
+        logger.info(unmount_output)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Second attempt to secure erase.
+        logger.warn("SECOND ATTEMPT AT SECURE ERASING " + disk)
+        logger.warn("SECURE ERASING " + disk)
+        record.attempts += 1
+        run_secure_erase(disk, progress, size)
+        logger.warn('{0} successfully erased.'.format(disk))
+        return True
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Handle error. Try again.
+    except sp.CalledProcessError as e:
+        logger.info(e)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Try to repair disk.
+    logger.debug("Attempting to repair {0}".format(disk))
+    record.recovery.append("repair")
+    if repair_volume(disk):
+        logger.debug("Repair of {0} was successful.".format(disk))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Third and last attempt to secure erase disk.
+    logger.debug("Last attempt to secure erase {0}.".format(disk))
+    record.attempts += 1
+    return secure_erase(disk, progress, size)
 
 
-def secure_erase_disks(disks):
-    """Secure erase disks with a single-pass zero-fill erase.
+def secure_erase_disks(disks, max_parallel=None, progress=log_progress, inventory=None, report=None):
+    """Secure erase disks with a single-pass zero-fill erase. The disks are erased at the same time, one
+    "diskutil secureErase" per disk, so the erase takes as long as the slowest disk instead of the sum of all of them.
+
+    Args:
+        disks (list): Disks to erase. Should be independent of each other, see independent_disks().
+        max_parallel (int): Maximum number of disks erased at the same time. Defaults to all of them. 1 erases the
+            disks one after the other.
+        progress (func): Called with an EraseProgress every time the erase of a disk moves forward. Called from the
+            thread erasing the disk. Defaults to logging the progress.
+        inventory (DiskInventory): Snapshot to get the sizes of the disks from. A new snapshot is taken if not given.
+        report (EraseReport): Report a record of the erase of each disk is added to.
 
     Returns:
         True if successful.
         False otherwise.
     """
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Sometimes a space is returned as a disk. Check for this. If nothing is left, nothing can be reported as erased.
+    disks = [disk for disk in disks if not disk.isspace()]
+    if not disks:
+        logger.error("No disks to erase. Secure erase not performed.")
+        return False
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Get the listed disks and print it to the screen
     disk_output = diskutil_list()
     logger.debug("disktutil output below:\n{}".format(disk_output))
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Warn the user about the disks that will be erased. Give 10 seconds before proceeding.
     logger.warn("***************************************************************")
-    logger.warn("You are about to secure erase the following internal disk(s):")
+    logger.warn("You are about to secure erase the following disk(s):")
     for disk in disks:
         logger.warn("" + disk)
     logger.warn("***************************************************************")
     proceed = interactive("Proceed with secure erase?")
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Proceed with secure erase.
-    erased_status = []
-    if proceed:
-        logger.warn("Proceeding with secure erase.")
-        for disk in disks:
-            # Sometimes a space is returned as a disk. Check for this.
-            if not disk.isspace():
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # First attempt to secure erase disk.
-                cmd = ['diskutil', 'secureErase', '0', disk]
-                try:
-                    logger.warn("SECURE ERASING " + disk)
-                    sp.Popen(cmd, stderr=sp.STDOUT).wait()
-                    logger.warn('{0} successfully erased.'.format(disk))
-                    erased_status.append(True)
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # Handle error. Try again.
-                except sp.CalledProcessError as exc:
-                    logger.warn("{1}: Failure in erasing {0}.".format(disk, exc.output))
-                    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                    # Try to force unmount disk.
-                    try:
-                        logger.info("Attemping to force unmount " + disk)
-                        cmd = ['diskutil', 'unmountDisk', 'force', disk]
-                        unmount_output = sp.check_output(cmd, stderr=sp.STDOUT)
-                        logger.info(unmount_output)
-                        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                        # Second attempt to secure erase.
-                        logger.warn("SECOND ATTEMPT AT SECURE ERASING " + disk)
-                        logger.warn("SECURE ERASING " + disk)
-
-                        cmd = ['diskutil', 'secureErase', '0', disk]
-                        sp.Popen(cmd, stderr=sp.STDOUT).wait()
-
-                        logger.warn('{0} successfully erased.'.format(disk))
-                        erased_status.append(True)
-                    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                    # Handle error. Try again.
-                    except sp.CalledProcessError as e:
-                        logger.info(e)
-                        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                        # Try to repair disk.
-                        try:
-                            logger.debug("Attempting to repair {0}".format(disk))
-                            output = repair_volume(disk)
-                            logger.debug(output)
-                            logger.debug("Repair of {0} was successful.".format(disk))
-                            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                            # Third and last attempt to secure erase disk.
-                            logger.debug("Last attempt to secure erase {0}.".format(disk))
-                            was_erased = secure_erase(disk)
-                            erased_status.append(was_erased)
-                        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                        # Handle error. Append False to erased_status.
-                        except sp.CalledProcessError as e:
-                            logger.info(e.output)
-                            erased_status.append(False)
-    else: # User aborted
+    # If the user aborted, don't erase.
+    if not proceed:
         logger.info('Operation aborted. Secure erase not performed.')
-        erased_status.append(False)
+        return False
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # If the erased status only contains True, then the disk was secure erased.
+    # Proceed with secure erase. Each disk is erased, and recovered if needed, in its own thread.
+    logger.warn("Proceeding with secure erase.")
+    inventory = inventory or DiskInventory()
+    report = report or EraseReport()
+    method = erase_method()
+    records = {}
+    for disk in disks:
+        info = inventory.info(disk)
+        records[disk] = report.add_disk(disk, info.get('TotalSize', None), method, info.get('MediaName', None))
+
+    def erase(disk):
+        record = records[disk]
+        record.started = time.time()
+        record.erased = secure_erase_with_recovery(disk, progress, record.size, record)
+        record.duration = time.time() - record.started
+        return record.erased
+
+    engine = BatchEngine(max_in_flight=max(1, max_parallel or len(disks)))
+    erased_status = list(engine.map(erase, disks))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # If the erased status only contains True, then the disks were secure erased.
     if all(erased_status) is True:
         return True
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Otherwise, disk was not secure erased.
+    # Otherwise, disks were not secure erased.
     return False
 
 
@@ -578,106 +1250,156 @@ def main():
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     logger.info("Firmware password is not enabled. Continuing with procedure.")
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # List main disks.
-    diskutil_list()
-    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Get the main disks.
-    main_disks = list_main_disks()
+    # Take a snapshot of the disks. Every helper below queries it instead of running diskutil itself.
+    inventory = DiskInventory()
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Find internal disks.
-    internal_disks = find_internal_disks(main_disks)
+    internal_disks = find_internal_disks(list_main_disks(inventory), inventory)
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # See if any of them are CoreStorage volumes.
-    logger.info("Checking for CoreStorage.")
-    for disk in internal_disks:
+    # Delete the CoreStorage volumes on them. This removes their logical disks, so take a new snapshot before erasing.
+    if dismantle_corestorage(internal_disks, inventory):
+        inventory.refresh()
+        internal_disks = find_internal_disks(list_main_disks(inventory), inventory)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Secure erase the internal disks. Disks that are erased along with another disk are left out.
+    internal_disks = independent_disks(internal_disks, inventory)
+    if not internal_disks:
+        raise SystemExit("No internal disks to erase.")
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Report the progress of the erase in the terminal, and in Slack if enabled.
+    slack_progress = SlackProgress(bot) if slack_data["slack_enabled"].lower() == "true" else None
+    progress = progress_to(log_progress, slack_progress)
+    report = EraseReport(serial_number=machine_serial(command_runner))
+    erased = secure_erase_disks(internal_disks, progress=progress, inventory=inventory, report=report)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # If erase successful, run verification tests against a new snapshot of the erased disks.
+    verifications = []
+    if erased is True:
+        inventory.refresh()
+        verifications = VerifyErase.verify_disks(internal_disks, inventory)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Write the report of the run, whether or not it succeeded.
+    report.add_verifications(verifications)
+    report.finish()
+    report.write(secure_erase_docs_dir)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # If every disk in the report was erased and passed its tests, secure erase was successful. The document's banner
+    # is rendered from the same report.passed.
+    if report.passed:
+        logger.warn("SECURE ERASE SUCCESSFUL")
         # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Force unmount disk and delete the CoreStorage volume.
+        # Send message
         try:
-            if is_coreStorage(disk):
-                output = force_unmount(disk)
-                lvgUUID = get_lvgUUID(disk)
-                logger.info("Deleting CoreStorage on {0}".format(disk))
-                delete_corestorage(lvgUUID)
-        except SystemExit as e:
-            logger.info(e)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # Secure erase the internal disks.
-        main_disks = list_main_disks()
-        internal_disks = find_internal_disks(main_disks)
-        erased = secure_erase_disks(internal_disks)
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # If erase successful, run verification tests.
-        if erased is True:
-            erase_verified = []
-            for disk in internal_disks:
-                erase_verified.append(VerifyErase.by_verify_disk(disk))
-                erase_verified.append(VerifyErase.by_type_name(disk))
-                erase_verified.append(VerifyErase.by_all_disks(disk))
-                erase_verified.append(VerifyErase.by_volumes_from_disks(disk))
-            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-            # If all tests pass, secure erase was successful.
-            if all(erase_verified):
-                logger.warn("SECURE ERASE SUCCESSFUL")
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # Send message
-                try:
-                    if slack_data["slack_enabled"].lower() == "true":
-                        bot.send_message("SECURE ERASE SUCCESSFUL")
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # Handle error and exit.
-                except urllib2.URLError:
-                    err = "Make sure you have ethernet/internet connection"
-                    logger.error(err)
-                    raise SystemExit(err)
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # Create document.
-                html_content = """
-                <!DOCTYPE HTML PUBLIC " -//W3C//DTD HTML 4.01 Transition//EN" 
-                "http://www.w3.org/TR/htm14/loose.dtd">
-                <html>
-                <head>
-                <title>Inventory</title>
-                <link rel="stylesheet" href="myCs325Style.css" type="text/css"/>
-                </head>
-                <body>
-                <font size="10">
-                <br>
-                <br>
-                <br>
-                <br>
-                <b>SECURE ERASED</b>
-                <br>
-                <br>
-                <br>	   
-                <b><font color="red">READY FOR SURPLUS </font></b>
-                <p>
-                </font>
-                </body>
-                </html>"""
-                html = os.path.join(secure_erase_docs_dir, "secure_erased.html")
-                doc.create_html(html_content, html)
-                pdf = doc.html_to_pdf(html)
-                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-                # Try to print document if printing enabled.
-                try:
-                    if print_settings["print"].lower() == "true":
-                        doc.print_pdf_to_default(pdf)
-                except Exception as e:
-                    logger.warn("Wasn't able to print secure erase document. Exception: {}".format(e))
-            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-            # If not all tests passed, secure erase failed.
-            else:
-                logger.warn("SECURE ERASE FAILED")
-                if slack_data["slack_enabled"].lower() == "true":
-                    bot.send_message("SECURE ERASE FAILED")
-                raise SystemExit("SECURE ERASE FAILED")
-        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-        # If secure erase failed, exit.
-        else:
-            logger.warn("SECURE ERASE FAILED")
             if slack_data["slack_enabled"].lower() == "true":
-                bot.send_message("SECURE ERASE FAILED")
-            raise SystemExit("SECURE ERASE FAILED")
+                bot.send_message("SECURE ERASE SUCCESSFUL")
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Handle error and exit.
+        except urllib2.URLError:
+            err = "Make sure you have ethernet/internet connection"
+            logger.error(err)
+            raise SystemExit(err)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Create document from the report.
+        pdf = create_erase_document(report, secure_erase_docs_dir, print_settings.get("pdf_renderer", "native"))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Try to print document if printing enabled.
+        try:
+            if print_settings["print"].lower() == "true":
+                doc.print_pdf_to_default(pdf)
+        except Exception as e:
+            logger.warn("Wasn't able to print secure erase document. Exception: {}".format(e))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # If the erase or any of the tests failed, secure erase failed.
+    else:
+        logger.warn("SECURE ERASE FAILED")
+        if slack_data["slack_enabled"].lower() == "true":
+            bot.send_message("SECURE ERASE FAILED")
+        raise SystemExit("SECURE ERASE FAILED")
+
+
+def create_erase_document(report, directory, renderer="native"):
+    """Creates the printable secure erase document from the report. The native renderer writes the PDF directly. The
+    "cupsfilter" renderer writes an HTML document and converts it with cupsfilter, which is also used if the native
+    renderer fails.
+
+    Args:
+        report (EraseReport): Report of the run.
+        directory (str): Directory to create the document in.
+        renderer (str): "native" or "cupsfilter".
+
+    Returns:
+        Path of the PDF (str).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    data = report.as_dict()
+    if renderer == "native":
+        try:
+            return render_pdf(data, os.path.join(directory, "secure_erased.pdf"))
+        except (IOError, OSError, UnicodeError) as e:
+            logger.warn("Couldn't render the secure erase document: {0}. Falling back to cupsfilter.".format(e))
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    html = os.path.join(directory, "secure_erased.html")
+    doc.create_html(render_html(data), html)
+    return doc.html_to_pdf(html)
+
+
+def fleet_main(disks, max_parallel=None):
+    """Erases external disks, e.g., Macs connected in target disk mode, from this station. Every disk is erased and
+    verified independently, and a disk that fails doesn't stop the others.
+
+    Args:
+        disks (list): External whole disks to erase.
+        max_parallel (int): Maximum number of disks erased at the same time. Defaults to all of them.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # This logging statement must be here. It is used to signal to other files using pexpect that this script has
+    # started.
+    logger.info("SECURE ERASE FLEET")
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Ensure being run as root.
+    if os.geteuid() != 0:
+        raise SystemExit("Must be run as root.")
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Keep only the external whole disks that aren't the boot disk or the disk Blade Runner is running from.
+    inventory = DiskInventory()
+    protected = protected_disks(["/", os.path.abspath(__file__)], inventory)
+    disks = fleet_disks(disks, protected, inventory)[0]
+    if not disks:
+        raise SystemExit("No disks to erase.")
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Delete the CoreStorage volumes on them, then check them again against the new snapshot.
+    if dismantle_corestorage(disks, inventory):
+        inventory.refresh()
+        disks = fleet_disks(disks, protected, inventory)[0]
+    disks = independent_disks(disks, inventory)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Erase the disks, and verify the ones that were erased.
+    slack_enabled = slack_data["slack_enabled"].lower() == "true"
+    progress = progress_to(log_progress, SlackProgress(bot) if slack_enabled else None)
+    report = EraseReport(serial_number=machine_serial(command_runner), mode="fleet")
+    secure_erase_disks(disks, max_parallel, progress=progress, inventory=inventory, report=report)
+    inventory.refresh()
+    erased = [record.disk for record in report.disks if record.erased]
+    report.add_verifications(VerifyErase.verify_disks(erased, inventory, max_parallel))
+    report.finish()
+    report.write(secure_erase_docs_dir)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Report the result of every disk.
+    summary = "\n".join(report.summary())
+    logger.warn(summary)
+    if slack_enabled:
+        try:
+            bot.send_message("SECURE ERASE FLEET {0}\n{1}".format("SUCCESSFUL" if report.passed else "FAILED",
+                                                                     summary))
+        except urllib2.URLError as e:
+            logger.error("Couldn't send the fleet summary to Slack: {0}".format(e))
+    if not report.passed:
+        raise SystemExit("SECURE ERASE FAILED on {0} of {1} disk(s)".format(
+            len([record for record in report.disks if not record.passed]), len(report.disks)))
+    logger.warn("SECURE ERASE SUCCESSFUL")
 
 
 if __name__ == "__main__":
@@ -727,10 +1449,26 @@ if __name__ == "__main__":
         current_ip = socket.gethostbyname(socket.gethostname())
         bot = IWS(slack_data["slack_url"], bot_name=current_ip, channel=slack_data["slack_channel"])
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Read the erase engine from the secure erase config. Without the config, disks are erased with diskutil.
+    secure_erase_config = os.path.join(blade_runner_dir, "config/secure_erase_config/secure_erase.plist")
+    if os.path.exists(secure_erase_config):
+        secure_erase_settings = plistlib.readPlist(secure_erase_config)
+        zero_fill_engine = zero_fill_from_config(secure_erase_settings)
+        read_back_verifier = read_back_from_config(secure_erase_settings)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
     # Read from print config to enable or disable printing.
     print_config = os.path.join(blade_runner_dir, "config/print_config/print.plist")
     print_settings = plistlib.readPlist(print_config)
     # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
-    # Run main.
-    main()
+    # Erase the internal disks, or the external disks given with --fleet.
+    parser = argparse.ArgumentParser(description="Secure erase the internal disks of this Mac.")
+    parser.add_argument("--fleet", nargs="+", metavar="DISK",
+                        help="erase these external whole disks instead, e.g., Macs in target disk mode")
+    parser.add_argument("--max-parallel", type=int, default=None,
+                        help="maximum number of disks erased at the same time (default: all)")
+    args = parser.parse_args()
+    if args.fleet:
+        fleet_main(args.fleet, args.max_parallel)
+    else:
+        main()
 
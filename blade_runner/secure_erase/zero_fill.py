@@ -0,0 +1,189 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+"""Zero-fill erase engine that writes zeros straight to a raw device, e.g., /dev/rdisk2, instead of going through
+"diskutil secureErase 0". The block size and unbuffered writes can be tuned, and the result is checked by reading back
+a sample of blocks. It works on any file or block device, so it can be benchmarked against a sparse file:
+
+    engine = ZeroFill(block_size=16 * 1024 * 1024)
+    engine.erase("/tmp/disk.img")
+    engine.read_back("/tmp/disk.img")
+"""
+
+import os
+import sys
+import mmap
+import stat
+import errno
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from blade_runner.secure_erase.read_back import ReadBackVerifier
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# fcntl command that turns off the buffer cache for a file on macOS.
+F_NOCACHE = 48
+# Size that writes are aligned to. Unbuffered writes must be aligned to the sector size, and a page is a multiple of it.
+alignment = mmap.PAGESIZE
+# Sector size. An unbuffered write must be a whole number of sectors.
+sector_size = 512
+
+
+def align(size):
+    """Rounds a size up to a multiple of the alignment.
+
+    Args:
+        size (int): Size in bytes.
+
+    Returns:
+        Aligned size (int).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return max(alignment, (size + alignment - 1) // alignment * alignment)
+
+
+class ZeroFill(object):
+    """Writes zeros over a whole device with one reusable, page-aligned buffer.
+
+    Attributes:
+        block_size (int): Bytes written per write.
+        unbuffered (bool): Bypass the buffer cache (O_DIRECT on Linux, F_NOCACHE on macOS) when the device allows it.
+        samples (int): Number of blocks read back by read_back().
+    """
+
+    def __init__(self, block_size=8 * 1024 * 1024, unbuffered=True, samples=64):
+        """Initialize the engine and allocate its zero buffer.
+
+        Args:
+            block_size (int): Bytes written per write. Rounded up to a multiple of the page size.
+            unbuffered (bool): Bypass the buffer cache.
+            samples (int): Number of blocks read back by read_back().
+        """
+        self.logger = logging.getLogger(__name__)
+        self.block_size = align(block_size)
+        self.unbuffered = unbuffered
+        self.samples = samples
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Anonymous memory is page-aligned and zero-filled, which is what unbuffered writes need.
+        self._zeros = mmap.mmap(-1, self.block_size)
+
+    def erase(self, path, size=None, on_progress=None):
+        """Writes zeros over the device from start to end.
+
+        Args:
+            path (str): Device or file, e.g., /dev/rdisk2.
+            size (int): Bytes to write. Required for devices, since macOS reports a size of 0 for raw devices.
+                Defaults to the size of the file if path is a regular file.
+            on_progress (func): Called with the percent written (float) every time it goes up by at least 1%.
+
+        Returns:
+            Bytes written (int).
+
+        Raises:
+            IOError: If the size to write is unknown or 0.
+            OSError: If the device can't be opened or written to.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Only a regular file reports its real size. Erasing 0 bytes would leave the device as it was.
+        if not size:
+            status = os.stat(path)
+            size = status.st_size if stat.S_ISREG(status.st_mode) else 0
+        if not size:
+            raise IOError(errno.EINVAL, "Size of {0} is unknown, nothing was erased".format(path))
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        fd = self._open(path, os.O_WRONLY, direct=True)
+        try:
+            written = 0
+            reported = 0
+            # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+            # Write whole blocks, then what's left. The buffer is never copied.
+            while written < size:
+                remaining = size - written
+                if remaining < self.block_size and remaining % sector_size:
+                    # An unbuffered write must be whole sectors. Write the end of an odd-sized file buffered.
+                    os.close(fd)
+                    fd = os.open(path, os.O_WRONLY)
+                    os.lseek(fd, written, os.SEEK_SET)
+                if remaining >= self.block_size:
+                    written += os.write(fd, self._zeros)
+                else:
+                    written += os.write(fd, buffer(self._zeros, 0, remaining))
+                # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+                percent = 100.0 * written / size
+                if on_progress is not None and (int(percent) > reported or written >= size):
+                    reported = int(percent)
+                    on_progress(percent)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return written
+
+    def read_back(self, path, size=None):
+        """Reads back the first and last blocks and a random sample of blocks, and checks that they are zeros.
+
+        Args:
+            path (str): Device or file.
+            size (int): Size of the device. Defaults to the size the device reports.
+
+        Returns:
+            True if every block read back is zeros.
+            False otherwise.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        verifier = ReadBackVerifier(samples=self.samples, block_size=self.block_size, edge_bytes=self.block_size)
+        return verifier.check(path, size).zero
+
+    def _open(self, path, flags, direct):
+        """Opens the device, unbuffered if enabled and allowed. If the device doesn't allow unbuffered I/O, e.g., a file
+        on tmpfs, it's opened buffered.
+
+        Args:
+            path (str): Device or file.
+            flags (int): os.open flags.
+            direct (bool): Allow O_DIRECT, which needs aligned buffers. os.read's buffers aren't, so reads can't use it.
+
+        Returns:
+            File descriptor (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Linux bypasses the cache with O_DIRECT when opening.
+        if self.unbuffered and direct and hasattr(os, "O_DIRECT"):
+            try:
+                return os.open(path, flags | os.O_DIRECT)
+            except OSError as e:
+                self.logger.debug("Unbuffered I/O isn't available for {0}: {1}".format(path, e))
+                return os.open(path, flags)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # macOS bypasses the cache with F_NOCACHE after opening.
+        fd = os.open(path, flags)
+        if self.unbuffered and fcntl is not None and sys.platform == "darwin":
+            try:
+                fcntl.fcntl(fd, F_NOCACHE, 1)
+            except (IOError, OSError) as e:
+                self.logger.debug("Unbuffered I/O isn't available for {0}: {1}".format(path, e))
+        return fd
@@ -0,0 +1,479 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Durable outbox for Slack messages.
+
+Messages are appended to a queue file and sent by a background thread, so posting a message never waits on Slack and
+a message that can't be sent isn't lost. Messages that are queued within coalesce_window seconds of each other and go
+to the same channel are sent as a single Slack message, one line per message. Messages that fail to send are retried
+with a delay that doubles after every attempt, until they are older than max_age. Messages left in the queue file when
+the process exits are sent by the next outbox that starts with the same file.
+
+The queue file is a JSON lines log of "put", "sent", "retry" and "drop" records. It's truncated once every message in it
+has been sent or dropped. Appends are serialized with a lock file, and sending with a second one, so several Blade
+Runner processes can share a queue file without sending a message twice.
+
+Example:
+
+    # Current working directory is "/path/to/Blade Runner.app/Contents/Resources/Blade Runner/"
+    python -m blade_runner.slack.slack_outbox --status
+    python -m blade_runner.slack.slack_outbox --flush
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import errno
+import socket
+import httplib
+import urllib2
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+
+blade_runner_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(blade_runner_dir))
+
+from blade_runner.dependencies.management_tools import filelock
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+logger = logging.getLogger(__name__)
+
+# File the queued messages are kept in.
+default_outbox_path = os.path.join(os.path.expanduser("~"),
+                                   "Library/Application Support/Blade Runner/slack_outbox.jsonl")
+
+# Number of records in the queue file after which it is rewritten with only the pending messages.
+compact_after = 1000
+
+
+def send_webhook(url, channel, bot_name, text, timeout=30):
+    """Posts a message to a Slack incoming webhook, like IncomingWebhooksSender.send_message, but with a timeout.
+
+    Args:
+        url (str): Incoming webhook URL.
+        channel (str): Channel, e.g., "#offboarding". None for the default channel of the webhook.
+        bot_name (str): Name the message is posted as. None for the default name of the webhook.
+        text (str): Message.
+        timeout (float): Seconds to wait for Slack.
+
+    Returns:
+        void
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    data = {"text": text}
+    if channel:
+        data["channel"] = channel
+    if bot_name:
+        data["username"] = bot_name
+    urllib2.urlopen(urllib2.Request(url, json.dumps(data)), timeout=timeout).read()
+
+
+class SlackOutbox(object):
+    """Queue of Slack messages sent by a background thread.
+
+    Attributes:
+        path (str): Path of the queue file.
+        coalesce_window (float): Seconds a message waits for more messages to the same channel to send them together.
+        max_batch (int): Maximum number of messages sent as a single Slack message.
+        retry_delay (float): Seconds before a message that failed is sent again. Doubles after every attempt.
+        max_retry_delay (float): Longest delay between two attempts.
+        max_age (float): Seconds after which a message that can't be sent is dropped.
+    """
+
+    def __init__(self, path=default_outbox_path, coalesce_window=2.0, max_batch=20, retry_delay=5.0,
+                 max_retry_delay=300.0, max_age=86400.0, sender=None):
+        """Initialize the outbox. The queue file is created when the first message is posted.
+
+        Args:
+            path (str): Path of the queue file.
+            coalesce_window (float): Seconds a message waits for more messages to the same channel.
+            max_batch (int): Maximum number of messages sent as a single Slack message.
+            retry_delay (float): Seconds before a message that failed is sent again.
+            max_retry_delay (float): Longest delay between two attempts.
+            max_age (float): Seconds after which a message that can't be sent is dropped.
+            sender (func): Called with the url, channel, bot name and text of each Slack message. Defaults to
+                send_webhook().
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_age = max_age
+        self._sender = sender or send_webhook
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The background thread sleeps on _wake until a message is due. post() sets it.
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def post(self, url, channel, bot_name, text):
+        """Queues a message and makes sure the background thread is running. Never raises; if the message can't be
+        queued, the error is logged.
+
+        Args:
+            url (str): Incoming webhook URL.
+            channel (str): Channel, e.g., "#offboarding".
+            bot_name (str): Name the message is posted as.
+            text (str): Message.
+
+        Returns:
+            ID of the message (str), or None if it couldn't be queued.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Names from Jamf Pro may not be ASCII, so the text is kept as unicode. Byte strings are taken to be UTF-8.
+        if not isinstance(text, unicode):
+            text = str(text).decode("utf-8", "replace")
+        message = {"id": uuid.uuid4().hex, "url": url, "channel": channel, "bot_name": bot_name, "text": text,
+                   "queued": time.time(), "attempts": 0, "next_attempt": 0}
+        try:
+            self._append([{"op": "put", "message": message}])
+        except (IOError, OSError, filelock.Timeout) as e:
+            self.logger.error(u"Couldn't queue Slack message \"{0}\": {1}".format(text, e))
+            return None
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self.start()
+        self._wake.set()
+        return message["id"]
+
+    def pending(self):
+        """Reads the messages that haven't been sent or dropped.
+
+        Returns:
+            List of messages (dict), oldest first.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not os.path.exists(self.path):
+            return []
+        with self._queue_lock():
+            return self._read()[0].values()
+
+    def start(self):
+        """Starts the background thread if it isn't running. It sends the messages left by earlier runs right away.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="slack-outbox")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background thread. Queued messages stay in the queue file.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def flush(self, timeout=30):
+        """Sends the queued messages that are due from the calling thread, without waiting for the coalesce window.
+        Meant to be called by scripts before they exit.
+
+        Args:
+            timeout (float): Seconds to keep trying.
+
+        Returns:
+            Number of messages still pending (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        deadline = time.time() + timeout
+        while True:
+            wait = self.send_due(force=True)
+            remaining = deadline - time.time()
+            if wait is None or remaining <= 0:
+                break
+            time.sleep(min(wait, remaining))
+        return len(self.pending())
+
+    def send_due(self, force=False):
+        """Sends the messages that are due, grouped by destination. Does nothing if another outbox is sending from the
+        same queue file.
+
+        Args:
+            force (bool): Send messages still in their coalesce window.
+
+        Returns:
+            Seconds until the next pending message is due (float), or None if no message is pending.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        try:
+            send_lock = filelock.FileLock(self.path + ".send.lock", timeout=0)
+            send_lock.acquire()
+        except filelock.Timeout:
+            return self.coalesce_window
+        except (IOError, OSError):
+            # The directory of the queue file doesn't exist yet, so nothing was ever queued.
+            return None
+        try:
+            return self._send_due(force)
+        finally:
+            send_lock.release()
+
+    def _send_due(self, force):
+        """Body of send_due(), run with the send lock held.
+
+        Args:
+            force (bool): Send messages still in their coalesce window.
+
+        Returns:
+            Seconds until the next pending message is due (float), or None if no message is pending.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._queue_lock():
+            pending = self._read()[0]
+        now = time.time()
+        due = [message for message in pending.values() if message["next_attempt"] <= now]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Give a burst time to finish so it's sent as one message, unless the batch is already full.
+        if due and not force and len(due) < self.max_batch:
+            oldest = min(message["queued"] for message in due)
+            if now - oldest < self.coalesce_window:
+                return oldest + self.coalesce_window - now
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Group the messages by destination, in the order they were queued.
+        groups = OrderedDict()
+        for message in due:
+            groups.setdefault((message["url"], message["channel"], message["bot_name"]), []).append(message)
+        for (url, channel, bot_name), messages in groups.items():
+            for i in range(0, len(messages), self.max_batch):
+                batch = messages[i:i + self.max_batch]
+                records = self._send(url, channel, bot_name, batch)
+                self._append(records)
+                for record in records:
+                    if record["op"] != "retry":
+                        for message_id in record["ids"]:
+                            pending.pop(message_id, None)
+                    else:
+                        pending[record["id"]].update(attempts=record["attempts"], next_attempt=record["next_attempt"])
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._compact()
+        if not pending:
+            return None
+        return max(0, min(message["next_attempt"] for message in pending.values()) - time.time())
+
+    def _send(self, url, channel, bot_name, messages):
+        """Sends messages as a single Slack message.
+
+        Args:
+            url (str): Incoming webhook URL.
+            channel (str): Channel.
+            bot_name (str): Name the message is posted as.
+            messages (list): Messages to send.
+
+        Returns:
+            Records to append to the queue file (list).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        ids = [message["id"] for message in messages]
+        try:
+            self._sender(url, channel, bot_name, "\n".join(message["text"] for message in messages))
+        except urllib2.HTTPError as e:
+            # Slack rejects a bad webhook or payload with a 4xx. Sending it again won't help, unless it's rate limiting.
+            if 400 <= e.code < 500 and e.code != 429:
+                self.logger.error("Slack rejected {0} message(s) with HTTP {1}. Dropping them.".format(len(ids),
+                                                                                                     e.code))
+                return [{"op": "drop", "ids": ids, "error": "HTTP {0}".format(e.code)}]
+            error = e
+        except (urllib2.URLError, socket.error, httplib.HTTPException) as e:
+            error = e
+        else:
+            self.logger.info("Sent {0} message(s) to Slack.".format(len(ids)))
+            return [{"op": "sent", "ids": ids}]
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Retry each message later, unless it's too old to be worth sending.
+        self.logger.warn("Couldn't send {0} message(s) to Slack: {1}".format(len(ids), error))
+        records = []
+        now = time.time()
+        for message in messages:
+            if now - message["queued"] > self.max_age:
+                self.logger.error(u"Dropping Slack message \"{0}\" after {1} attempt(s).".format(
+                    message["text"], message["attempts"] + 1))
+                records.append({"op": "drop", "ids": [message["id"]], "error": str(error)})
+                continue
+            attempts = message["attempts"] + 1
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempts - 1))
+            records.append({"op": "retry", "id": message["id"], "attempts": attempts, "next_attempt": now + delay})
+        return records
+
+    def _loop(self):
+        """Body of the background thread.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                wait = self.send_due()
+            except Exception:
+                self.logger.exception("Slack outbox pass failed.")
+                wait = self.retry_delay
+            # Check again now and then for messages queued by other processes.
+            self._wake.wait(self.max_retry_delay if wait is None else wait)
+
+    def _read(self):
+        """Replays the queue file. Must be called with the queue lock held.
+
+        Returns:
+            OrderedDict of message ID to pending message, oldest first, and the number of records in the file (int).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        pending = OrderedDict()
+        records = 0
+        try:
+            f = open(self.path)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return pending, records
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A partial line left by a process that died while appending.
+                    continue
+                records += 1
+                if record["op"] == "put":
+                    pending[record["message"]["id"]] = record["message"]
+                elif record["op"] == "retry" and record["id"] in pending:
+                    pending[record["id"]].update(attempts=record["attempts"], next_attempt=record["next_attempt"])
+                elif record["op"] in ["sent", "drop"]:
+                    for message_id in record["ids"]:
+                        pending.pop(message_id, None)
+        return pending, records
+
+    def _append(self, records):
+        """Appends records to the queue file.
+
+        Args:
+            records (list): Records to append.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        with self._queue_lock():
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(record, sort_keys=True) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _compact(self):
+        """Truncates the queue file when nothing is pending, or rewrites it with only the pending messages when it has
+        grown past compact_after records.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._queue_lock():
+            pending, records = self._read()
+            if not records or (pending and records < compact_after):
+                return
+            with open(self.path + ".tmp", "w") as f:
+                for message in pending.values():
+                    f.write(json.dumps({"op": "put", "message": message}, sort_keys=True) + "\n")
+            os.rename(self.path + ".tmp", self.path)
+
+    def _queue_lock(self):
+        """Locks the queue file against other outboxes, in this process or others, while it's read or written.
+
+        Returns:
+            filelock.FileLock
+        """
+        return filelock.FileLock(self.path + ".lock", timeout=10)
+
+
+# Outbox shared by everything that sends Slack messages from this process.
+outbox = SlackOutbox()
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Parse the arguments.
+    parser = argparse.ArgumentParser(description="Show or send the queued Slack messages.")
+    parser.add_argument("--path", default=default_outbox_path, help="Queue file of the outbox.")
+    parser.add_argument("--status", action="store_true", help="List the queued messages and exit.")
+    parser.add_argument("--flush", action="store_true", help="Send the queued messages and exit.")
+    args = parser.parse_args()
+    slack_outbox = SlackOutbox(args.path)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    if args.flush:
+        remaining = slack_outbox.flush()
+        print("{0} message(s) still queued.".format(remaining))
+        return
+    pending = slack_outbox.pending()
+    for message in pending:
+        print("{0} {1}: {2} ({3} attempt(s))".format(time.strftime("%Y-%m-%d %H:%M:%S",
+                                                                   time.localtime(message["queued"])),
+                                                     message["channel"], message["text"], message["attempts"]))
+    if not pending:
+        print("No queued messages.")
+
+
+if __name__ == "__main__":
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Set up logging vars.
+    fmt = '%(asctime)s %(process)d: %(levelname)8s: %(name)s.%(funcName)s: %(message)s'
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    log_dir = os.path.join(os.path.expanduser("~"), "Library/Logs/Blade Runner")
+    filepath = os.path.join(log_dir, script_name + ".log")
+
+    # Create log path.
+    try:
+        os.makedirs(log_dir)
+    except OSError as e:
+        if e.errno != 17:
+            raise
+
+    # Set up logger.
+    logging.basicConfig(level=logging.DEBUG, format=fmt, filemode='a', filename=filepath)
+    logger = logging.getLogger(script_name)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Run main.
+    main()
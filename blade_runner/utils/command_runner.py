@@ -0,0 +1,277 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: March 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+
+"""Runs external commands, e.g., diskutil and firmwarepasswd, in bounded time. A command that runs longer than its
+timeout, or that prints nothing for longer than its idle timeout, is killed instead of hanging the station.
+"""
+
+import os
+import time
+import errno
+import signal
+import select
+import logging
+import subprocess as sp
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Stands for the runner's default timeout, since None means no timeout.
+DEFAULT = object()
+
+
+class CommandTimeout(sp.CalledProcessError):
+    """Raised when a command is killed for running too long. It is a CalledProcessError, so code that handles failed
+    commands also handles commands that hang.
+
+    Attributes:
+        timeout (float): Seconds the command was allowed to run, or to be idle if it was killed for being idle.
+        duration (float): Seconds the command ran before it was killed.
+    """
+
+    def __init__(self, cmd, output, timeout, duration):
+        sp.CalledProcessError.__init__(self, -signal.SIGKILL, cmd, output)
+        self.timeout = timeout
+        self.duration = duration
+
+    def __str__(self):
+        return "Command '{0}' timed out after {1:.1f} seconds".format(" ".join(self.cmd), self.duration)
+
+
+class CommandResult(object):
+    """Result of a command.
+
+    Attributes:
+        cmd (list): Command that was run.
+        returncode (int): Exit status. None if the command was killed and didn't exit.
+        stdout (str): Standard output. Also holds standard error if it was merged.
+        stderr (str): Standard error. Empty if it was merged into stdout.
+        duration (float): Seconds the last attempt took.
+        attempts (int): Number of times the command was run.
+        timed_out (bool): Whether or not the last attempt was killed for running too long.
+    """
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.returncode = None
+        self.stdout = ""
+        self.stderr = ""
+        self.duration = None
+        self.attempts = 0
+        self.timed_out = False
+
+
+class CommandRunner(object):
+    """Runs commands with a timeout. A command that times out is terminated, then killed if it doesn't exit, and can
+    be run again after a delay that doubles after every attempt.
+
+    Attributes:
+        timeout (float): Default seconds a command is allowed to run. None for no limit.
+        retries (int): Default number of times a command that timed out is run again.
+        retry_delay (float): Seconds waited before the first retry. Doubles after every retry.
+        kill_grace (float): Seconds a terminated command is given to exit before it is killed, and a killed command
+            is given to exit before it is abandoned.
+    """
+
+    def __init__(self, timeout=120, retries=0, retry_delay=1.0, kill_grace=5.0):
+        """Initialize the runner.
+
+        Args:
+            timeout (float): Default seconds a command is allowed to run. None for no limit.
+            retries (int): Default number of times a command that timed out is run again.
+            retry_delay (float): Seconds waited before the first retry.
+            kill_grace (float): Seconds a terminated or killed command is given to exit.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.kill_grace = kill_grace
+
+    def run(self, cmd, timeout=DEFAULT, idle_timeout=None, retries=None, merge_stderr=False, on_output=None, check=True):
+        """Runs a command until it exits or times out. Commands that time out are run again up to retries times.
+        Commands that fail are not, since running diskutil again rarely changes its answer.
+
+        Args:
+            cmd (list): Command to run.
+            timeout (float): Seconds the command is allowed to run. None for no limit. Defaults to the runner's
+                timeout.
+            idle_timeout (float): Seconds the command is allowed to run without printing anything. None for no limit.
+            retries (int): Number of times the command is run again if it times out. Defaults to the runner's retries.
+            merge_stderr (bool): Merge standard error into stdout, like stderr=subprocess.STDOUT.
+            on_output (func): Called with each chunk of stdout as it is printed.
+            check (bool): Raise if the command exits with a nonzero status.
+
+        Returns:
+            CommandResult
+
+        Raises:
+            CommandTimeout: If the last attempt timed out.
+            subprocess.CalledProcessError: If check is True and the command exited with a nonzero status.
+            OSError: If the command doesn't exist.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        timeout = self.timeout if timeout is DEFAULT else timeout
+        retries = self.retries if retries is None else retries
+        result = CommandResult(cmd)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Run the command. Run it again after a delay if it timed out.
+        while True:
+            result.attempts += 1
+            self._run_once(result, timeout, idle_timeout, merge_stderr, on_output)
+            if not result.timed_out or result.attempts > retries:
+                break
+            delay = self.retry_delay * 2 ** (result.attempts - 1)
+            self.logger.warn("{0} timed out. Running it again in {1:.1f} seconds.".format(" ".join(cmd), delay))
+            time.sleep(delay)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if result.timed_out:
+            limit = idle_timeout if timeout is None or (idle_timeout and idle_timeout < timeout) else timeout
+            raise CommandTimeout(cmd, result.stdout + result.stderr, limit, result.duration)
+        if check and result.returncode != 0:
+            raise sp.CalledProcessError(result.returncode, cmd, result.stdout)
+        return result
+
+    def check_output(self, cmd, merge_stderr=False, **kwargs):
+        """Runs a command and returns its output. Takes the place of subprocess.check_output.
+
+        Args:
+            cmd (list): Command to run.
+            merge_stderr (bool): Merge standard error into the output.
+            **kwargs: Passed to run(), e.g., timeout=30, retries=2.
+
+        Returns:
+            Output (str).
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        return self.run(cmd, merge_stderr=merge_stderr, **kwargs).stdout
+
+    def _run_once(self, result, timeout, idle_timeout, merge_stderr, on_output):
+        """Runs the command once and fills in the result.
+
+        Args:
+            result (CommandResult): Result of the command.
+            timeout (float): Seconds the command is allowed to run.
+            idle_timeout (float): Seconds the command is allowed to run without printing anything.
+            merge_stderr (bool): Merge standard error into stdout.
+            on_output (func): Called with each chunk of stdout.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        start = last_output = time.time()
+        proc = sp.Popen(result.cmd, stdout=sp.PIPE, stderr=sp.STDOUT if merge_stderr else sp.PIPE, close_fds=True)
+        streams = {proc.stdout.fileno(): []}
+        if not merge_stderr:
+            streams[proc.stderr.fileno()] = []
+        output = dict(streams)
+        result.timed_out = False
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Read stdout and stderr as they are written, until both are closed or the command times out.
+        while streams:
+            wait = self._time_left(start, timeout, last_output, idle_timeout)
+            if wait is not None and wait <= 0:
+                result.timed_out = True
+                break
+            try:
+                ready = select.select(list(streams), [], [], wait)[0]
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in ready:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    del streams[fd]
+                    continue
+                last_output = time.time()
+                output[fd].append(chunk)
+                if on_output is not None and fd == proc.stdout.fileno():
+                    on_output(chunk)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # The pipes are closed once the command exits. Wait for its exit status, still within the timeout.
+        while not result.timed_out and proc.poll() is None:
+            wait = self._time_left(start, timeout, None, None)
+            if wait is not None and wait <= 0:
+                result.timed_out = True
+                break
+            time.sleep(0.01)
+        if result.timed_out:
+            self._kill(proc)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        result.returncode = proc.returncode
+        result.stdout = "".join(output[proc.stdout.fileno()])
+        result.stderr = "" if merge_stderr else "".join(output[proc.stderr.fileno()])
+        result.duration = time.time() - start
+        for stream in [proc.stdout, proc.stderr]:
+            if stream is not None:
+                stream.close()
+        self.logger.debug("{0} {1} in {2:.2f} seconds".format(
+            " ".join(result.cmd), "timed out" if result.timed_out else "exited with {0}".format(proc.returncode),
+            result.duration))
+
+    def _time_left(self, start, timeout, last_output, idle_timeout):
+        """Computes the seconds left before the command times out.
+
+        Args:
+            start (float): Time the command started at.
+            timeout (float): Seconds the command is allowed to run, or None.
+            last_output (float): Time the command last printed something at, or None.
+            idle_timeout (float): Seconds the command is allowed to be idle, or None.
+
+        Returns:
+            Seconds left (float), or None if there is no limit.
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        now = time.time()
+        limits = []
+        if timeout is not None:
+            limits.append(start + timeout - now)
+        if idle_timeout is not None and last_output is not None:
+            limits.append(last_output + idle_timeout - now)
+        return min(limits) if limits else None
+
+    def _kill(self, proc):
+        """Terminates a command, then kills it if it doesn't exit within kill_grace seconds. A command stuck in the
+        kernel, e.g., on a wedged disk, may not exit even then. It is abandoned so that the caller isn't stuck too.
+
+        Args:
+            proc (subprocess.Popen): Command.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for send in [proc.terminate, proc.kill]:
+            try:
+                send()
+            except OSError:
+                # The command exited in the meantime.
+                pass
+            deadline = time.time() + self.kill_grace
+            while proc.poll() is None and time.time() < deadline:
+                time.sleep(0.01)
+            if proc.returncode is not None:
+                return
+        self.logger.error("Process {0} didn't exit after being killed. Abandoning it.".format(proc.pid))
@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Benchmarks JssServer against the local Jamf Pro stand-in in fake_jamf_pro.py.
+
+Each benchmark reports how long it took (p50/p95 over its runs) and how many requests it sent to Jamf Pro:
+
+    * jss_doc: builds the JssDoc of a computer, starting with an empty cache.
+    * dual_verify: fetches the Jamf Pro data shown by DualVerifyController.
+    * batch_offboard: offboards every record with BatchOffboarder. Latency is reported per record.
+
+Example:
+
+    # Current working directory is the repository root.
+    python test/benchmark_jss_server.py --records 50 --latency 0.05 --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_jamf_pro import FakeJamfPro
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.batch import batch_offboard
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.controllers.dual_verify_controller import DualVerifyController
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+offboard_config = "<computer><general><remote_management><managed>false</managed></remote_management></general>" \
+                  "</computer>"
+search_params = {'barcode_1': 'True', 'barcode_2': 'True', 'asset_tag': 'True', 'serial_number': 'True'}
+
+
+def percentile(values, pct):
+    """Returns the nearest-rank percentile of the values.
+
+    Args:
+        values (list): Numbers.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    ordered = sorted(values)
+    rank = max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(name, durations, requests, jamf_pro):
+    """Builds the result of a benchmark.
+
+    Args:
+        name (str): Name of the benchmark.
+        durations (list): Seconds each run or record took.
+        requests (int): Requests received by Jamf Pro during the benchmark.
+        jamf_pro (FakeJamfPro): The Jamf Pro stand-in.
+
+    Returns:
+        dict
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return {"name": name,
+            "runs": len(durations),
+            "requests": requests,
+            "requests_per_run": round(float(requests) / len(durations), 2),
+            "routes": dict(("{} {}".format(method, route), n) for (method, route), n in jamf_pro.counts.items()),
+            "p50_ms": round(percentile(durations, 50) * 1000, 2),
+            "p95_ms": round(percentile(durations, 95) * 1000, 2)}
+
+
+def bench_jss_doc(jss_server, jamf_pro, runs):
+    """Builds the JssDoc of a record, starting with an empty cache every run."""
+    durations = []
+    jamf_pro.reset_counts()
+    for i in range(runs):
+        jss_server.clear_cache()
+        computer = Computer()
+        computer.jss_id = str(i % jamf_pro.record_count + 1)
+        start = time.time()
+        JssDoc(jss_server, computer)._build_html()
+        durations.append(time.time() - start)
+    return summarize("jss_doc", durations, jamf_pro.request_count(), jamf_pro)
+
+
+def bench_dual_verify(jss_server, jamf_pro, runs):
+    """Fetches the Jamf Pro data shown by the dual verify view, starting with an empty cache every run."""
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # get_jss_data only uses the subsets and the logger of the controller, so it's called without creating the view.
+    controller = DualVerifyController.__new__(DualVerifyController)
+    controller.logger = logging.getLogger(__name__)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    durations = []
+    jamf_pro.reset_counts()
+    for i in range(runs):
+        jss_server.clear_cache()
+        computer = Computer()
+        computer.jss_id = str(i % jamf_pro.record_count + 1)
+        start = time.time()
+        controller.get_jss_data(computer, jss_server)
+        durations.append(time.time() - start)
+    return summarize("dual_verify", durations, jamf_pro.request_count(), jamf_pro)
+
+
+def bench_batch_offboard(jss_server, jamf_pro, workers):
+    """Offboards every record of the Jamf Pro stand-in with BatchOffboarder."""
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    records = [{"barcode_1": jamf_pro.computer(jss_id)["general"]["barcode_1"]}
+               for jss_id in range(1, jamf_pro.record_count + 1)]
+    tmp_dir = tempfile.mkdtemp()
+    jss_server.clear_cache()
+    jamf_pro.reset_counts()
+    try:
+        offboarder = batch_offboard.BatchOffboarder(jss_server, offboard_config, search_params, workers=workers)
+        start = time.time()
+        results = offboarder.run(records, os.path.join(tmp_dir, "results.jsonl"))
+        elapsed = time.time() - start
+    finally:
+        shutil.rmtree(tmp_dir)
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    result = summarize("batch_offboard", [r["duration"] for r in results], jamf_pro.request_count(), jamf_pro)
+    result["total_s"] = round(elapsed, 3)
+    result["records_per_s"] = round(len(results) / elapsed, 2) if elapsed else None
+    result["failed"] = len([r for r in results if r["status"] != "offboarded"])
+    return result
+
+
+def run_benchmarks(records=20, latency=0.0, runs=20, workers=4, error_rate=0.0):
+    """Runs every benchmark against a new Jamf Pro stand-in.
+
+    Args:
+        records (int): Number of computer records in Jamf Pro. Also the size of the batch.
+        latency (float): Seconds Jamf Pro takes to answer each request.
+        runs (int): Runs of the jss_doc and dual_verify benchmarks.
+        workers (int): Workers of the batch offboard.
+        error_rate (float): Fraction of requests answered with a 503.
+
+    Returns:
+        List of benchmark results (dict).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    with FakeJamfPro(records=records, latency=latency, error_rate=error_rate) as jamf_pro:
+        jss_server = JssServer(jss_url=jamf_pro.url, username="user", password="pass", retry_base_delay="0.01",
+                               pool_size=str(workers))
+        try:
+            return [bench_jss_doc(jss_server, jamf_pro, runs),
+                    bench_dual_verify(jss_server, jamf_pro, runs),
+                    bench_batch_offboard(jss_server, jamf_pro, workers)]
+        finally:
+            jss_server._pool.close()
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    parser = argparse.ArgumentParser(description="Benchmark JssServer against a local Jamf Pro stand-in.")
+    parser.add_argument("--records", type=int, default=20, help="Computer records, and size of the batch.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds Jamf Pro takes to answer a request.")
+    parser.add_argument("--runs", type=int, default=20, help="Runs of the jss_doc and dual_verify benchmarks.")
+    parser.add_argument("--workers", type=int, default=4, help="Workers of the batch offboard.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    results = run_benchmarks(args.records, args.latency, args.runs, args.workers, args.error_rate)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    print("{:<16}{:>6}{:>10}{:>14}{:>10}{:>10}".format("benchmark", "runs", "requests", "requests/run", "p50 ms",
+                                                     "p95 ms"))
+    for result in results:
+        print("{name:<16}{runs:>6}{requests:>10}{requests_per_run:>14}{p50_ms:>10}{p95_ms:>10}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
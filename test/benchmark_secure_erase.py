@@ -0,0 +1,161 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Benchmarks the erase and verification of secure_erase_internals against disks simulated with sparse files.
+
+Each benchmark reports how long it took and how many disk operations it ran:
+
+    * sequential: erases the disks one after the other.
+    * parallel: erases the disks at the same time.
+    * verify: verifies the erased disks.
+    * zero_fill_<n>mb: zero-fills a sparse file with ZeroFill, using blocks of n MB. Runs at the speed of the disk
+      the file is on, not the simulated throughput.
+
+Example:
+
+    # Current working directory is the repository root.
+    python test/benchmark_secure_erase.py --disks 4 --size-mb 500 --throughput-mb 250 --block-sizes-mb 1 8 32
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blade_runner.secure_erase import secure_erase_internals as sei
+from blade_runner.secure_erase.zero_fill import ZeroFill
+from blade_runner.secure_erase.disk_backend import SimulatedBackend
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def bench(name, backend, func):
+    """Times a benchmark and counts the disk operations it ran.
+
+    Args:
+        name (str): Name of the benchmark.
+        backend (SimulatedBackend): Backend the benchmark runs against.
+        func (func): Runs the benchmark.
+
+    Returns:
+        Benchmark result (dict).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    backend.calls = {}
+    start = time.time()
+    func()
+    return {"name": name, "seconds": round(time.time() - start, 3), "operations": sum(backend.calls.values())}
+
+
+def bench_zero_fill(tmp_dir, size_mb, block_size_mb):
+    """Times zero-filling a sparse file.
+
+    Args:
+        tmp_dir (str): Directory the file is created in.
+        size_mb (int): Size of the file in MB.
+        block_size_mb (int): Block size of the writes in MB.
+
+    Returns:
+        Benchmark result (dict). Operations are the writes.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    path = os.path.join(tmp_dir, "zero_fill.img")
+    with open(path, "wb") as f:
+        f.truncate(size_mb * 1000 * 1000)
+    engine = ZeroFill(block_size=block_size_mb * 1024 * 1024)
+    start = time.time()
+    engine.erase(path)
+    seconds = time.time() - start
+    os.remove(path)
+    return {"name": "zero_fill_{}mb".format(block_size_mb), "seconds": round(seconds, 3),
+            "operations": -(-size_mb * 1000 * 1000 // engine.block_size)}
+
+
+def run_benchmarks(disks=4, size_mb=100, throughput_mb=100, block_sizes_mb=(1, 8)):
+    """Runs every benchmark.
+
+    Args:
+        disks (int): Number of disks.
+        size_mb (int): Size of each disk in MB.
+        throughput_mb (float): MB erased per second, per disk.
+        block_sizes_mb (list): Block sizes of the zero fill benchmarks, in MB.
+
+    Returns:
+        List of benchmark results (dict).
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    tmp_dir = tempfile.mkdtemp()
+    disk_backend = sei.disk_backend
+    backend = SimulatedBackend(tmp_dir, throughput=throughput_mb * 1000 * 1000)
+    names = ["disk{}".format(i) for i in range(disks)]
+    sei.disk_backend = backend
+    try:
+        def add_disks():
+            for name in names:
+                backend.add_disk(name, size_mb * 1000 * 1000)
+        inventory = sei.DiskInventory()
+        add_disks()
+        results = [bench("sequential", backend,
+                         lambda: sei.secure_erase_disks(names, max_parallel=1, progress=None, inventory=inventory))]
+        add_disks()
+        inventory.refresh()
+        results.append(bench("parallel", backend,
+                             lambda: sei.secure_erase_disks(names, progress=None, inventory=inventory)))
+        inventory.refresh()
+        results.append(bench("verify", backend, lambda: sei.VerifyErase.verify_disks(names, inventory)))
+        results.extend(bench_zero_fill(tmp_dir, size_mb, block_size_mb) for block_size_mb in block_sizes_mb)
+        return results
+    finally:
+        sei.disk_backend = disk_backend
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    parser = argparse.ArgumentParser(description="Benchmark secure erase against simulated disks.")
+    parser.add_argument("--disks", type=int, default=4, help="Number of disks.")
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of each disk in MB.")
+    parser.add_argument("--throughput-mb", type=float, default=100, help="MB erased per second, per disk.")
+    parser.add_argument("--block-sizes-mb", type=int, nargs="+", default=[1, 8], help="Block sizes of zero fill.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    # Keep the erase messages out of the results.
+    logging.getLogger(sei.__name__).setLevel(logging.ERROR)
+    results = run_benchmarks(args.disks, args.size_mb, args.throughput_mb, args.block_sizes_mb)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    print("{:<16}{:>10}{:>12}".format("benchmark", "seconds", "operations"))
+    for result in results:
+        print("{name:<16}{seconds:>10}{operations:>12}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+""" Local stand-in for the Jamf Pro API.
+
+Serves the parts of the Classic API that Blade Runner uses, over HTTP/1.1 keep-alive on 127.0.0.1:
+
+    GET    /JSSResource/computers/match/<term>
+    GET    /JSSResource/computers/id/<id>/subset/<subset>&<subset>...
+    PUT    /JSSResource/computers/id/<id>
+    DELETE /JSSResource/computers/id/<id>
+
+Records are kept in memory. Latency can be added to every response and errors can be injected, and every request is
+counted by method and route so tests and benchmarks can check how many calls the client made.
+
+Example:
+
+    with FakeJamfPro(records=10, latency=0.02) as jamf_pro:
+        jss_server = JssServer(jss_url=jamf_pro.url, username="user", password="pass")
+        jss_id = jss_server.match(jamf_pro.computer(1)["general"]["serial_number"])
+"""
+
+import re
+import json
+import time
+import random
+import urllib
+import logging
+import threading
+import collections
+import BaseHTTPServer
+import SocketServer
+import xml.etree.cElementTree as ET
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Routes of the API, as (name, regex).
+routes = [("match", re.compile(r"^/JSSResource/computers/match/(?P<term>.+)$")),
+          ("subset", re.compile(r"^/JSSResource/computers/id/(?P<id>\d+)/subset/(?P<subsets>.+)$")),
+          ("computer", re.compile(r"^/JSSResource/computers/id/(?P<id>\d+)$"))]
+
+# Fields of the general subset that a PUT can update.
+general_fields = ["name", "serial_number", "barcode_1", "barcode_2", "asset_tag"]
+
+
+def make_computer(jss_id):
+    """Creates a computer record with made up, unique identifiers.
+
+    Args:
+        jss_id (int): JSS ID of the record.
+
+    Returns:
+        Computer record (dict) keyed by subset.
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    return {
+        "general": {"id": jss_id,
+                    "name": "lab-{:05d}".format(jss_id),
+                    "serial_number": "C02FAKE{:05d}".format(jss_id),
+                    "barcode_1": "BC1{:05d}".format(jss_id),
+                    "barcode_2": "BC2{:05d}".format(jss_id),
+                    "asset_tag": "AT{:05d}".format(jss_id),
+                    "remote_management": {"managed": True}},
+        "hardware": {"model": "MacBook Pro (Retina, 13-inch, Early 2015)",
+                     "total_ram": 8192,
+                     "storage": [{"drive_capacity_mb": 250000}]},
+        "location": {"username": "", "building": ""},
+        "extension_attributes": [],
+    }
+
+
+def to_xml(tag, value):
+    """Converts JSON-like data into an XML element the way the Classic API does.
+
+    Args:
+        tag (str): Tag of the element.
+        value: dict, list, or scalar.
+
+    Returns:
+        ET.Element
+    """
+    # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+    element = ET.Element(tag)
+    if isinstance(value, dict):
+        for key, child in value.items():
+            element.append(to_xml(key, child))
+    elif isinstance(value, list):
+        for child in value:
+            element.append(to_xml(tag.rstrip("s") or "item", child))
+    elif isinstance(value, bool):
+        element.text = str(value).lower()
+    else:
+        element.text = unicode(value)
+    return element
+
+
+class FakeJamfProHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers Classic API requests from the records of the server."""
+    protocol_version = "HTTP/1.1"
+    # Send each response in one write. Otherwise the status line, headers, and body go out as separate small packets
+    # and delayed ACKs add ~40 ms to every keep-alive request, which would swamp what's being measured.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Read the body so the connection can be reused, then find the route.
+        length = int(self.headers.getheader('Content-Length', 0))
+        body = self.rfile.read(length) if length else ""
+        fake = self.server.fake
+        route, match = None, None
+        for name, regex in routes:
+            match = regex.match(self.path)
+            if match:
+                route = name
+                break
+        fake._count(self.command, route)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Simulate the time the JSS takes to answer.
+        if fake.latency:
+            time.sleep(fake.latency)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Injected errors come first. A code of None drops the connection without a response.
+        error = fake._take_error(self.command, route)
+        if error is not None:
+            code, retry_after = error
+            if code is None:
+                self.close_connection = 1
+                return
+            headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+            return self._send(code, "<html><body>Error: injected {}</body></html>".format(code), "text/html", headers)
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        if not fake._authorized(self.headers.getheader('Authorization', "")):
+            return self._send(401, "Unauthorized", "text/plain")
+        if route is None:
+            return self._send(404, "Not Found", "text/plain")
+        handler = getattr(self, "_{}_{}".format(self.command.lower(), route), None)
+        if handler is None:
+            return self._send(405, "Method Not Allowed", "text/plain")
+        handler(match, body)
+
+    do_GET = do_PUT = do_DELETE = do_POST = _handle
+
+    def _get_match(self, match, body):
+        term = urllib.unquote(match.group("term"))
+        computers = [{"id": general["id"], "name": general["name"], "serial_number": general["serial_number"]}
+                     for general in self.server.fake._match(term)]
+        self._send_data("computers", computers)
+
+    def _get_subset(self, match, body):
+        record = self.server.fake.computer(int(match.group("id")))
+        if record is None:
+            return self._send(404, "Not Found", "text/plain")
+        computer = {}
+        for subset in urllib.unquote(match.group("subsets")).split("&"):
+            if subset.lower() in record:
+                computer[subset.lower()] = record[subset.lower()]
+        self._send_data("computer", computer)
+
+    def _put_computer(self, match, body):
+        jss_id = int(match.group("id"))
+        try:
+            xml = ET.fromstring(body)
+        except SyntaxError:
+            return self._send(400, "<html><body>Error: malformed XML</body></html>", "text/html")
+        if not self.server.fake._update(jss_id, xml):
+            return self._send(404, "Not Found", "text/plain")
+        self._send(201, '<?xml version="1.0" encoding="UTF-8"?><computer><id>{}</id></computer>'.format(jss_id),
+                   "text/xml")
+
+    def _delete_computer(self, match, body):
+        jss_id = int(match.group("id"))
+        if not self.server.fake._delete(jss_id):
+            return self._send(404, "Not Found", "text/plain")
+        self._send(200, '<?xml version="1.0" encoding="UTF-8"?><computer><id>{}</id></computer>'.format(jss_id),
+                   "text/xml")
+
+    def _send_data(self, key, data):
+        # Answer with JSON if the client asked for it, otherwise with XML, like the Classic API.
+        if "application/json" in self.headers.getheader('Accept', ""):
+            return self._send(200, json.dumps({key: data}), "application/json")
+        self._send(200, ET.tostring(to_xml(key, data), encoding="utf-8"), "text/xml")
+
+    def _send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.fake._add_bytes(len(body))
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class FakeJamfPro(object):
+    """In-memory Jamf Pro served over HTTP on 127.0.0.1.
+
+    Attributes:
+        url (str): Base URL of the server, to be used as jss_url.
+        latency (float): Seconds added to every response.
+        error_rate (float): Fraction of requests, chosen at random, answered with a 503.
+    """
+
+    def __init__(self, records=0, latency=0.0, error_rate=0.0, username="user", password="pass", seed=0):
+        """Initialize the server. The server isn't started until start() is called.
+
+        Args:
+            records (int): Number of made up computer records to create, with JSS IDs 1 to records.
+            latency (float): Seconds added to every response.
+            error_rate (float): Fraction of requests answered with a 503.
+            username (str): Username the requests must authenticate with. None accepts any credentials.
+            password (str): Password the requests must authenticate with.
+            seed (int): Seed of the random error injection, so runs are repeatable.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.url = None
+        self._credentials = None if username is None else "{}:{}".format(username, password)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._records = {}
+        self._errors = []
+        self._server = None
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        # Maps (method, route) to the number of requests received. Bytes sent in response bodies are also counted.
+        self.counts = collections.Counter()
+        self.bytes_sent = 0
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        for jss_id in range(1, records + 1):
+            self._records[jss_id] = make_computer(jss_id)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts serving on a free port in a background thread.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), FakeJamfProHandler)
+        self._server.fake = self
+        self.url = "http://127.0.0.1:{}".format(self._server.server_address[1])
+        thread = threading.Thread(target=self._server.serve_forever, args=(0.05,))
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """Stops the server.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_computer(self, **general):
+        """Adds a computer record. Identifiers that aren't given are made up.
+
+        Args:
+            **general: Fields of the general subset, e.g., serial_number="C02ABC".
+
+        Returns:
+            JSS ID (int)
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            jss_id = max(self._records or [0]) + 1
+            record = make_computer(jss_id)
+            record["general"].update(general)
+            self._records[jss_id] = record
+        return jss_id
+
+    @property
+    def record_count(self):
+        """Number of computer records."""
+        with self._lock:
+            return len(self._records)
+
+    def computer(self, jss_id):
+        """Returns the record for the JSS ID or None if it DNE."""
+        with self._lock:
+            return self._records.get(int(jss_id), None)
+
+    def inject_error(self, code, count=1, method=None, route=None, retry_after=None):
+        """Answers the next matching requests with an error.
+
+        Args:
+            code (int): HTTP status code, or None to drop the connection without a response.
+            count (int): Number of requests answered with the error.
+            method (str): Only match this HTTP method, e.g., "PUT". None matches every method.
+            route (str): Only match this route: "match", "subset", or "computer". None matches every route.
+            retry_after (int): Value of the Retry-After header sent with the error.
+
+        Returns:
+            void
+        """
+        # <><><><><><><><><><><><><><><><><><><><><><><><><><><><><><>
+        with self._lock:
+            for i in range(count):
+                self._errors.append((code, method, route, retry_after))
+
+    def request_count(self, method=None, route=None):
+        """Returns the number of requests received for the method and route. None matches everything."""
+        with self._lock:
+            return sum(n for (m, r), n in self.counts.items()
+                       if (method is None or m == method) and (route is None or r == route))
+
+    def reset_counts(self):
+        """Resets the request and byte counters."""
+        with self._lock:
+            self.counts.clear()
+            self.bytes_sent = 0
+
+    def _count(self, method, route):
+        with self._lock:
+            self.counts[(method, route)] += 1
+
+    def _add_bytes(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def _authorized(self, header):
+        if self._credentials is None:
+            return True
+        return header == "Basic " + self._credentials.encode("base64").replace("\n", "")
+
+    def _take_error(self, method, route):
+        with self._lock:
+            for i, (code, e_method, e_route, retry_after) in enumerate(self._errors):
+                if (e_method is None or e_method == method) and (e_route is None or e_route == route):
+                    del self._errors[i]
+                    return code, retry_after
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 503, None
+        return None
+
+    def _match(self, term):
+        with self._lock:
+            return [record["general"] for jss_id, record in sorted(self._records.items())
+                    if term in [record["general"].get(field) for field in general_fields]]
+
+    def _update(self, jss_id, xml):
+        with self._lock:
+            record = self._records.get(jss_id, None)
+            if record is None:
+                return False
+            general = xml.find("general")
+            if general is not None:
+                for field in general_fields:
+                    element = general.find(field)
+                    if element is not None:
+                        record["general"][field] = element.text or ""
+                managed = general.find("remote_management/managed")
+                if managed is not None:
+                    record["general"]["remote_management"]["managed"] = (managed.text or "").lower() == "true"
+            return True
+
+    def _delete(self, jss_id):
+        with self._lock:
+            return self._records.pop(jss_id, None) is not None
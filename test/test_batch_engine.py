@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import time
+import logging
+import unittest
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.batch.engine import BatchEngine, TokenBucket
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_is_not_delayed(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        waited = [bucket.acquire() for i in range(3)]
+
+        self.assertEqual([0.0, 0.0, 0.0], waited)
+
+    def test_empty_bucket_waits_for_a_token(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+
+        start = time.time()
+        bucket.acquire()
+
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+
+class TestBatchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = BatchEngine(max_in_flight=2)
+
+    def test_map_bounds_records_in_flight(self):
+        lock = threading.Lock()
+        state = {"in_flight": 0, "max": 0}
+
+        def work(item):
+            with lock:
+                state["in_flight"] += 1
+                state["max"] = max(state["max"], state["in_flight"])
+            time.sleep(0.02)
+            with lock:
+                state["in_flight"] -= 1
+            return item
+
+        results = list(self.engine.map(work, range(6)))
+
+        self.assertEqual(range(6), sorted(results))
+        self.assertEqual(2, state["max"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
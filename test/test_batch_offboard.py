@@ -0,0 +1,147 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.batch import batch_offboard as bo
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class FakeJssServer(object):
+    """Keeps computer records in memory and answers the JssServer calls made in batch mode."""
+
+    def __init__(self, records):
+        self.records = records
+        self.pushed = []
+        self.lock = threading.Lock()
+
+    def match(self, search_param):
+        for jss_id, general in self.records.items():
+            if search_param in [general["serial_number"], general["barcode_1"], general["barcode_2"],
+                                general["asset_tag"]]:
+                return jss_id
+        return None
+
+    def prefetch(self, jss_id, subsets):
+        pass
+
+    def get_barcode_1(self, jss_id):
+        return self.records[jss_id]["barcode_1"]
+
+    def get_barcode_2(self, jss_id):
+        return self.records[jss_id]["barcode_2"]
+
+    def get_asset_tag(self, jss_id):
+        return self.records[jss_id]["asset_tag"]
+
+    def get_serial(self, jss_id):
+        return self.records[jss_id]["serial_number"]
+
+    def get_managed_status(self, jss_id):
+        return self.records[jss_id]["managed"]
+
+    def push_identity_fields(self, computer):
+        with self.lock:
+            self.pushed.append(("identity", computer.jss_id))
+
+    def push_xml_str(self, xml_str, jss_id):
+        with self.lock:
+            self.pushed.append(("offboard", jss_id))
+        if "<managed>false</managed>" in xml_str and not self.records[jss_id].get("stuck", False):
+            self.records[jss_id]["managed"] = "false"
+
+
+class TestBatchOffboard(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.results_file = os.path.join(self.tmp_dir, "results.jsonl")
+
+        self.jamf = FakeJssServer({
+            "1": {"serial_number": "SERIAL1", "barcode_1": "bc1", "barcode_2": "", "asset_tag": "a1",
+                  "managed": "true"},
+            "2": {"serial_number": "SERIAL2", "barcode_1": "bc2", "barcode_2": "", "asset_tag": "a2",
+                  "managed": "true", "stuck": True},
+        })
+        self.offboard_config = "<computer><general><remote_management><managed>false</managed>" \
+                               "</remote_management></general></computer>"
+        self.search_params = {'barcode_1': 'True', 'barcode_2': 'True', 'asset_tag': 'True',
+                              'serial_number': 'False'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_read_csv_manifest(self):
+        path = self._write("manifest.csv", "Serial_Number,barcode_1,notes\nSERIAL1,bc1,x\n,bc2,\n")
+
+        records = bo.read_manifest(path)
+
+        self.assertEqual([{"serial_number": "SERIAL1", "barcode_1": "bc1"}, {"barcode_1": "bc2"}], records)
+
+    def test_read_jsonl_manifest(self):
+        path = self._write("manifest.jsonl", '{"asset_tag": "a1", "name": "lab-1"}\n\n{"barcode_1": "bc2"}\n')
+
+        records = bo.read_manifest(path)
+
+        self.assertEqual([{"asset_tag": "a1", "name": "lab-1"}, {"barcode_1": "bc2"}], records)
+        self.assertIsInstance(records[0]["asset_tag"], str)
+
+    def test_run_writes_a_result_per_record(self):
+        records = [{"barcode_1": "bc1", "asset_tag": "wrong"}, {"asset_tag": "a2"}, {"barcode_1": "nope"},
+                   {"serial_number": "SERIAL1"}]
+        offboarder = bo.BatchOffboarder(self.jamf, self.offboard_config, self.search_params, workers=2)
+
+        offboarder.run(records, self.results_file)
+
+        with open(self.results_file) as f:
+            results = sorted((json.loads(line) for line in f), key=lambda r: r["line"])
+        self.assertEqual(["offboarded", "failed", "not_found", "not_found"], [r["status"] for r in results])
+        self.assertEqual("1", results[0]["jss_id"])
+        self.assertEqual("barcode_1", results[0]["matched_by"])
+        self.assertEqual({"asset_tag": "a1"}, results[0]["conflicts"])
+        self.assertIn("Managed status", results[1]["error"])
+        self.assertIn(("offboard", "1"), self.jamf.pushed)
+
+    def test_summarize(self):
+        results = [{"status": "offboarded"}, {"status": "offboarded"}, {"status": "failed"}]
+
+        self.assertEqual("Batch offboard finished: 3 record(s); 1 failed, 2 offboarded.", bo.summarize(results))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
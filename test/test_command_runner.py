@@ -0,0 +1,139 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+import subprocess as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.utils.command_runner import CommandRunner, CommandTimeout
+from blade_runner.secure_erase.disk_backend import DiskutilBackend
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestCommandRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.runner = CommandRunner(timeout=5, retry_delay=0, kill_grace=0.5)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def sh(self, script, **kwargs):
+        return self.runner.run(["sh", "-c", script], **kwargs)
+
+    def test_output_is_captured(self):
+        result = self.sh("echo out; echo err >&2")
+
+        self.assertEqual(("out\n", "err\n", 0, 1), (result.stdout, result.stderr, result.returncode, result.attempts))
+        self.assertLess(result.duration, 5)
+
+        merged = self.sh("echo out; echo err >&2", merge_stderr=True)
+
+        self.assertEqual(("out\nerr\n", ""), (merged.stdout, merged.stderr))
+
+    def test_failure_raises_with_output(self):
+        with self.assertRaises(sp.CalledProcessError) as context:
+            self.sh("echo Resource busy; exit 3")
+
+        self.assertEqual((3, "Resource busy\n"), (context.exception.returncode, context.exception.output))
+        self.assertEqual(3, self.sh("exit 3", check=False).returncode)
+
+    def test_hung_command_is_killed(self):
+        start = time.time()
+
+        with self.assertRaises(CommandTimeout) as context:
+            self.sh("echo started; sleep 30", timeout=0.2)
+
+        self.assertLess(time.time() - start, 2)
+        self.assertIsInstance(context.exception, sp.CalledProcessError)
+        self.assertEqual("started\n", context.exception.output)
+        self.assertEqual(0.2, context.exception.timeout)
+
+    def test_command_ignoring_terminate_is_killed(self):
+        start = time.time()
+
+        with self.assertRaises(CommandTimeout):
+            self.sh("trap '' TERM; sleep 30", timeout=0.2)
+
+        self.assertLess(time.time() - start, 2)
+
+    def test_idle_timeout(self):
+        result = self.sh("for i in 1 2 3 4 5; do echo $i; sleep 0.1; done", timeout=None, idle_timeout=0.5)
+
+        self.assertEqual("1\n2\n3\n4\n5\n", result.stdout)
+
+        with self.assertRaises(CommandTimeout) as context:
+            self.sh("echo 1; sleep 30", timeout=None, idle_timeout=0.2)
+
+        self.assertEqual(0.2, context.exception.timeout)
+
+    def test_timed_out_command_is_retried(self):
+        flag = os.path.join(self.tmp_dir, "flag")
+
+        result = self.sh("if [ -f {0} ]; then echo ok; else touch {0}; sleep 30; fi".format(flag), timeout=0.3,
+                         retries=1)
+
+        self.assertEqual(("ok\n", 2), (result.stdout, result.attempts))
+
+    def test_output_is_streamed(self):
+        chunks = []
+
+        self.sh("echo 10%; sleep 0.1; echo 20%", on_output=chunks.append)
+
+        self.assertEqual(["10%\n", "20%\n"], chunks)
+
+    def test_missing_command(self):
+        with self.assertRaises(OSError):
+            self.runner.run(["no-such-command-blade-runner"])
+
+    def test_hung_diskutil_is_retried_and_killed(self):
+        calls = os.path.join(self.tmp_dir, "calls")
+        diskutil = os.path.join(self.tmp_dir, "diskutil")
+        with open(diskutil, "w") as f:
+            f.write("#!/bin/sh\necho $@ >> {0}\nsleep 30\n".format(calls))
+        os.chmod(diskutil, 0755)
+        path = os.environ['PATH']
+        os.environ['PATH'] = self.tmp_dir + os.pathsep + path
+        try:
+            backend = DiskutilBackend(self.runner, timeouts={"info": 0.2, "unmount": 0.2})
+
+            self.assertRaises(CommandTimeout, backend.info, "disk0")
+            self.assertRaises(CommandTimeout, backend.unmount, "disk0")
+        finally:
+            os.environ['PATH'] = path
+
+        with open(calls) as f:
+            self.assertEqual(["info -plist disk0"] * 3 + ["unmount force disk0"], f.read().splitlines())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
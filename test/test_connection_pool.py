@@ -0,0 +1,152 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+import os
+import sys
+import time
+import logging
+import urllib2
+import unittest
+import threading
+import BaseHTTPServer
+import SocketServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.jamf_pro.connection_pool import ConnectionPool, build_pooled_opener
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers every request with its method and path over a keep-alive connection."""
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self):
+        self.server.connections.add(self.client_address)
+        self.server.requests.append(self.path)
+        length = int(self.headers.getheader('Content-Length', 0))
+        self.rfile.read(length)
+        if self.path.endswith("/slow"):
+            time.sleep(0.5)
+        code = 404 if self.path.endswith("/missing") else 200
+        body = "{} {}".format(self.command, self.path)
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Close the connection without telling the client, like a server whose keep-alive timeout has passed.
+        if self.path.endswith("/close"):
+            self.close_connection = 1
+
+    do_GET = do_PUT = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = KeepAliveServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.server.connections = set()
+        self.server.requests = []
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.pool = ConnectionPool(max_size=2, idle_timeout=60)
+        self.opener = build_pooled_opener(self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_reuse_connection(self):
+        for i in range(5):
+            response = self.opener.open(self.url + "/JSSResource/computers/id/{}".format(i))
+            self.assertEqual(200, response.code)
+            self.assertEqual("GET /JSSResource/computers/id/{}".format(i), response.read())
+
+        self.assertEqual(1, len(self.server.connections))
+
+    def test_put_and_delete_reuse_connection(self):
+        put = urllib2.Request(self.url + "/JSSResource/computers/id/1", data="<computer/>")
+        put.get_method = lambda: 'PUT'
+        delete = urllib2.Request(self.url + "/JSSResource/computers/id/1")
+        delete.get_method = lambda: 'DELETE'
+
+        self.assertEqual("PUT /JSSResource/computers/id/1", self.opener.open(put).read())
+        self.assertEqual("DELETE /JSSResource/computers/id/1", self.opener.open(delete).read())
+
+        self.assertEqual(1, len(self.server.connections))
+
+    def test_http_errors_are_raised(self):
+        with self.assertRaises(urllib2.HTTPError) as context:
+            self.opener.open(self.url + "/missing")
+
+        self.assertEqual(404, context.exception.code)
+
+    def test_idle_connections_are_evicted(self):
+        self.pool.idle_timeout = 0
+        self.opener.open(self.url + "/a").read()
+        time.sleep(0.01)
+        self.opener.open(self.url + "/b").read()
+
+        self.assertEqual(2, len(self.server.connections))
+
+    def test_pool_size_is_bounded(self):
+        conns = [self.pool._new_connection(("http", "127.0.0.1"), 5) for i in range(4)]
+        for conn in conns:
+            self.pool._put_connection(("http", "127.0.0.1"), conn)
+
+        self.assertEqual(2, len(self.pool._idle[("http", "127.0.0.1")]))
+
+    def test_stale_connection_is_replaced(self):
+        self.opener.open(self.url + "/close").read()
+        time.sleep(0.1)
+
+        response = self.opener.open(self.url + "/b")
+
+        self.assertEqual("GET /b", response.read())
+        self.assertEqual(2, len(self.server.connections))
+
+    def test_timeout_is_not_resent(self):
+        self.opener.open(self.url + "/a", timeout=0.1).read()
+        delete = urllib2.Request(self.url + "/slow")
+        delete.get_method = lambda: 'DELETE'
+
+        # The server may have acted on the request, so it's left to the retry policy to send it again.
+        self.assertRaises(urllib2.URLError, self.opener.open, delete)
+        time.sleep(0.5)
+
+        self.assertEqual(["/a", "/slow"], self.server.requests)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
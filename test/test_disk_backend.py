@@ -0,0 +1,293 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark_secure_erase
+from blade_runner.secure_erase import secure_erase_internals as sei
+from blade_runner.secure_erase.zero_fill import ZeroFill
+from blade_runner.secure_erase.read_back import ReadBackVerifier
+from blade_runner.secure_erase.disk_backend import SimulatedBackend
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestSimulatedErase(unittest.TestCase):
+    """Runs the erase and verification of secure_erase_internals against disks simulated with sparse files."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = SimulatedBackend(self.tmp_dir)
+        self.disk_backend = sei.disk_backend
+        sei.disk_backend = self.backend
+
+    def tearDown(self):
+        sei.disk_backend = self.disk_backend
+        sei.zero_fill_engine = None
+        sei.read_back_verifier = None
+        shutil.rmtree(self.tmp_dir)
+
+    def erase_and_verify(self, disks, **kwargs):
+        inventory = sei.DiskInventory()
+        erased = sei.secure_erase_disks(disks, inventory=inventory, progress=None, **kwargs)
+        inventory.refresh()
+        return erased, sei.VerifyErase.verify_disks(disks, inventory)
+
+    def test_erase_zeroes_the_disk_and_passes_verification(self):
+        disk = self.backend.add_disk("disk0", 4 * 1024 * 1024)
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+
+        self.assertTrue(erased)
+        self.assertTrue(verifications[0].passed)
+        with open(disk.path, "rb") as f:
+            self.assertEqual("\0" * 4096, f.read(4096))
+        self.assertEqual(4 * 1024 * 1024, os.path.getsize(disk.path))
+
+    def test_unerased_disk_fails_verification(self):
+        self.backend.add_disk("disk0", 1024)
+
+        verification = sei.VerifyErase.verify("disk0", sei.DiskInventory())
+
+        self.assertEqual(['by_verify_disk', 'by_type_name', 'by_all_disks', 'by_volumes_from_disks'],
+                         verification.failed)
+
+    def test_busy_disk_is_unmounted_and_erased_again(self):
+        self.backend.add_disk("disk0", 1024, busy=True)
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+
+        self.assertTrue(erased)
+        self.assertEqual(2, self.backend.calls["secure_erase"])
+        self.assertEqual(1, self.backend.calls["unmount"])
+
+    def test_erase_is_recorded_in_the_report(self):
+        self.backend.add_disk("disk0", 1024, busy=True)
+        self.backend.add_disk("disk1", 1024, needs_repair=True)
+        report = sei.EraseReport()
+
+        sei.secure_erase_disks(["disk0", "disk1"], inventory=sei.DiskInventory(), progress=None, report=report)
+
+        records = report.as_dict()["disks"]
+        self.assertEqual([("disk0", 1024, "simulated", True, 1, ["force_unmount"]),
+                          ("disk1", 1024, "simulated", True, 2, ["force_unmount", "repair"])],
+                         [(r["disk"], r["size"], r["method"], r["erased"], r["retries"], r["recovery"])
+                          for r in records])
+        self.assertTrue(all(r["duration"] is not None for r in records))
+
+    def test_disk_needing_repair_is_repaired_and_erased_a_final_time(self):
+        self.backend.add_disk("disk0", 1024, needs_repair=True)
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+
+        self.assertTrue(erased)
+        self.assertEqual(3, self.backend.calls["secure_erase"])
+        self.assertEqual(1, self.backend.calls["repair"])
+
+    def test_erase_fails_after_three_attempts(self):
+        self.backend.add_disk("disk0", 1024)
+        self.backend.add_disk("disk1", 1024)
+        self.backend.fail("secure_erase", "disk1", count=3)
+
+        erased, verifications = self.erase_and_verify(["disk0", "disk1"])
+
+        self.assertFalse(erased)
+        self.assertEqual([True, False], [v.passed for v in verifications])
+
+    def test_container_goes_away_with_its_physical_store(self):
+        self.backend.add_disk("disk0", 1024)
+        self.backend.add_disk("disk1", 1024, physical_store="disk0")
+        inventory = sei.DiskInventory()
+        disks = sei.independent_disks(["disk0", "disk1"], inventory)
+
+        sei.secure_erase_disks(disks, inventory=inventory, progress=None)
+
+        self.assertEqual(["disk0"], disks)
+        self.assertEqual(["disk0"], self.backend.list()["WholeDisks"])
+
+    def test_core_storage_is_deleted(self):
+        self.backend.add_disk("disk0", 1024, lvg_uuid="LVG-UUID")
+        inventory = sei.DiskInventory()
+
+        self.assertTrue(sei.delete_corestorage(sei.get_lvgUUID("disk0", inventory)))
+        inventory.refresh()
+
+        self.assertFalse(sei.is_coreStorage("disk0", inventory))
+
+    def test_erase_latency_and_progress(self):
+        self.backend.throughput = 10 * 1000 * 1000
+        self.backend.add_disk("disk0", 1000 * 1000)
+        self.backend.add_disk("disk1", 1000 * 1000)
+        seen = []
+        start = time.time()
+
+        sei.secure_erase_disks(["disk0", "disk1"], progress=lambda p: seen.append((p.disk, p.percent)))
+
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertEqual(20, len(seen))
+        self.assertIn(("disk1", 100.0), seen)
+
+    def test_zero_fill_engine(self):
+        sei.zero_fill_engine = ZeroFill(block_size=64 * 1024)
+        disk = self.backend.add_disk("disk0", 1024 * 1024, busy=True)
+        seen = []
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+        sei.run_secure_erase("disk0", lambda p: seen.append(p.percent), disk.size)
+
+        self.assertTrue(erased)
+        self.assertTrue(verifications[0].passed)
+        self.assertNotIn("secure_erase", self.backend.calls)
+        self.assertEqual(100.0, seen[-1])
+
+    def test_zero_fill_size_comes_from_diskutil(self):
+        sizes = []
+
+        class Engine(ZeroFill):
+            def erase(self, path, size=None, on_progress=None):
+                sizes.append(size)
+                return ZeroFill.erase(self, path, size, on_progress)
+
+        sei.zero_fill_engine = Engine(block_size=64 * 1024)
+        self.backend.add_disk("disk0", 1024 * 1024)
+
+        sei.run_secure_erase("disk0")
+
+        self.assertEqual([1024 * 1024], sizes)
+
+    def test_zero_fill_failure_is_recovered(self):
+        sei.zero_fill_engine = ZeroFill(block_size=64 * 1024)
+        self.backend.add_disk("disk0", 1024 * 1024)
+        self.backend.fail("unmount", "disk0")
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+
+        self.assertTrue(erased)
+        self.assertEqual(3, self.backend.calls["unmount"])
+
+    def test_zero_fill_from_config(self):
+        self.assertIsNone(sei.zero_fill_from_config({}))
+        self.assertIsNone(sei.zero_fill_from_config({"erase_engine": "diskutil"}))
+        engine = sei.zero_fill_from_config({"erase_engine": "Zero_Fill", "block_size_mb": "2", "unbuffered": "False",
+                                            "read_back_samples": "16"})
+        self.assertEqual((2 * 1024 * 1024, False, 16), (engine.block_size, engine.unbuffered, engine.samples))
+
+    def test_read_back_finds_data_left_behind_the_partition_map(self):
+        sei.read_back_verifier = ReadBackVerifier(samples=16, block_size=4096, edge_bytes=4096)
+        self.backend.add_disk("disk0", 64 * 4096)
+        self.backend.add_disk("disk1", 64 * 4096, data="\0" * 512 + "user data")
+
+        erased, verifications = self.erase_and_verify(["disk0"])
+        verification = sei.VerifyErase.verify("disk1", sei.DiskInventory())
+
+        self.assertTrue(verifications[0].passed)
+        self.assertTrue(verifications[0].as_dict()["read_back"]["zero"])
+        self.assertEqual(["by_read_back"], verification.failed)
+        self.assertEqual(0, verification.read_back.nonzero_offset)
+
+    def test_read_back_from_config(self):
+        self.assertIsNone(sei.read_back_from_config({}))
+        verifier = sei.read_back_from_config({"read_back_verify": "True", "read_back_samples": "16",
+                                              "read_back_tolerance_percent": "0.5"})
+        self.assertEqual((16, 0.005), (verifier.samples, verifier.tolerance))
+
+    def test_benchmarks_run(self):
+        results = benchmark_secure_erase.run_benchmarks(disks=2, size_mb=1, throughput_mb=100, block_sizes_mb=[1])
+
+        self.assertEqual(["sequential", "parallel", "verify", "zero_fill_1mb"], [r["name"] for r in results])
+        self.assertIs(self.backend, sei.disk_backend)
+
+
+class TestFleet(unittest.TestCase):
+    """Runs fleet mode against simulated external disks. The boot disk is an APFS container on disk0."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = SimulatedBackend(self.tmp_dir)
+        self.backend.add_disk("disk0", 4096)
+        self.backend.add_disk("disk1", 4096, physical_store="disk0", mount_point="/")
+        self.backend.add_disk("disk2", 4096, internal=False)
+        self.backend.add_disk("disk3", 4096, internal=False)
+        self.backend.add_disk("disk4", 4096, internal=False, physical_store="disk0")
+        self.backend.add_disk("disk5", 4096)
+        self.patched = {}
+        self.patch("disk_backend", self.backend)
+        self.patch("mount_point", lambda path: "/")
+        self.patch("slack_data", {"slack_enabled": "False"})
+        self.patch("secure_erase_docs_dir", self.tmp_dir)
+
+    def tearDown(self):
+        for name, original in self.patched.items():
+            if original is None:
+                delattr(sei, name)
+            else:
+                setattr(sei, name, original)
+        shutil.rmtree(self.tmp_dir)
+
+    def patch(self, name, replacement):
+        self.patched[name] = getattr(sei, name, None)
+        setattr(sei, name, replacement)
+
+    def test_boot_disk_and_its_physical_store_are_protected(self):
+        self.assertEqual({"disk0", "disk1"}, sei.protected_disks(["/"], sei.DiskInventory()))
+
+    def test_only_external_whole_disks_are_accepted(self):
+        requested = ["disk2", "/dev/disk3", "disk2", "disk2s1", "disk1", "disk4", "disk5", "disk9"]
+
+        accepted, rejected = sei.fleet_disks(requested, {"disk0", "disk1"}, sei.DiskInventory())
+
+        self.assertEqual(["disk2", "disk3"], accepted)
+        self.assertEqual(["disk2s1", "disk1", "disk4", "disk5", "disk9"], list(rejected))
+        self.assertEqual("on disk0, which is protected", rejected["disk4"])
+        self.assertEqual("internal disk", rejected["disk5"])
+
+    @unittest.skipIf(os.geteuid() != 0, "fleet mode must be run as root")
+    def test_fleet_erases_each_disk_independently(self):
+        self.backend.fail("secure_erase", "disk3", count=3)
+
+        with self.assertRaises(SystemExit) as context:
+            sei.fleet_main(["disk0", "disk2", "disk3"], max_parallel=2)
+
+        self.assertEqual("SECURE ERASE FAILED on 1 of 2 disk(s)", str(context.exception))
+        reports = [name for name in os.listdir(self.tmp_dir) if name.startswith("secure_erase_report_fleet_")]
+        with open(os.path.join(self.tmp_dir, reports[0])) as f:
+            report = json.load(f)
+        self.assertEqual("fleet", report["mode"])
+        self.assertEqual([("disk2", True), ("disk3", False)], [(d["disk"], d["passed"]) for d in report["disks"]])
+        self.assertIsNone(report["disks"][1]["verification"])
+        self.assertEqual("", self.backend.disk("disk2").content)
+        self.assertEqual("GUID_partition_scheme", self.backend.disk("disk0").content)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
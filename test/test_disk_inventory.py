@@ -0,0 +1,129 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+import subprocess as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.secure_erase import secure_erase_internals as sei
+from blade_runner.secure_erase.disk_backend import SimulatedBackend
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestDiskInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.by_verify_disk = sei.VerifyErase.__dict__['by_verify_disk']
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = SimulatedBackend(self.tmp_dir)
+        self.backend.add_disk("disk0", 1000000)
+        self.backend.add_disk("disk1", 1000000, lvg_uuid="LVG-UUID")
+        self.backend.add_disk("disk2", 1000000, internal=False)
+        self.disk_backend = sei.disk_backend
+        sei.disk_backend = self.backend
+
+    def tearDown(self):
+        sei.disk_backend = self.disk_backend
+        sei.VerifyErase.by_verify_disk = self.by_verify_disk
+        shutil.rmtree(self.tmp_dir)
+
+    def test_each_output_is_read_once(self):
+        inventory = sei.DiskInventory()
+
+        internal_disks = sei.find_internal_disks(sei.list_main_disks(inventory), inventory)
+        for disk in internal_disks:
+            if sei.is_coreStorage(disk, inventory):
+                sei.get_lvgUUID(disk, inventory)
+        sei.find_internal_disks(sei.list_main_disks(inventory), inventory)
+
+        self.assertEqual(['disk0', 'disk1'], internal_disks)
+        self.assertEqual({'list': 1, 'info': 3, 'core_storage_info': 2}, self.backend.calls)
+
+    def test_core_storage(self):
+        inventory = sei.DiskInventory()
+
+        self.assertEqual('LVG-UUID', sei.get_lvgUUID('disk1', inventory))
+        self.assertTrue(sei.is_coreStorage('disk1', inventory))
+        self.assertFalse(sei.is_coreStorage('disk0', inventory))
+        self.assertFalse(sei.get_lvgUUID('disk0', inventory))
+
+    def test_core_storage_errors_are_raised(self):
+        with self.assertRaises(sp.CalledProcessError):
+            sei.is_coreStorage('disk9', sei.DiskInventory())
+
+    def test_independent_disks_skips_containers_on_listed_disks(self):
+        self.backend.add_disk("disk3", 1000000, physical_store="disk0")
+        self.backend.add_disk("disk4", 1000000, physical_store="disk2")
+
+        disks = sei.independent_disks(['disk0', 'disk1', 'disk3', 'disk4'], sei.DiskInventory())
+
+        self.assertEqual(['disk0', 'disk1', 'disk4'], disks)
+
+    def test_verify_disks_shares_outputs_and_runs_concurrently(self):
+        running = []
+
+        def verify_disk(disk):
+            running.append(disk)
+            time.sleep(0.1)
+            overlapped = len(running) == 2
+            return overlapped
+        sei.VerifyErase.by_verify_disk = staticmethod(verify_disk)
+        sei.secure_erase('disk0')
+
+        verifications = sei.VerifyErase.verify_disks(['disk0', 'disk1'], sei.DiskInventory())
+
+        self.assertEqual(['disk0', 'disk1'], [v.disk for v in verifications])
+        self.assertTrue(verifications[0].passed)
+        self.assertEqual(['by_type_name', 'by_all_disks', 'by_volumes_from_disks'], verifications[1].failed)
+        self.assertEqual(['by_verify_disk', 'by_type_name', 'by_all_disks', 'by_volumes_from_disks'],
+                         verifications[0].as_dict()['tests'].keys())
+        self.assertEqual(2, self.backend.calls['list'])
+        self.assertEqual(2, self.backend.calls['info'])
+
+    def test_verify_counts_tests_that_cannot_run_as_failed(self):
+        verification = sei.VerifyErase.verify('disk9', sei.DiskInventory())
+
+        self.assertFalse(verification.passed)
+        self.assertEqual(['by_verify_disk', 'by_type_name', 'by_all_disks', 'by_volumes_from_disks'],
+                         verification.failed)
+
+    def test_refresh_rereads_the_disks(self):
+        inventory = sei.DiskInventory()
+        self.assertEqual('GUID_partition_scheme', inventory.info('disk0')['Content'])
+        self.backend.secure_erase("disk0")
+
+        self.assertEqual('GUID_partition_scheme', inventory.info('disk0')['Content'])
+        inventory.refresh()
+        self.assertEqual('', inventory.info('disk0')['Content'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
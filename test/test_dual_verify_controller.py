@@ -62,6 +62,7 @@ class TestDualVerificationController(unittest.TestCase):
         self.jamf.get_asset_tag = lambda comp: self.jss_asset
         self.jamf.get_serial = lambda comp: self.jss_serial
         self.jamf.get_name = lambda comp: self.jss_name
+        self.jamf.prefetch = lambda jss_id, subsets: None
 
         self.dvc = None
         self.root = tk.Tk()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.secure_erase import erase_report
+from blade_runner.secure_erase.erase_report import EraseReport
+from blade_runner.secure_erase.secure_erase_internals import DiskVerification
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestEraseReport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.report = EraseReport(serial_number="C02TEST", hostname="lab-1")
+        record = self.report.add_disk("disk0", 500 * 1000000, "diskutil secureErase 0")
+        record.attempts, record.recovery, record.erased, record.duration = 2, ["force_unmount"], True, 10.0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def verification(self, disk, **results):
+        verification = DiskVerification(disk)
+        verification.results.update(results)
+        return verification
+
+    def test_record(self):
+        record = self.report.disk("disk0")
+
+        self.assertEqual(1, record.retries)
+        self.assertEqual(50.0, record.throughput)
+        self.assertFalse(record.passed)
+
+        record.verification = self.verification("disk0", by_type_name=True)
+
+        self.assertTrue(record.passed)
+
+    def test_report_passes_only_if_every_disk_passed(self):
+        self.assertFalse(EraseReport().passed)
+
+        self.report.add_verifications([self.verification("disk0", by_type_name=True),
+                                       self.verification("disk1", by_type_name=False)])
+
+        self.assertEqual(["disk0", "disk1"], [record.disk for record in self.report.disks])
+        self.assertFalse(self.report.passed)
+
+    def test_summary(self):
+        self.report.add_verifications([self.verification("disk0", by_type_name=True),
+                                       self.verification("disk1", by_type_name=False)])
+        self.report.disk("disk1").erased = True
+        self.report.add_disk("disk2").attempts = 3
+
+        self.assertEqual(["disk0: PASSED, erased in 10 s with 1 retries",
+                          "disk1: FAILED verification: by_type_name",
+                          "disk2: FAILED, not erased after 3 attempt(s)"], self.report.summary())
+
+    def test_write_and_load(self):
+        self.report.add_verifications([self.verification("disk0", by_type_name=True)])
+        self.report.finish()
+
+        path = self.report.write(self.tmp_dir)
+        report = erase_report.load(path)
+
+        self.assertTrue(os.path.basename(path).startswith("secure_erase_report_C02TEST_"))
+        self.assertEqual([os.path.basename(path)], os.listdir(self.tmp_dir))
+        self.assertEqual(json.loads(self.report.to_json()), report)
+        self.assertTrue(report["passed"])
+        disk = report["disks"][0]
+        self.assertEqual(("disk0", 500000000, "diskutil secureErase 0", 50.0, 1, ["force_unmount"]),
+                         (disk["disk"], disk["size"], disk["method"], disk["throughput_mb_s"], disk["retries"],
+                          disk["recovery"]))
+        self.assertEqual({"by_type_name": True}, disk["verification"]["tests"])
+
+    def test_render_pdf(self):
+        self.report.add_verifications([self.verification("disk0", by_type_name=True)])
+        self.report.finish()
+
+        pdf = erase_report.render_pdf(self.report.as_dict(), os.path.join(self.tmp_dir, "secure_erased.pdf"))
+
+        with open(pdf) as f:
+            content = f.read()
+        self.assertTrue(content.startswith("%PDF"))
+        self.assertIn("(SECURE ERASED) Tj", content)
+        self.assertIn("1 0 0 rg (READY FOR SURPLUS) Tj", content)
+        self.assertIn("(Throughput: ) Tj /F1 12 Tf 0 g (50.0 MB/s) Tj", content)
+
+    def test_render_html(self):
+        self.report.add_verifications([self.verification("disk0", by_type_name=True)])
+        self.report.add_disk("<disk1>")
+        self.report.finish()
+
+        html = erase_report.render_html(self.report.as_dict())
+
+        self.assertIn("NOT READY FOR SURPLUS", html)
+        self.assertIn("C02TEST", html)
+        self.assertIn("<td>0.5 GB</td>", html)
+        self.assertIn("<td>50.0 MB/s</td>", html)
+        self.assertIn("&lt;disk1&gt;", html)
+        self.assertIn("Not verified", html)
+
+        self.report.disks.pop()
+
+        self.assertIn("READY FOR SURPLUS", erase_report.render_html(self.report.as_dict()))
+        self.assertNotIn("NOT READY", erase_report.render_html(self.report.as_dict()))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import urllib2
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark_jss_server
+from fake_jamf_pro import FakeJamfPro
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.jamf_pro.jss_server import JssServer
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestFakeJamfPro(unittest.TestCase):
+    """Runs JssServer against the local Jamf Pro stand-in."""
+
+    def setUp(self):
+        self.jamf_pro = FakeJamfPro(records=3)
+        self.jamf_pro.start()
+        self.jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="pass", retry_base_delay="0.01")
+
+    def tearDown(self):
+        self.jamf._pool.close()
+        self.jamf_pro.stop()
+
+    def test_match(self):
+        self.assertEqual("2", self.jamf.match("BC100002"))
+        self.assertIsNone(self.jamf.match("nope"))
+        self.assertEqual(2, self.jamf_pro.request_count("GET", "match"))
+
+    def test_jss_doc_fetches_once(self):
+        computer = Computer()
+        computer.jss_id = "1"
+
+        html = JssDoc(self.jamf, computer)._build_html()
+
+        self.assertIn("C02FAKE00001", html)
+        self.assertEqual(1, self.jamf_pro.request_count())
+
+    def test_push_identity_fields_updates_record(self):
+        computer = Computer()
+        computer.jss_id = "3"
+        computer.barcode_1 = "new_barcode"
+
+        self.jamf.push_identity_fields(computer)
+
+        self.assertEqual("new_barcode", self.jamf_pro.computer(3)["general"]["barcode_1"])
+        self.assertEqual("new_barcode", self.jamf.get_barcode_1("3"))
+
+    def test_offboard_xml_clears_managed_status(self):
+        self.jamf.push_xml_str("<computer>\n  <general><remote_management><managed>false</managed>"
+                               "</remote_management></general>\n</computer>", "1")
+
+        self.assertEqual("false", self.jamf.get_managed_status("1"))
+
+    def test_delete_record(self):
+        self.jamf.delete_record("2")
+
+        self.assertIsNone(self.jamf_pro.computer(2))
+
+    def test_injected_errors_are_retried(self):
+        self.jamf_pro.inject_error(503, method="PUT", retry_after=0)
+        self.jamf_pro.inject_error(502, method="PUT")
+
+        self.jamf.push_xml_str("<computer><general><name>x</name></general></computer>", "1")
+
+        self.assertEqual(3, self.jamf_pro.request_count("PUT"))
+        self.assertEqual(2, self.jamf.retries)
+        self.assertEqual("x", self.jamf_pro.computer(1)["general"]["name"])
+
+    def test_dropped_connection_is_replayed(self):
+        self.jamf_pro.inject_error(None, route="subset")
+
+        self.assertEqual("lab-00001", self.jamf.get_name("1"))
+        self.assertEqual(2, self.jamf_pro.request_count("GET", "subset"))
+
+    def test_bad_credentials_are_rejected(self):
+        jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="wrong")
+
+        with self.assertRaises(urllib2.HTTPError) as context:
+            jamf.match("BC100001")
+        jamf._pool.close()
+        self.assertEqual(401, context.exception.code)
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_request_counts(self):
+        results = dict((r["name"], r) for r in benchmark_jss_server.run_benchmarks(records=3, runs=2, workers=2))
+
+        self.assertEqual(1, results["jss_doc"]["requests_per_run"])
+        self.assertEqual(1, results["dual_verify"]["requests_per_run"])
+        self.assertEqual(0, results["batch_offboard"]["failed"])
+        self.assertEqual(3, results["batch_offboard"]["runs"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
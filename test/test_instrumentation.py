@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import urllib2
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_jamf_pro import FakeJamfPro
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.jamf_pro.instrumentation import RequestEvent, RequestStats, url_template
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestRequestStats(unittest.TestCase):
+
+    def _event(self, method, template, duration, error=None, retries=0):
+        event = RequestEvent(method, "https://jss.test" + template, template)
+        event.duration = duration
+        event.error = error
+        event.retries = retries
+        event.bytes_received = 100
+        return event
+
+    def test_url_template(self):
+        self.assertEqual("/JSSResource/computers/id/{id}/subset/General&Hardware",
+                         url_template("https://jss.test:8443/JSSResource/computers/id/12/subset/General&Hardware",
+                                      "https://jss.test:8443"))
+        self.assertEqual("/JSSResource/computers/match/{term}",
+                         url_template("https://jss.test/JSSResource/computers/match/C02ABC", "https://jss.test"))
+
+    def test_endpoints_are_aggregated(self):
+        stats = RequestStats()
+        stats.post(self._event("GET", "/a", 0.1))
+        stats.post(self._event("GET", "/a", 0.3, retries=2))
+        stats.post(self._event("PUT", "/b", 1.0, error="HTTPError: 409"))
+
+        endpoints = stats.endpoints()
+
+        self.assertEqual(["PUT", "GET"], [endpoint["method"] for endpoint in endpoints])
+        self.assertEqual(2, endpoints[1]["requests"])
+        self.assertEqual(2, endpoints[1]["retries"])
+        self.assertEqual(1, endpoints[0]["errors"])
+        self.assertEqual({"requests": 3, "errors": 1, "retries": 2, "bytes_sent": 0, "bytes_received": 300},
+                         dict((k, v) for k, v in stats.totals().items() if k != "duration"))
+        self.assertIn("Jamf Pro requests: 3 (1 failed, 2 retries)", stats.summary())
+
+    def test_reset(self):
+        stats = RequestStats()
+        stats.post(self._event("GET", "/a", 0.1))
+
+        stats.reset()
+
+        self.assertEqual(0, stats.totals()["requests"])
+
+
+class TestJssServerHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.jamf_pro = FakeJamfPro(records=2)
+        self.jamf_pro.start()
+        self.jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="pass", retry_base_delay="0.01")
+        self.pre = []
+        self.post = []
+        self.jamf.add_request_hooks(pre=self.pre.append, post=self.post.append)
+
+    def tearDown(self):
+        self.jamf._pool.close()
+        self.jamf_pro.stop()
+
+    def test_hooks_receive_request_details(self):
+        self.jamf_pro.inject_error(503, route="subset")
+
+        self.jamf.get_name("1")
+
+        self.assertEqual(1, len(self.pre))
+        event = self.post[0]
+        self.assertIs(self.pre[0], event)
+        self.assertEqual("GET", event.method)
+        self.assertEqual("/JSSResource/computers/id/{id}/subset/General", event.url_template)
+        self.assertEqual(200, event.status)
+        self.assertEqual(1, event.retries)
+        self.assertGreater(event.bytes_received, 0)
+        self.assertGreater(event.duration, 0)
+        self.assertIsNone(event.error)
+
+    def test_failed_request_is_reported(self):
+        with self.assertRaises(urllib2.HTTPError):
+            self.jamf.push_xml_str("<computer/>", "99")
+
+        event = self.post[0]
+        self.assertEqual(404, event.status)
+        self.assertEqual(len("<computer/>"), event.bytes_sent)
+        self.assertIn("HTTPError", event.error)
+
+    def test_failing_hook_does_not_break_request(self):
+        def broken(event):
+            raise ValueError("broken hook")
+        self.jamf.add_request_hooks(pre=broken, post=broken)
+
+        self.assertEqual("1", self.jamf.match("BC100001"))
+        self.assertEqual(1, len(self.post))
+
+    def test_remove_hooks(self):
+        self.jamf.remove_request_hooks(pre=self.pre.append, post=self.post.append)
+
+        self.jamf.match("BC100001")
+
+        self.assertEqual([], self.post)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
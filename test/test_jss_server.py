@@ -0,0 +1,203 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+import os
+import sys
+import json
+import urllib2
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.jamf_pro.computer import Computer
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class FakeResponse(object):
+    """Stands in for the response returned by urllib2.urlopen."""
+
+    def __init__(self, body, code=200):
+        self.code = code
+        self._body = body
+
+    def read(self):
+        return self._body
+
+
+class JssServerTestCase(unittest.TestCase):
+    """Sets up a JssServer whose requests are answered by a fake request handler."""
+
+    def setUp(self):
+        self.jamf = JssServer(jss_url="https://jss.test:8443", username="user", password="pass")
+        self.requests = []
+
+        self.record = {
+            "general": {
+                "name": "test_name",
+                "serial_number": "test_serial",
+                "barcode_1": "test_bc1",
+                "barcode_2": "test_bc2",
+                "asset_tag": "test_asset",
+                "remote_management": {"managed": True}
+            },
+            "hardware": {
+                "model": "MacBook Pro",
+                "total_ram": 16384,
+                "storage": [{"drive_capacity_mb": 500000}]
+            }
+        }
+
+        self.jamf.open_request_handler = self._fake_open
+
+    def _fake_open(self, request):
+        self.requests.append((request.get_method(), request.get_full_url()))
+        if request.get_method() != "GET":
+            return FakeResponse("")
+        subsets = request.get_full_url().split("/subset/")[1].split("&")
+        computer = {}
+        for subset in subsets:
+            computer[subset.lower()] = self.record[subset.lower()]
+        return FakeResponse(json.dumps({"computer": computer}))
+
+    def _failing_write(self, request):
+        raise urllib2.URLError("connection reset")
+
+
+class TestJssServerSubsetCache(JssServerTestCase):
+    """Test the subset cache of JssServer."""
+
+    def test_general_getters_share_one_request(self):
+        self.assertEqual("test_name", self.jamf.get_name("1"))
+        self.assertEqual("test_serial", self.jamf.get_serial("1"))
+        self.assertEqual("test_bc1", self.jamf.get_barcode_1("1"))
+        self.assertEqual("test_bc2", self.jamf.get_barcode_2("1"))
+        self.assertEqual("test_asset", self.jamf.get_asset_tag("1"))
+        self.assertEqual("true", self.jamf.get_managed_status("1"))
+
+        self.assertEqual(1, len(self.requests))
+
+    def test_hardware_getters_share_one_request(self):
+        self.assertEqual("MacBook Pro", self.jamf.get_model("1"))
+        self.assertEqual("16384 MB", self.jamf.get_ram("1"))
+        self.assertEqual("500000 MB", self.jamf.get_drive_capacity("1"))
+
+        self.assertEqual(1, len(self.requests))
+
+    def test_cache_is_keyed_by_jss_id(self):
+        self.jamf.get_name("1")
+        self.jamf.get_name("2")
+
+        self.assertEqual(2, len(self.requests))
+
+    def test_push_invalidates_cache(self):
+        self.jamf.get_managed_status("1")
+        self.record["general"]["remote_management"]["managed"] = False
+        self.jamf.push_xml_str("<computer>\n  <general/>\n</computer>", "1")
+
+        self.assertEqual("false", self.jamf.get_managed_status("1"))
+        self.assertEqual(3, len(self.requests))
+
+    def test_push_identity_fields_invalidates_cache(self):
+        comp = Computer()
+        comp.jss_id = "1"
+        comp.barcode_1 = "new_bc1"
+
+        self.jamf.get_barcode_1("1")
+        self.record["general"]["barcode_1"] = "new_bc1"
+        self.jamf.push_identity_fields(comp)
+
+        self.assertEqual("new_bc1", self.jamf.get_barcode_1("1"))
+
+    def test_delete_invalidates_cache(self):
+        self.jamf.get_name("1")
+        self.jamf.delete_record("1")
+        self.jamf.get_name("1")
+
+        self.assertEqual(3, len(self.requests))
+
+    def test_failed_push_invalidates_cache(self):
+        self.jamf.get_name("1")
+        self.jamf.open_request_handler = self._failing_write
+        self.assertRaises(urllib2.URLError, self.jamf.push_xml_str, "<computer/>", "1")
+        self.jamf.open_request_handler = self._fake_open
+        self.jamf.get_name("1")
+
+        self.assertEqual(2, len(self.requests))
+
+    def test_failed_delete_invalidates_cache(self):
+        self.jamf.get_name("1")
+        self.jamf.open_request_handler = self._failing_write
+        self.assertRaises(urllib2.URLError, self.jamf.delete_record, "1")
+        self.jamf.open_request_handler = self._fake_open
+        self.jamf.get_name("1")
+
+        self.assertEqual(2, len(self.requests))
+
+    def test_expired_entries_are_refetched(self):
+        self.jamf._cache_ttl = 0
+        self.jamf.get_name("1")
+        self.jamf.get_name("1")
+
+        self.assertEqual(2, len(self.requests))
+
+    def test_clear_cache(self):
+        self.jamf.get_name("1")
+        self.jamf.clear_cache()
+        self.jamf.get_name("1")
+
+        self.assertEqual(2, len(self.requests))
+
+
+class TestJssServerGetComputer(JssServerTestCase):
+    """Test fetching several subsets of a record in one request."""
+
+    def test_prefetch_serves_typed_getters(self):
+        self.jamf.prefetch("1", ["General", "Hardware"])
+
+        self.assertEqual("test_name", self.jamf.get_name("1"))
+        self.assertEqual("MacBook Pro", self.jamf.get_model("1"))
+        self.assertEqual("500000 MB", self.jamf.get_drive_capacity("1"))
+
+        self.assertEqual(1, len(self.requests))
+        self.assertTrue(self.requests[0][1].endswith("/computers/id/1/subset/General&Hardware"))
+
+    def test_get_computer_requests_only_missing_subsets(self):
+        self.jamf.get_name("1")
+        computer = self.jamf.get_computer("1", ["General", "Hardware"])
+
+        self.assertEqual("test_name", computer["general"]["name"])
+        self.assertEqual("MacBook Pro", computer["hardware"]["model"])
+        self.assertEqual(2, len(self.requests))
+        self.assertTrue(self.requests[1][1].endswith("/subset/Hardware"))
+
+    def test_get_computer_all_cached(self):
+        self.jamf.prefetch("1", ["General", "Hardware"])
+        self.jamf.prefetch("1", ["Hardware", "General"])
+
+        self.assertEqual(1, len(self.requests))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
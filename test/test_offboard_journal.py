@@ -0,0 +1,129 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.journal import offboard_journal
+from blade_runner.journal.offboard_journal import OffboardJournal
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class FakeJssServer(object):
+    """Records the pushes made while resuming."""
+
+    def __init__(self):
+        self.pushed = []
+        self.managed = 'true'
+
+    def push_xml_str(self, xml_str, jss_id):
+        self.pushed.append((xml_str, jss_id))
+        self.managed = 'false'
+
+    def prefetch(self, jss_id, subsets):
+        pass
+
+    def get_managed_status(self, jss_id):
+        return self.managed
+
+
+class TestOffboardJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+        self.computer = Computer()
+        self.computer.jss_id = "7"
+        self.computer.serial_number = "SERIAL7"
+        self.computer.barcode_1 = "b\xc3\xa4r"
+        self.computer.incorrect_asset = "old_asset"
+        self.plan = [("identity", {"xml": "<computer><general/></computer>"}),
+                     ("offboard", {"xml": "<computer><managed>false</managed></computer>"}),
+                     ("managed_check", {})]
+
+    def tearDown(self):
+        shutil.rmtree(self.journal_dir)
+
+    def _fail(self):
+        raise IOError("network is down")
+
+    def test_interrupted_offboard_is_left_pending(self):
+        journal = OffboardJournal.create(self.journal_dir, self.computer, self.plan)
+        journal.run("identity", lambda: None)
+        with self.assertRaises(IOError):
+            journal.run("offboard", self._fail)
+
+        unfinished = OffboardJournal.unfinished(self.journal_dir)
+
+        self.assertEqual(1, len(unfinished))
+        self.assertEqual("7", unfinished[0].jss_id)
+        self.assertEqual(["offboard", "managed_check"], [step for step, payload in unfinished[0].pending()])
+
+    def test_computer_is_restored(self):
+        OffboardJournal.create(self.journal_dir, self.computer, self.plan)
+
+        computer = OffboardJournal.unfinished(self.journal_dir)[0].computer()
+
+        self.assertEqual("b\xc3\xa4r", computer.barcode_1)
+        self.assertIsInstance(computer.barcode_1, str)
+        self.assertEqual("old_asset", computer.incorrect_asset)
+        self.assertIsNone(computer.barcode_2)
+
+    def test_partly_written_entry_is_ignored(self):
+        journal = OffboardJournal.create(self.journal_dir, self.computer, self.plan)
+        journal.run("identity", lambda: None)
+        with open(journal.path, "a") as f:
+            f.write('{"event": "do')
+
+        journal = OffboardJournal(journal.path)
+
+        self.assertEqual(set(["identity"]), journal.done())
+
+    def test_resume_replays_pending_steps(self):
+        journal = OffboardJournal.create(self.journal_dir, self.computer, self.plan)
+        journal.run("identity", lambda: None)
+        jamf = FakeJssServer()
+
+        offboard_journal.resume(journal, jamf, {})
+
+        self.assertEqual([("<computer><managed>false</managed></computer>", "7")], jamf.pushed)
+        self.assertEqual([], OffboardJournal.unfinished(self.journal_dir))
+
+    def test_failed_resume_keeps_journal(self):
+        journal = OffboardJournal.create(self.journal_dir, self.computer, [("managed_check", {})])
+
+        with self.assertRaises(SystemError):
+            offboard_journal.resume(journal, FakeJssServer(), {})
+
+        self.assertEqual(1, len(OffboardJournal.unfinished(self.journal_dir)))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import re
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_jamf_pro import FakeJamfPro
+from blade_runner.document import document
+from blade_runner.document.pdf import PdfDocument, pdf_string, html_font_points
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.jamf_pro.computer import Computer
+from blade_runner.jamf_pro.jss_server import JssServer
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestPdfDocument(unittest.TestCase):
+
+    def assertValidPdf(self, pdf):
+        self.assertTrue(pdf.startswith("%PDF-1.4\n"))
+        self.assertTrue(pdf.endswith("%%EOF\n"))
+        # Every object must be at the offset the cross-reference table gives for it.
+        startxref = int(re.search(r"startxref\n(\d+)\n", pdf).group(1))
+        self.assertTrue(pdf[startxref:].startswith("xref\n"))
+        offsets = re.findall(r"(\d{10}) 00000 n ", pdf)
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(pdf[int(offset):].startswith("{0} 0 obj\n".format(number)))
+
+    def test_line(self):
+        document = PdfDocument()
+        document.add_line([("Name: ", True, None), ("lab (1)", False, "red")], size=18)
+
+        pdf = document.to_string()
+
+        self.assertValidPdf(pdf)
+        self.assertIn("BT 54 720 Td /F2 18 Tf 0 g (Name: ) Tj /F1 18 Tf 1 0 0 rg (lab \\(1\\)) Tj ET", pdf)
+        self.assertIn("/BaseFont /Helvetica-Bold", pdf)
+
+    def test_lines_flow_onto_new_pages(self):
+        document = PdfDocument()
+        for i in range(100):
+            document.add_line([("Line {0}".format(i), False, None)], size=12)
+
+        pdf = document.to_string()
+
+        self.assertValidPdf(pdf)
+        self.assertEqual(3, document.page_count)
+        self.assertIn("/Count 3", pdf)
+
+    def test_new_page_and_extend(self):
+        labels = PdfDocument()
+        labels.new_page()
+        labels.add_line([("label 1", False, None)])
+        labels.new_page()
+        labels.add_line([("label 2", False, None)])
+        index = PdfDocument()
+        index.add_line([("index", True, None)])
+
+        index.extend(labels)
+
+        self.assertEqual((2, 3), (labels.page_count, index.page_count))
+        self.assertValidPdf(index.to_string())
+
+    def test_text_encoding(self):
+        self.assertEqual("(caf\xe9 \\\\ ?)", pdf_string(u"caf\xe9 \\ \u2603"))
+        self.assertEqual("(caf\xe9)", pdf_string("caf\xc3\xa9"))
+        self.assertEqual("(None)", pdf_string(None))
+
+    def test_html_font_points(self):
+        self.assertEqual((18, 36, 7.5), (html_font_points(5), html_font_points(10), html_font_points(0)))
+
+    def test_item_runs(self):
+        self.assertEqual([("SSD: ", True, None), ("Yes", False, None), ("    ", False, None),
+                          ("RAM: ", True, None), ("16", False, None)], document.item_runs(("SSD", "Yes", "RAM", 16)))
+
+    def test_non_ascii_items(self):
+        runs = document.item_runs((u"Name", u"Jos\xe9's Mac", "Asset", "caf\xc3\xa9"))
+
+        self.assertEqual([(u"Name: ", True, None), (u"Jos\xe9's Mac", False, None), ("    ", False, None),
+                          ("Asset: ", True, None), ("caf\xc3\xa9", False, None)], runs)
+        self.assertEqual(["(Jos\xe9's Mac)", "(caf\xe9)"], [pdf_string(runs[1][0]), pdf_string(runs[4][0])])
+
+        pdf = PdfDocument()
+        document.write_items(pdf, [(u"Name", u"Jos\xe9's Mac")])
+        self.assertIn("(Jos\xe9's Mac)", pdf.to_string())
+
+
+class TestJssDocPdf(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.jamf_pro = FakeJamfPro(records=1)
+        self.jamf_pro.start()
+        self.jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="pass")
+        computer = Computer()
+        computer.jss_id = "1"
+        computer.incorrect_asset = "old_asset"
+        self.doc = JssDoc(self.jamf, computer)
+        self.doc.jamf_pro_docs = self.tmp_dir
+        self.doc.html_doc = os.path.join(self.tmp_dir, "doc.html")
+        self.doc.pdf_doc = os.path.join(self.tmp_dir, "doc.pdf")
+        self.converted = []
+        self.html_to_pdf = document.html_to_pdf
+        document.html_to_pdf = self.converted.append
+
+    def tearDown(self):
+        document.html_to_pdf = self.html_to_pdf
+        self.jamf._pool.close()
+        self.jamf_pro.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_native_pdf_is_written_without_html(self):
+        pdf = self.doc.create_pdf()
+
+        with open(pdf) as f:
+            content = f.read()
+        self.assertEqual(["doc.pdf"], os.listdir(self.tmp_dir))
+        self.assertEqual([], self.converted)
+        self.assertIn("(C02FAKE00001) Tj", content)
+        self.assertIn("(Jamf ID: ) Tj /F1 18 Tf 0 g (1) Tj", content)
+        self.assertIn("(Previous asset tag: ) Tj /F1 18 Tf 1 0 0 rg (old_asset) Tj", content)
+
+    def test_cupsfilter_renderer(self):
+        self.doc.create_pdf("cupsfilter")
+
+        self.assertEqual([self.doc.html_doc], self.converted)
+        with open(self.doc.html_doc) as f:
+            self.assertIn('<b>Previous asset tag: </b> <font color="red">old_asset</font>', f.read())
+
+    def test_native_failure_falls_back_to_cupsfilter(self):
+        self.doc.pdf_doc = os.path.join(self.tmp_dir, "missing", "doc.pdf")
+
+        self.doc.create_pdf()
+
+        self.assertEqual([self.doc.html_doc], self.converted)
+
+
+
+class TestJssDocBatchPdf(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.jamf_pro = FakeJamfPro(records=3)
+        self.jamf_pro.start()
+        self.jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="pass")
+        self.pdf = os.path.join(self.tmp_dir, "labels.pdf")
+
+    def tearDown(self):
+        self.jamf._pool.close()
+        self.jamf_pro.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_labels_follow_the_index(self):
+        computer = Computer()
+        computer.jss_id = "2"
+        computer.incorrect_asset = "old_asset"
+
+        entries = JssDoc.create_batch_pdf(self.jamf, ["1", computer, "99", "3"], self.pdf, workers=3)
+
+        self.assertEqual(["1", "2", "99", "3"], [entry["jss_id"] for entry in entries])
+        self.assertEqual([2, 3, None, 4], [entry["page"] for entry in entries])
+        self.assertIn("HTTPError", entries[2]["error"])
+        self.assertEqual(["labels.pdf"], os.listdir(self.tmp_dir))
+        with open(self.pdf) as f:
+            content = f.read()
+        self.assertIn("/Count 4", content)
+        self.assertIn("(Page 3  ) Tj", content)
+        self.assertIn("(C02FAKE00003) Tj", content)
+        self.assertIn("(old_asset) Tj", content)
+
+    def test_cached_records_are_not_fetched_again(self):
+        for jss_id in ["1", "2", "3"]:
+            self.jamf.prefetch(jss_id, JssDoc.subsets)
+        self.jamf_pro.reset_counts()
+
+        JssDoc.create_batch_pdf(self.jamf, ["1", "2", "3"], self.pdf)
+
+        self.assertEqual(0, self.jamf_pro.request_count())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
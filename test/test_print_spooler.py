@@ -0,0 +1,179 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.document import document as doc
+from blade_runner.document.print_spooler import PrintSpooler
+from blade_runner.utils.command_runner import CommandRunner
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Records its arguments and answers like lp. Fails if the "reject" file exists.
+fake_lp = """#!/bin/sh
+dir=$(dirname "$0")
+[ -f "$dir/reject" ] && { echo "lp: No default destination." >&2; exit 1; }
+echo "$@" >> "$dir/lp.log"
+n=$(wc -l < "$dir/lp.log" | tr -d ' ')
+echo "Front_Desk-$n" >> "$dir/active"
+echo "request id is Front_Desk-$n (1 file(s))"
+"""
+
+# Lists the jobs in the "active" file like lpstat -o.
+fake_lpstat = """#!/bin/sh
+dir=$(dirname "$0")
+[ -f "$dir/active" ] && sed 's/$/ user 1024 Mon Oct 1 10:00:00 2018/' "$dir/active"
+exit 0
+"""
+
+
+class TestPrintSpooler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bin_dir = os.path.join(self.tmp_dir, "bin")
+        os.mkdir(self.bin_dir)
+        for name, script in [("lp", fake_lp), ("lpstat", fake_lpstat)]:
+            path = os.path.join(self.bin_dir, name)
+            with open(path, "w") as f:
+                f.write(script)
+            os.chmod(path, 0o755)
+
+        self.spooler = PrintSpooler(os.path.join(self.tmp_dir, "queue"), batch_size=2, retry_delay=0,
+                                    runner=CommandRunner(timeout=5))
+        self.spooler.lp = os.path.join(self.bin_dir, "lp")
+        self.spooler.lpstat = os.path.join(self.bin_dir, "lpstat")
+
+    def tearDown(self):
+        self.spooler.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def pdf(self, name):
+        path = os.path.join(self.tmp_dir, name + ".pdf")
+        with open(path, "w") as f:
+            f.write("%PDF-1.4 " + name)
+        return path
+
+    def lp_calls(self):
+        with open(os.path.join(self.bin_dir, "lp.log")) as f:
+            return f.read().splitlines()
+
+    def test_queued_documents_are_sent_in_batches(self):
+        jobs = [self.spooler.submit(self.pdf("doc{}".format(i))) for i in range(3)]
+
+        self.assertEqual(3, self.spooler.process())
+
+        calls = self.lp_calls()
+        self.assertEqual(2, len(calls))
+        self.assertIn("-t Blade Runner (2 documents) -- ", calls[0])
+        self.assertIn("-t doc2.pdf -- ", calls[1])
+        states = [self.spooler.job(job["id"]) for job in jobs]
+        self.assertEqual(["submitted"] * 3, [job["state"] for job in states])
+        self.assertEqual(["Front_Desk-1", "Front_Desk-1", "Front_Desk-2"], [job["cups_job"] for job in states])
+        # The queued copies are renamed, and the submitted PDFs are left alone.
+        self.assertTrue(os.path.exists(os.path.join(self.spooler.queue_dir, jobs[0]["id"] + "_printed.pdf")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, "doc0.pdf")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "doc0_printed.pdf")))
+        self.assertEqual(0, self.spooler.process())
+
+    def test_finished_jobs_are_marked_printed(self):
+        job = self.spooler.submit(self.pdf("doc"))
+        self.spooler.process()
+        self.assertEqual(0, self.spooler.refresh())
+
+        os.remove(os.path.join(self.bin_dir, "active"))
+
+        self.assertEqual(1, self.spooler.refresh())
+        self.assertEqual("printed", self.spooler.job(job["id"])["state"])
+        self.assertEqual([".lock", job["id"] + ".json"], sorted(os.listdir(self.spooler.queue_dir)))
+
+    def test_rejected_jobs_are_retried_then_fail(self):
+        open(os.path.join(self.bin_dir, "reject"), "w").close()
+        job = self.spooler.submit(self.pdf("doc"))
+
+        for i in range(3):
+            self.assertEqual(0, self.spooler.process())
+
+        job = self.spooler.job(job["id"])
+        self.assertEqual(("failed", 3), (job["state"], job["attempts"]))
+        self.assertIn("No default destination", job["error"])
+
+        os.remove(os.path.join(self.bin_dir, "reject"))
+        self.assertEqual(1, self.spooler.requeue_failed())
+        self.assertEqual(1, self.spooler.process())
+
+    def test_pass_is_skipped_while_another_spooler_holds_the_queue(self):
+        self.spooler.submit(self.pdf("doc"))
+
+        with self.spooler._locked() as locked:
+            self.assertTrue(locked)
+            self.assertEqual(0, self.spooler.process())
+
+        self.assertEqual(1, self.spooler.process())
+
+    def test_background_spooler_drains_on_stop(self):
+        self.spooler.start(interval=60)
+        threads = [threading.Thread(target=self.spooler.submit, args=(self.pdf("doc{}".format(i)),))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.spooler.stop()
+
+        self.assertEqual({"queued": 0, "submitted": 6, "printed": 0, "failed": 0}, self.spooler.status())
+        self.assertEqual(6, sum(len(call.split(" -- ")[1].split()) for call in self.lp_calls()))
+
+    def test_stop_does_not_spin_while_another_spooler_holds_the_queue(self):
+        self.spooler.start(interval=60)
+        with self.spooler._locked() as locked:
+            self.assertTrue(locked)
+            self.spooler.submit(self.pdf("doc"))
+            start = time.time()
+
+            self.spooler.stop()
+
+            self.assertLess(time.time() - start, 5)
+        self.assertEqual(1, self.spooler.status()["queued"])
+
+    def test_print_pdf_to_default(self):
+        job = doc.print_pdf_to_default(self.pdf("doc"), self.spooler)
+
+        self.assertEqual("submitted", job["state"])
+        with open(os.path.join(self.spooler.queue_dir, job["id"] + ".json")) as f:
+            self.assertEqual(job, json.load(f))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
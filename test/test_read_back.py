@@ -0,0 +1,115 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.secure_erase.read_back import ReadBackVerifier, ReadBackResult
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestReadBack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "disk.img")
+        self.verifier = ReadBackVerifier(samples=8, block_size=4096, edge_bytes=4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_disk(self, size, data=None, offset=0):
+        with open(self.path, "wb") as f:
+            f.truncate(size)
+            if data:
+                f.seek(offset)
+                f.write(data)
+
+    def test_zero_disk(self):
+        self.make_disk(64 * 4096)
+
+        result = self.verifier.check(self.path)
+
+        self.assertTrue(result.zero)
+        self.assertEqual(62, result.blocks)
+        self.assertEqual(8, result.sampled)
+        self.assertEqual(10 * 4096, result.bytes_read)
+        self.assertGreater(result.confidence, 0)
+        self.assertLess(result.confidence, 1)
+
+    def test_edges_are_always_read(self):
+        for offset in [0, 64 * 4096 - 4]:
+            self.make_disk(64 * 4096, "data", offset)
+
+            result = ReadBackVerifier(samples=0, block_size=4096, edge_bytes=4096).check(self.path)
+
+            self.assertFalse(result.zero)
+            self.assertEqual(offset // 4096 * 4096, result.nonzero_offset)
+            self.assertEqual(0, result.confidence)
+
+    def test_data_found_when_every_block_is_sampled(self):
+        self.make_disk(64 * 4096 + 100, "data", 30 * 4096 + 7)
+
+        result = ReadBackVerifier(samples=100, block_size=4096, edge_bytes=4096).check(self.path)
+
+        self.assertFalse(result.zero)
+        self.assertEqual(30 * 4096, result.nonzero_offset)
+
+    def test_every_block_read_is_full_confidence(self):
+        self.make_disk(16 * 4096 + 100)
+
+        result = ReadBackVerifier(samples=100, block_size=4096, edge_bytes=4096).check(self.path)
+
+        self.assertTrue(result.zero)
+        self.assertEqual(16 * 4096 + 100, result.bytes_read)
+        self.assertEqual(1.0, result.confidence)
+
+    def test_unknown_size_is_an_error(self):
+        self.make_disk(0)
+
+        # Reading back nothing must not pass as an erased disk.
+        self.assertRaises(IOError, self.verifier.check, self.path)
+        self.assertRaises(IOError, self.verifier.check, os.devnull)
+
+    def test_confidence(self):
+        result = ReadBackResult("disk", 0, 1000000, 0.01)
+        result.sampled = 256
+
+        # Sampling without replacement from a large disk is close to sampling with replacement.
+        self.assertAlmostEqual(1 - 0.99 ** 256, result.confidence, places=3)
+
+        result = ReadBackResult("disk", 0, 10, 0.1)
+        result.sampled = 5
+
+        self.assertAlmostEqual(0.5, result.confidence)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
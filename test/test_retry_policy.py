@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import logging
+import urllib2
+import unittest
+from mimetools import Message
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.jamf_pro.jss_server import JssServer
+from blade_runner.jamf_pro.retry_policy import RetryPolicy
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def http_error(code, headers=""):
+    return urllib2.HTTPError("https://jss.test", code, "error", Message(StringIO(headers)), StringIO(""))
+
+
+class FakeOpener(object):
+    """Raises the queued errors, then answers every request with a 200."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.requests = []
+
+    def open(self, request):
+        self.requests.append((request.get_method(), request.get_data()))
+        if self.errors:
+            raise self.errors.pop(0)
+        return urllib2.addinfourl(StringIO('{"computer": {"id": 1}}'), Message(StringIO("")), "https://jss.test",
+                                  200)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(attempts=3, base_delay=1, max_delay=4, jitter=0)
+
+    def test_transient_errors_are_retried(self):
+        self.assertTrue(self.policy.should_retry("GET", urllib2.URLError("timed out"), 1))
+        self.assertTrue(self.policy.should_retry("PUT", http_error(503), 1))
+        self.assertTrue(self.policy.should_retry("DELETE", http_error(429), 2))
+
+    def test_client_errors_are_not_retried(self):
+        self.assertFalse(self.policy.should_retry("PUT", http_error(409), 1))
+        self.assertFalse(self.policy.should_retry("GET", http_error(404), 1))
+
+    def test_non_idempotent_methods_are_not_retried(self):
+        self.assertFalse(self.policy.should_retry("POST", http_error(503), 1))
+
+    def test_attempts_are_limited(self):
+        self.assertFalse(self.policy.should_retry("GET", http_error(503), 3))
+
+    def test_backoff_doubles_up_to_max_delay(self):
+        error = urllib2.URLError("timed out")
+
+        self.assertEqual([1, 2, 4, 4], [self.policy.delay(attempt, error) for attempt in range(1, 5)])
+
+    def test_backoff_is_jittered(self):
+        policy = RetryPolicy(base_delay=2, jitter=0.5)
+
+        delays = [policy.delay(1, urllib2.URLError("timed out")) for i in range(20)]
+
+        self.assertTrue(all(1 <= delay <= 2 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_retry_after_header_is_used(self):
+        self.assertEqual(3, self.policy.delay(1, http_error(503, "Retry-After: 3\n\n")))
+
+
+class TestJssServerRetries(unittest.TestCase):
+
+    def setUp(self):
+        self.jamf = JssServer(jss_url="https://jss.test", username="user", password="pass")
+        self.delays = []
+        self.jamf._retry_policy.sleep = self.delays.append
+
+    def test_offboard_put_is_replayed(self):
+        self.jamf._opener = FakeOpener([urllib2.URLError("connection reset"), http_error(502)])
+
+        self.jamf.push_xml_str("<computer/>", "1")
+
+        self.assertEqual([("PUT", "<computer/>")] * 3, self.jamf._opener.requests)
+        self.assertEqual(2, self.jamf.retries)
+        self.assertEqual(2, len(self.delays))
+
+    def test_gives_up_after_max_attempts(self):
+        self.jamf._opener = FakeOpener([http_error(503)] * 5)
+
+        with self.assertRaises(urllib2.HTTPError):
+            self.jamf.get_computer("1", ["General"])
+        self.assertEqual(3, len(self.jamf._opener.requests))
+
+    def test_replayed_delete_of_deleted_record_succeeds(self):
+        self.jamf._opener = FakeOpener([urllib2.URLError("timed out"), http_error(404)])
+
+        self.jamf.delete_record("1")
+
+        self.assertEqual(2, len(self.jamf._opener.requests))
+
+    def test_retry_attempts_are_configurable(self):
+        jamf = JssServer(jss_url="https://jss.test", username="user", password="pass", retry_attempts="1")
+        jamf._opener = FakeOpener([urllib2.URLError("timed out")])
+
+        with self.assertRaises(urllib2.URLError):
+            jamf.push_xml_str("<computer/>", "1")
+        self.assertEqual(0, jamf.retries)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
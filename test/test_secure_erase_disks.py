@@ -0,0 +1,188 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+import threading
+import subprocess as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.secure_erase import secure_erase_internals as sei
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Prints progress like "diskutil secureErase 0" does, without ending the progress line until the erase is done.
+fake_diskutil = '''#!/bin/sh
+if [ "$3" = "disk_bad" ]; then echo "Error: could not unmount"; exit 1; fi
+echo "Started erase on $3"
+printf "[ / 0%%..10%%..2"
+sleep 0.05
+printf "0%%..50%%..100%% ] \\n"
+echo "Finished erase on $3"
+'''
+
+
+class FakeInventory(object):
+
+    def info(self, disk):
+        return {'TotalSize': 1000000000}
+
+
+class TestEraseProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.environ['PATH']
+        diskutil = os.path.join(self.tmp_dir, "diskutil")
+        with open(diskutil, "w") as f:
+            f.write(fake_diskutil)
+        os.chmod(diskutil, 0755)
+        os.environ['PATH'] = self.tmp_dir + os.pathsep + self.path
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.tmp_dir)
+
+    def test_throughput_and_eta(self):
+        progress = sei.EraseProgress("disk0", size=1000000000, clock=lambda: self.now)
+        self.now = 110.0
+
+        self.assertTrue(progress.feed("[ / 0%..10%..2"))
+        self.assertFalse(progress.feed("0"))
+        self.assertTrue(progress.feed("%.."))
+
+        self.assertEqual(20.0, progress.percent)
+        self.assertEqual(20.0, progress.throughput)
+        self.assertEqual(40.0, progress.eta)
+        self.assertEqual("disk0: 20% erased, 20.0 MB/s, 0:00:40 left", str(progress))
+
+    def test_unknown_size(self):
+        progress = sei.EraseProgress("disk0", clock=lambda: self.now)
+
+        self.assertEqual("disk0: 0% erased", str(progress))
+
+    def test_run_secure_erase_streams_progress(self):
+        seen = []
+
+        output = sei.run_secure_erase("disk2", lambda progress: seen.append(progress.percent), 1000000000)
+
+        self.assertEqual([10.0, 100.0], seen)
+        self.assertIn("Finished erase on disk2", output)
+
+    def test_run_secure_erase_raises_on_failure(self):
+        with self.assertRaises(sp.CalledProcessError) as context:
+            sei.run_secure_erase("disk_bad")
+
+        self.assertIn("could not unmount", context.exception.output)
+
+    def test_failing_callback_does_not_stop_the_erase(self):
+        def fail(progress):
+            raise ValueError("boom")
+
+        self.assertIn("Finished", sei.run_secure_erase("disk2", sei.progress_to(fail)))
+
+    def test_slack_progress_sends_milestones(self):
+        class Bot(object):
+            messages = []
+
+            def send_message(self, msg):
+                self.messages.append(msg)
+        bot = Bot()
+        slack = sei.SlackProgress(bot, step=25)
+        progress = sei.EraseProgress("disk0", clock=lambda: self.now)
+
+        for chunk in ["10%", "20%", "30%", "40%", "60%", "100%"]:
+            progress.feed(chunk)
+            slack(progress)
+
+        self.assertEqual(["disk0: 30% erased", "disk0: 60% erased", "disk0: 100% erased"],
+                         [msg.split(",")[0] for msg in bot.messages])
+
+
+class TestSecureEraseDisks(unittest.TestCase):
+
+    def setUp(self):
+        self.patched = {}
+        self.active = 0
+        self.most_active = 0
+        self.lock = threading.Lock()
+        self.patch('diskutil_list', lambda: "")
+        self.patch('interactive', lambda question, default=None: True)
+        self.patch('secure_erase_with_recovery', self.fake_erase)
+
+    def tearDown(self):
+        for name, original in self.patched.items():
+            setattr(sei, name, original)
+
+    def patch(self, name, replacement):
+        self.patched.setdefault(name, getattr(sei, name))
+        setattr(sei, name, replacement)
+
+    def fake_erase(self, disk, progress=None, size=None, record=None):
+        with self.lock:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(0.1)
+        with self.lock:
+            self.active -= 1
+        return disk != "disk_bad"
+
+    def test_disks_are_erased_at_the_same_time(self):
+        start = time.time()
+
+        erased = sei.secure_erase_disks(["disk0", "disk1", "disk2"], inventory=FakeInventory())
+
+        self.assertTrue(erased)
+        self.assertEqual(3, self.most_active)
+        self.assertLess(time.time() - start, 0.25)
+
+    def test_max_parallel(self):
+        sei.secure_erase_disks(["disk0", "disk1", "disk2"], max_parallel=1, inventory=FakeInventory())
+
+        self.assertEqual(1, self.most_active)
+
+    def test_one_failure_fails_the_erase(self):
+        self.assertFalse(sei.secure_erase_disks(["disk0", "disk_bad"], inventory=FakeInventory()))
+
+    def test_no_disks_is_not_an_erase(self):
+        self.patch('interactive', lambda question, default=None: self.fail("Prompted with nothing to erase."))
+
+        self.assertFalse(sei.secure_erase_disks([], inventory=FakeInventory()))
+        self.assertFalse(sei.secure_erase_disks([" "], inventory=FakeInventory()))
+
+    def test_abort(self):
+        self.patch('interactive', lambda question, default=None: False)
+
+        self.assertFalse(sei.secure_erase_disks(["disk0"]))
+        self.assertEqual(0, self.most_active)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
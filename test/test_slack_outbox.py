@@ -0,0 +1,176 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import urllib2
+import tempfile
+import unittest
+import threading
+import BaseHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.slack.slack_outbox import SlackOutbox, send_webhook
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+url = "https://hooks.slack.com/services/T000/B000/XXXX"
+
+
+class FakeSlack(object):
+    """Records the messages it's sent. Raises the queued errors first."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.errors = []
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, channel, bot_name, text):
+        time.sleep(self.delay)
+        with self.lock:
+            if self.errors:
+                raise self.errors.pop(0)
+            self.sent.append((channel, bot_name, text))
+
+
+class WebhookHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.server.payloads.append(json.loads(self.rfile.read(int(self.headers.getheader('Content-Length')))))
+        self.send_response(200)
+        self.send_header('Content-Length', "2")
+        self.end_headers()
+        self.wfile.write("ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSlackOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "outbox", "slack_outbox.jsonl")
+        self.slack = FakeSlack()
+        self.outbox = SlackOutbox(self.path, coalesce_window=0.2, retry_delay=0.05, sender=self.slack)
+
+    def tearDown(self):
+        self.outbox.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_post_does_not_wait_for_slack(self):
+        self.slack.delay = 1
+
+        start = time.time()
+        self.outbox.post(url, "#offboarding", "10.0.0.1", "Offboarded lab-1")
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(1, len(self.outbox.pending()))
+
+    def test_burst_is_sent_as_one_message(self):
+        for i in range(3):
+            self.outbox.post(url, "#offboarding", "10.0.0.1", "Offboarded lab-{}".format(i))
+        self.outbox.post(url, "#erase", "10.0.0.1", "Erased disk0")
+
+        self.wait_for(lambda: len(self.slack.sent) == 2)
+
+        self.assertEqual([("#offboarding", "10.0.0.1", "Offboarded lab-0\nOffboarded lab-1\nOffboarded lab-2"),
+                          ("#erase", "10.0.0.1", "Erased disk0")], self.slack.sent)
+        self.wait_for(lambda: os.path.getsize(self.path) == 0)
+
+    def test_non_ascii_text_is_sent(self):
+        self.assertIsNotNone(self.outbox.post(url, "#offboarding", "10.0.0.1", u"Jos\xe9 offboarded"))
+        self.assertIsNotNone(self.outbox.post(url, "#offboarding", "10.0.0.1", u"Zo\xeb offboarded".encode("utf-8")))
+
+        self.wait_for(lambda: self.slack.sent)
+
+        self.assertEqual([("#offboarding", "10.0.0.1", u"Jos\xe9 offboarded\nZo\xeb offboarded")], self.slack.sent)
+
+    def test_failed_messages_are_retried(self):
+        self.slack.errors = [urllib2.URLError("timed out"), urllib2.HTTPError(url, 503, "busy", {}, None)]
+
+        self.outbox.post(url, "#offboarding", "10.0.0.1", "Offboarded lab-1")
+
+        self.wait_for(lambda: self.slack.sent)
+        self.assertEqual([("#offboarding", "10.0.0.1", "Offboarded lab-1")], self.slack.sent)
+        self.assertEqual([], self.outbox.pending())
+
+    def test_rejected_messages_are_dropped(self):
+        self.slack.errors = [urllib2.HTTPError(url, 404, "no_team", {}, None)]
+
+        self.outbox.post(url, "#offboarding", "10.0.0.1", "Offboarded lab-1")
+
+        self.wait_for(lambda: not self.outbox.pending())
+        self.assertEqual([], self.slack.sent)
+
+    def test_queued_messages_survive_a_restart(self):
+        self.slack.errors = [urllib2.URLError("offline")]
+        self.outbox.retry_delay = 60
+        self.outbox.post(url, "#offboarding", "10.0.0.1", "Offboarded lab-1")
+        self.wait_for(lambda: self.outbox.pending()[0]["attempts"] == 1)
+        self.outbox.stop()
+
+        slack = FakeSlack()
+        remaining = SlackOutbox(self.path, sender=slack).flush(timeout=0)
+
+        self.assertEqual(1, remaining)
+        self.assertEqual([], slack.sent)
+
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(["put", "retry"], [record["op"] for record in records])
+        records[1]["next_attempt"] = 0
+        with open(self.path, "w") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+        self.assertEqual(0, SlackOutbox(self.path, sender=slack).flush())
+        self.assertEqual([("#offboarding", "10.0.0.1", "Offboarded lab-1")], slack.sent)
+
+    def test_send_webhook(self):
+        server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), WebhookHandler)
+        server.payloads = []
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+
+        send_webhook("http://127.0.0.1:{}/hook".format(server.server_address[1]), "#offboarding", "10.0.0.1", "hi",
+                     timeout=5)
+
+        thread.join()
+        server.server_close()
+        self.assertEqual([{"channel": "#offboarding", "username": "10.0.0.1", "text": "hi"}], server.payloads)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.jamf_pro.jss_doc import JssDoc
+from blade_runner.document.template import Template, TemplateError
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_fields_are_compiled_once(self):
+        template = Template("<b>{{ key }}: </b> {{value}} ({{key}})")
+
+        self.assertEqual(["key", "value"], template.fields)
+        self.assertEqual("<b>RAM: </b> 16 GB (RAM)", template.render(key="RAM", value="16 GB"))
+        self.assertEqual("<b>Jamf ID: </b> 42 (Jamf ID)", template.render(key="Jamf ID", value=42))
+
+    def test_escape_filter(self):
+        template = Template("<td>{{cell|escape}}</td>{{raw}}")
+
+        self.assertEqual("<td>a &lt;b&gt; &amp; c</td><br>", template.render(cell="a <b> & c", raw="<br>"))
+
+    def test_write_appends_pieces(self):
+        row = Template("<tr><td>{{name}}</td></tr>")
+        rows = []
+        for name in ["disk0", "disk1"]:
+            row.write(rows, name=name)
+
+        page = Template("<table>{{rows}}</table>")
+
+        self.assertEqual("<table><tr><td>disk0</td></tr><tr><td>disk1</td></tr></table>", page.render(rows=rows))
+
+    def test_errors(self):
+        with self.assertRaises(TemplateError):
+            Template("{{name|upper}}")
+        with self.assertRaises(TemplateError):
+            Template("{{name}} {{serial}}").render(name="lab-1")
+
+    def test_jss_doc_data(self):
+        jss_doc = JssDoc.__new__(JssDoc)
+
+        data = jss_doc._build_data([("Name", "lab-1"), ("SSD", "Yes", "RAM", "16 GB", "Storage", "500 GB")])
+
+        self.assertEqual("<b>Name: </b> lab-1\n<p>\n<b>SSD: </b> Yes &nbsp;&nbsp; <b>RAM: </b> 16 GB &nbsp;&nbsp; "
+                         "<b>Storage: </b> 500 GB\n<p>\n", data)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
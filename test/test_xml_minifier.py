@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import re
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+from StringIO import StringIO
+import xml.etree.cElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_jamf_pro import FakeJamfPro
+from blade_runner.jamf_pro import xml_minifier
+from blade_runner.jamf_pro.jss_server import JssServer
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+xml = """<?xml version="1.0" encoding="UTF-8"?>
+<computer>
+  <general>
+    <name>lab 1</name>
+    <remote_management>
+      <managed>false</managed>
+    </remote_management>
+  </general>
+  <extension_attributes>
+    <extension_attribute><name>Notes</name><value>two
+lines</value></extension_attribute>
+  </extension_attributes>
+</computer>
+"""
+
+
+def two_pass_minify(xml_str):
+    xml_str = re.sub("\n", "", xml_str)
+    return re.sub("(>)\s+(<)", r"\1\2", xml_str)
+
+
+class TestXmlMinifier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "config.xml")
+        with open(self.path, "w") as f:
+            f.write(xml)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_minify_matches_two_pass_minify(self):
+        self.assertEqual(two_pass_minify(xml), xml_minifier.minify(xml))
+        self.assertIn("<name>lab 1</name>", xml_minifier.minify(xml))
+
+    def test_chunks_are_minified_across_boundaries(self):
+        for chunk_size in [1, 2, 3, 7, 64]:
+            minified = "".join(xml_minifier.iter_minify(StringIO(xml), chunk_size))
+            self.assertEqual(xml_minifier.minify(xml), minified)
+
+    def test_minify_file(self):
+        minified = xml_minifier.minify_file(self.path)
+
+        self.assertEqual(xml_minifier.minify(xml).replace('<?xml version="1.0" encoding="UTF-8"?>', ""), minified)
+        self.assertEqual(two_pass_minify(ET.tostring(ET.parse(self.path).getroot())), minified)
+
+    def test_minify_file_strips_comments(self):
+        with open(self.path, "w") as f:
+            f.write(xml.replace("<general>", "<!-- Set by\n the offboard config -->\n  <general>\n    <!-- a > b -->"))
+
+        self.assertEqual(two_pass_minify(ET.tostring(ET.parse(self.path).getroot())),
+                         xml_minifier.minify_file(self.path))
+
+    def test_malformed_file_is_rejected(self):
+        with open(self.path, "w") as f:
+            f.write("<computer><general></computer>")
+
+        with self.assertRaises(SyntaxError):
+            xml_minifier.minify_file(self.path)
+
+
+class TestJssServerXml(unittest.TestCase):
+
+    def setUp(self):
+        self.jamf_pro = FakeJamfPro(records=1)
+        self.jamf_pro.start()
+        self.jamf = JssServer(jss_url=self.jamf_pro.url, username="user", password="pass")
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.jamf._pool.close()
+        self.jamf_pro.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, content):
+        path = os.path.join(self.tmp_dir, "config.xml")
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_get_subsets_data_passes_xml_through(self):
+        path = self._write("<computer><general/><hardware/></computer>")
+
+        data = self.jamf.get_subsets_data("1", path)
+
+        root = ET.fromstring(data)
+        self.assertEqual("computer", root.tag)
+        self.assertEqual("C02FAKE00001", root.find("general/serial_number").text)
+        self.assertEqual("8192", root.find("hardware/total_ram").text)
+
+    def test_push_xml(self):
+        path = self._write(xml)
+
+        self.jamf.push_xml(path, "1")
+
+        self.assertEqual("lab 1", self.jamf_pro.computer(1)["general"]["name"])
+        self.assertFalse(self.jamf_pro.computer(1)["general"]["remote_management"]["managed"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+
+# -*- coding: utf-8 -*-
+################################################################################
+# Copyright (c) 2019 University of Utah Student Computing Labs.
+# All Rights Reserved.
+#
+# Author: Thackery Archuletta
+# Creation Date: Oct 2018
+# Last Updated: May 2019
+#
+# Permission to use, copy, modify, and distribute this software and
+# its documentation for any purpose and without fee is hereby granted,
+# provided that the above copyright notice appears in all copies and
+# that both that copyright notice and this permission notice appear
+# in supporting documentation, and that the name of The University
+# of Utah not be used in advertising or publicity pertaining to
+# distribution of the software without specific, written prior
+# permission. This software is supplied as is without expressed or
+# implied warranties of any kind.
+################################################################################
+
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from blade_runner.secure_erase.zero_fill import ZeroFill, align
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class TestZeroFill(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "disk.img")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_disk(self, size):
+        with open(self.path, "wb") as f:
+            f.write("partition map")
+            f.truncate(size)
+            f.seek(size - 4)
+            f.write("data")
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_erase_writes_zeros_over_the_whole_disk(self):
+        self.make_disk(3 * 1024 * 1024)
+        progress = []
+
+        written = ZeroFill(block_size=1024 * 1024).erase(self.path, on_progress=progress.append)
+
+        self.assertEqual(3 * 1024 * 1024, written)
+        self.assertEqual("", self.read().strip("\0"))
+        self.assertEqual(3 * 1024 * 1024, os.path.getsize(self.path))
+        self.assertEqual(100.0, progress[-1])
+        self.assertEqual(3, len(progress))
+
+    def test_odd_sized_disk(self):
+        for unbuffered in [True, False]:
+            self.make_disk(1024 * 1024 + 1001)
+
+            ZeroFill(block_size=64 * 1024, unbuffered=unbuffered).erase(self.path)
+
+            self.assertEqual("", self.read().strip("\0"))
+            self.assertEqual(1024 * 1024 + 1001, os.path.getsize(self.path))
+
+    def test_erase_only_size_bytes(self):
+        self.make_disk(1024 * 1024)
+
+        ZeroFill(block_size=4096).erase(self.path, size=8192)
+
+        self.assertEqual("data", self.read().strip("\0"))
+
+    def test_unknown_size_is_an_error(self):
+        open(self.path, "wb").close()
+        engine = ZeroFill(block_size=4096)
+
+        # A device that doesn't report its size, like a raw device on macOS, must be given one.
+        self.assertRaises(IOError, engine.erase, os.devnull)
+        self.assertRaises(IOError, engine.erase, self.path)
+
+    def test_read_back(self):
+        self.make_disk(1024 * 1024)
+        engine = ZeroFill(block_size=4096, samples=4)
+
+        self.assertFalse(engine.read_back(self.path))
+        engine.erase(self.path)
+        self.assertTrue(engine.read_back(self.path))
+
+    def test_block_size_is_aligned(self):
+        self.assertEqual(align(1), ZeroFill(block_size=1).block_size)
+        self.assertEqual(0, ZeroFill(block_size=1000000).block_size % 4096)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)